@@ -0,0 +1,126 @@
+"""
+
+End-to-end check of batch_process.py
+
+Writes a short sequence of test images to a temporary directory, streams it through a Bloom -> Tonemap preset
+with batch_process.process() and checks what was written:
+
+    batch_count: every input was written, at its own size (the sequence changes size part way through)
+    batch_order: each output came from its own input, the inputs get brighter frame by frame and so must the outputs
+    batch_opaque: the written images are opaque, as the effects write alpha 0
+
+    python batch_check.py
+    python batch_check.py --headless
+
+The exit code is 1 if any check fails.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy
+from PIL import Image
+
+from benchmark import create_context
+from batch_process import build_chain, process
+
+#More frames than readback buffers, so the ring wraps around, and a size change part way through
+SIZES = [(256, 128)] * 5 + [(192, 96)] * 3
+
+PRESET = {
+    "hdr": True,
+    "effects": [
+        {"type": "Bloom", "properties": {"threshold": 0.8, "power": 1.5}},
+        {"type": "Tonemap", "properties": {"white_point": 2.0}},
+    ],
+}
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Check batch_process.py end to end")
+    parser.add_argument('--headless', action='store_true', help="create the context through EGL without a display")
+    return parser.parse_args()
+
+#A horizontal gradient with a hard edged block, scaled up with the frame index
+def write_inputs(directory):
+    paths = []
+    for index, (width, height) in enumerate(SIZES):
+        brightness = (index + 1) / len(SIZES)
+
+        image = numpy.empty((height, width, 4), dtype=numpy.float32)
+        image[..., :3] = numpy.linspace(0.0, 1.0, width, dtype=numpy.float32)[None, :, None]
+        image[height // 4:height // 2, width // 4:width // 2, :3] = 1.0
+        image[..., :3] *= brightness
+        image[..., 3] = 1.0
+
+        path = os.path.join(directory, f'frame_{index:03}.png')
+        Image.fromarray(numpy.round(image * 255.0).astype(numpy.uint8), 'RGBA').save(path)
+        paths.append(path)
+
+    return paths
+
+def report(name, passed, details):
+    print(f"{name}: {details} {'ok' if passed else 'FAILED'}")
+    return passed
+
+def run_checks(context, directory):
+    input_directory = os.path.join(directory, 'inputs')
+    output_directory = os.path.join(directory, 'outputs')
+    os.makedirs(input_directory)
+    os.makedirs(output_directory)
+
+    paths = write_inputs(input_directory)
+
+    chain = build_chain(context, PRESET, SIZES[0])
+    process(context, chain, paths, output_directory, None, threads=2, prefetch=2)
+
+    sizes = []
+    means = []
+    min_alpha = 255
+    for path in paths:
+        output_path = os.path.join(output_directory, os.path.basename(path))
+        if not os.path.exists(output_path):
+            sizes.append(None)
+            continue
+
+        with Image.open(output_path) as written:
+            sizes.append(written.size)
+            pixels = numpy.asarray(written.convert('RGBA'))
+            means.append(float(pixels[..., :3].mean()))
+            min_alpha = min(min_alpha, int(pixels[..., 3].min()))
+
+    failures = []
+
+    if not report('batch_count', sizes == SIZES, f"{sum(size is not None for size in sizes)} of {len(SIZES)} written at their input's size"):
+        failures.append('batch_count')
+
+    increasing = len(means) == len(SIZES) and all(later > earlier for earlier, later in zip(means, means[1:]))
+    if not report('batch_order', increasing, "mean brightness " + ', '.join(f'{mean:.1f}' for mean in means)):
+        failures.append('batch_order')
+
+    if not report('batch_opaque', min_alpha == 255, f"min alpha {min_alpha} (== 255)"):
+        failures.append('batch_opaque')
+
+    return failures
+
+def main():
+    arguments = parse_arguments()
+
+    #Shader paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    context = create_context(arguments.headless)
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = run_checks(context, directory)
+
+    if len(failures) > 0:
+        print(f"{len(failures)} check(s) failed: {', '.join(failures)}")
+        return 1
+
+    print("All checks passed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+
+Offline batch processing of images through a post-processing chain
+
+Builds a chain from a JSON preset in a hidden (or, with --headless, display-less) context and streams
+a directory, a glob pattern or a list of images through it, writing the results to an output directory.
+
+    python batch_process.py --preset marketing.json --output renders/ captures/
+    python batch_process.py --preset thumbnail.json --output thumbs/ --format jpg "frames/*.png"
+
+A preset lists the effects in chain order, each with the properties to set on it:
+
+    {
+        "hdr": true,
+        "effects": [
+            {"type": "Bloom", "properties": {"power": 1.5, "threshold": 0.8}},
+            {"type": "Tonemap", "properties": {"white_point": 2.0}},
+            {"type": "SplitTone", "enabled": false}
+        ]
+    }
+
+Decoding and encoding run on a thread pool while the GPU works: images are decoded a few frames ahead,
+uploaded through pixel buffer objects to alternating source textures, and read back through the chain's
+asynchronous readback, so disk, GPU and encoder all stay busy. Needs Pillow (installed with arcade) and numpy.
+
+Images are written opaque: Tonemap and other effects do not carry alpha through and write 0 to it.
+With --keep-alpha, formats that can store alpha (.png, .tga, .tif, .webp) get the chain's alpha channel as it is.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+import time
+
+from PIL import Image
+
+from benchmark import create_context, get_effect_types
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tga', '.tif', '.tiff', '.webp')
+ALPHA_EXTENSIONS = ('.png', '.tga', '.tif', '.tiff', '.webp')
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Process images through a post-processing chain")
+    parser.add_argument('inputs', nargs='+', help="images, directories of images or glob patterns, processed in sorted order")
+    parser.add_argument('--preset', required=True, help="JSON file describing the chain")
+    parser.add_argument('--output', required=True, help="directory to write the processed images to")
+    parser.add_argument('--format', help="extension of the written images, the input's by default")
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 4, help="decode and encode threads")
+    parser.add_argument('--prefetch', type=int, default=4, help="images decoded ahead of the GPU")
+    parser.add_argument('--keep-alpha', action='store_true', help="write the chain's alpha channel to formats that store alpha")
+    parser.add_argument('--headless', action='store_true', help="create the context through EGL without a display")
+    return parser.parse_args()
+
+def collect_inputs(inputs):
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            names = sorted(os.listdir(pattern))
+            paths.extend(os.path.join(pattern, name) for name in names if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif os.path.isfile(pattern):
+            paths.append(pattern)
+        else:
+            paths.extend(sorted(glob.glob(pattern)))
+
+    return [os.path.abspath(path) for path in paths]
+
+def load_preset(path):
+    with open(path) as preset_file:
+        return json.load(preset_file)
+
+def build_chain(context, preset, size):
+    from postprocessing.post_processing_chain import PostProcessingChain
+
+    effect_types = {effect_type.__name__: effect_type for effect_type in get_effect_types()}
+
+    chain = PostProcessingChain(context, size, preset.get('hdr', False))
+    for entry in preset.get('effects', []):
+        effect_type = effect_types.get(entry['type'])
+        if effect_type is None:
+            raise ValueError(f"Unknown effect '{entry['type']}', expected one of {', '.join(effect_types)}")
+
+        effect = chain.add_effect(effect_type)
+        effect.enabled = entry.get('enabled', True)
+
+        for name, value in entry.get('properties', {}).items():
+            #Only properties, a typo or a method name would otherwise be set as a new attribute without an error
+            if not isinstance(getattr(type(effect), name, None), property):
+                raise ValueError(f"{entry['type']} has no property '{name}'")
+
+            #JSON has no tuples, colors and other vectors arrive as lists
+            if isinstance(value, list):
+                value = tuple(value)
+            setattr(effect, name, value)
+
+    return chain
+
+#Runs on the thread pool. Rows are flipped to match GL, which starts at the bottom
+def decode(path):
+    with Image.open(path) as image:
+        image = image.convert('RGBA').transpose(Image.FLIP_TOP_BOTTOM)
+        return image.size, image.tobytes()
+
+#Runs on the thread pool, pixels are top row first as returned by the readback.
+#Effects leave alpha undefined (Tonemap writes 0), so it is dropped unless keep_alpha asks for it
+def encode(pixels, path, keep_alpha=False):
+    image = Image.fromarray(pixels, 'RGBA')
+    if not keep_alpha or not path.lower().endswith(ALPHA_EXTENSIONS):
+        image = image.convert('RGB')
+    image.save(path)
+
+def get_output_path(input_path, output_directory, extension):
+    name, input_extension = os.path.splitext(os.path.basename(input_path))
+    if extension is None:
+        extension = input_extension
+    elif not extension.startswith('.'):
+        extension = '.' + extension
+    return os.path.join(output_directory, name + extension)
+
+#Images are uploaded through pixel buffer objects: writing the buffer returns once the driver has the pixels,
+#and the texture is filled from it on the GPU's timeline. Two sources and two buffers, so uploading the next image
+#never waits on the GPU still reading the last one. One destination is enough, each frame's readback is queued
+#on the GPU before the next frame draws over it
+class FrameTargets:
+
+    def __init__(self, context):
+        self.context = context
+        self.sources = [None, None]
+        self.uploads = [None, None]
+        self.destination = None
+
+    #Upload the pixels of the given frame, returns the source and destination to render it with
+    def upload(self, index, size, pixels):
+        slot = index % 2
+        source = self.sources[slot] = self.get_target(self.sources[slot], size)
+        self.destination = self.get_target(self.destination, size)
+
+        buffer = self.uploads[slot]
+        if buffer is None:
+            buffer = self.uploads[slot] = self.context.buffer(reserve=len(pixels), usage='stream')
+        else:
+            #New storage rather than waiting until the GPU has read the last image from the buffer
+            buffer.orphan(len(pixels))
+        buffer.write(pixels)
+        source.texture.write(buffer)
+
+        return source, self.destination
+
+    def get_target(self, target, size):
+        from postprocessing.render_target import RenderTarget
+
+        if target is None:
+            return RenderTarget(self.context, size, 'f1')
+        if tuple(target.size) != size:
+            target.resize(size)
+        return target
+
+    def release(self):
+        for resource in self.sources + self.uploads + [self.destination]:
+            if resource is not None:
+                resource.release()
+
+def process(context, chain, paths, output_directory, extension, threads, prefetch, keep_alpha=False):
+    targets = FrameTargets(context)
+    encodes = collections.deque()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        decodes = [pool.submit(decode, path) for path in paths[:prefetch]]
+
+        for index, path in enumerate(paths):
+            if index + prefetch < len(paths):
+                decodes.append(pool.submit(decode, paths[index + prefetch]))
+
+            size, pixels = decodes[index].result()
+            decodes[index] = None
+
+            source, destination = targets.upload(index, size, pixels)
+
+            #Every image is a new source, the chain should not wait for a size to settle
+            if size != chain.size:
+                chain.resize(size)
+
+            output_path = get_output_path(path, output_directory, extension)
+            def on_read(result, output_path=output_path):
+                encodes.append(pool.submit(encode, result, output_path, keep_alpha))
+
+            #Read straight from the destination once the frame is rendered, see PostProcessingChain.read_next_output_async().
+            #Only blocks when every readback buffer is still waiting on the GPU
+            while chain.read_next_output_async(on_read) is None:
+                chain.poll_readbacks(wait=True)
+
+            chain.apply_effects(source.texture, destination.framebuffer_object)
+
+            #Hold the GPU back if the encoders fall behind, rather than queueing up every frame in memory
+            while len(encodes) > 0 and encodes[0].done():
+                encodes.popleft().result()
+            while len(encodes) > threads + prefetch:
+                encodes.popleft().result()
+
+        chain.finish_readbacks()
+
+        for future in encodes:
+            future.result()
+
+    targets.release()
+
+def main():
+    arguments = parse_arguments()
+
+    paths = collect_inputs(arguments.inputs)
+    if len(paths) == 0:
+        print("No input images found")
+        return 1
+
+    preset = load_preset(arguments.preset)
+    output_directory = os.path.abspath(arguments.output)
+    os.makedirs(output_directory, exist_ok=True)
+
+    #Shader paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    context = create_context(arguments.headless)
+
+    with Image.open(paths[0]) as first_image:
+        chain = build_chain(context, preset, first_image.size)
+
+    start = time.perf_counter()
+    process(context, chain, paths, output_directory, arguments.format, arguments.threads, arguments.prefetch, arguments.keep_alpha)
+    seconds = time.perf_counter() - start
+
+    print(f"Processed {len(paths)} images in {seconds:.2f} s ({len(paths) / seconds:.1f} images/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
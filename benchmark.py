@@ -0,0 +1,245 @@
+"""
+
+Headless benchmark for the post-processing effects
+
+Measures every effect on its own, and chains of increasing length with HDR on and off,
+at a range of resolutions, and writes the results as JSON. Effects are set up to change the image
+(see configure_effect()), as the chain skips effects that would not.
+
+    python benchmark.py --output results.json
+    python benchmark.py --compare results.json
+
+Each case reports the average GPU time per frame and the slowest frame measured (gpu_peak_ms), which is
+what effects that spread their work over frames, like temporal Bloom, are judged by.
+
+With --compare, the new results are checked against a saved baseline and any case that got slower
+by more than --tolerance is reported as a regression (the exit code is 1 if there are any).
+
+--headless renders through EGL without a display, a software renderer can be forced with
+LIBGL_ALWAYS_SOFTWARE=1 on Mesa.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160),
+}
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark post-processing effects and chains")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file to check the results against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument('--resolutions', default=','.join(RESOLUTIONS.keys()), help="comma separated list of " + ', '.join(RESOLUTIONS.keys()))
+    parser.add_argument('--frames', type=int, default=100, help="frames measured per case")
+    parser.add_argument('--warmup', type=int, default=10, help="frames rendered before measuring each case")
+    parser.add_argument('--headless', action='store_true', help="create the context through EGL without a display")
+    return parser.parse_args()
+
+def create_context(headless):
+    import pyglet
+
+    #Has to be set before arcade (and with it pyglet.window) is imported
+    if headless:
+        pyglet.options['headless'] = True
+
+    import arcade
+
+    config = pyglet.gl.Config(major_version=3, minor_version=3, forward_compatible=True, double_buffer=True)
+    window = pyglet.window.Window(width=64, height=64, visible=False, config=config)
+    return arcade.gl.Context(window)
+
+def get_effect_types():
+    from postprocessing.effects.bloom import Bloom
+    from postprocessing.effects.chromatic_abberation import ChromaticAberration
+    from postprocessing.effects.greyscale import GreyScale
+    from postprocessing.effects.split_tone import SplitTone
+    from postprocessing.effects.template import Tempalte
+    from postprocessing.effects.tonemap import Tonemap
+    from postprocessing.effects.Vignette import Vignette
+
+    return [Bloom, ChromaticAberration, GreyScale, SplitTone, Vignette, Tonemap, Tempalte]
+
+#Effects in the order they are added for the chain length cases, roughly the order a game would use them
+def get_chain_types():
+    from postprocessing.effects.bloom import Bloom
+    from postprocessing.effects.chromatic_abberation import ChromaticAberration
+    from postprocessing.effects.greyscale import GreyScale
+    from postprocessing.effects.split_tone import SplitTone
+    from postprocessing.effects.tonemap import Tonemap
+    from postprocessing.effects.Vignette import Vignette
+
+    return [Bloom, Tonemap, ChromaticAberration, SplitTone, GreyScale, Vignette]
+
+#Parameters that make each effect change the image. Effects left at identity settings (like SplitTone's zero colors)
+#are skipped by the chain, and a case would only time a passthrough
+def configure_effect(effect):
+    from postprocessing.effects.greyscale import GreyScale
+    from postprocessing.effects.split_tone import SplitTone
+    from postprocessing.effects.Vignette import Vignette
+
+    if isinstance(effect, SplitTone):
+        effect.shadow_color = (0.1, 0.0, 0.2)
+        effect.highlight_color = (0.2, 0.1, 0.0)
+    elif isinstance(effect, GreyScale):
+        effect.strength = 0.75
+        effect.shadow_color = (0.1, 0.0, 0.0)
+    elif isinstance(effect, Vignette):
+        effect.inner_distance = 0.5
+        effect.outer_distance = 1.25
+        effect.color = (0.2, 0.0, 0.1, 1.0)
+
+def create_source(context, size):
+    from postprocessing.render_target import RenderTarget
+
+    #Random content so that thresholds pass some pixels, the content does not affect the cost much
+    source = RenderTarget(context, size, 'f1')
+    source.texture.write(os.urandom(size[0] * size[1] * 4))
+    return source
+
+def measure(context, chain, source, destination, frames, warmup):
+    chain.gpu_timing = True
+
+    for _ in range(warmup):
+        chain.apply_effects(source.texture, destination.framebuffer_object)
+    context.finish()
+
+    #Frame times arrive a few frames late, the last completed frame is sampled after every frame
+    peak_ms = 0.0
+    start = time.perf_counter()
+    for _ in range(frames):
+        chain.apply_effects(source.texture, destination.framebuffer_object)
+        peak_ms = max(peak_ms, chain.get_gpu_frame_time(smoothed=False))
+    context.finish()
+    cpu_ms = (time.perf_counter() - start) * 1000.0 / frames
+
+    timings = chain.get_gpu_timings()
+    gpu_ms = chain.get_gpu_frame_time()
+
+    chain.gpu_timing = False
+
+    return {'cpu_ms': cpu_ms, 'gpu_ms': gpu_ms, 'gpu_peak_ms': peak_ms, 'passes': timings}
+
+def run_benchmarks(context, resolutions, frames, warmup):
+    from postprocessing.post_processing_chain import PostProcessingChain
+    from postprocessing.render_target import RenderTarget
+    from postprocessing.render_target_pool import RenderTargetPool
+
+    results = {}
+
+    for resolution in resolutions:
+        size = RESOLUTIONS[resolution]
+        source = create_source(context, size)
+        destination = RenderTarget(context, size, 'f1')
+
+        def run(name, effect_types, hdr, configure=None):
+            chain = PostProcessingChain(context, size, hdr)
+            effects = []
+            for effect_type in effect_types:
+                effect = chain.add_effect(effect_type)
+                configure_effect(effect)
+                if configure is not None:
+                    configure(effect)
+                effects.append(effect)
+
+            #A case whose effects were skipped as no-ops would time something else than its name says
+            planned = chain.get_planned_effects()
+            for effect in effects:
+                assert effect in planned, f"{name}: {type(effect).__name__} is not part of the chain's plan"
+
+            results[name] = measure(context, chain, source, destination, frames, warmup)
+            print(f"{name}: {results[name]['cpu_ms']:.3f} ms cpu, {results[name]['gpu_ms']:.3f} ms gpu, {results[name]['gpu_peak_ms']:.3f} ms peak")
+
+        for effect_type in get_effect_types():
+            #The template passes the source through, the chain always skips it and there is nothing to time
+            if effect_type.__name__ == 'Tempalte':
+                continue
+            run(f'effect/{effect_type.__name__}/{resolution}', [effect_type], False)
+
+        from postprocessing.effects.bloom import Bloom
+        if Bloom.compute_supported(context):
+            def use_compute(effect):
+                effect.backend = Bloom.COMPUTE
+            run(f'effect/Bloom_compute/{resolution}', [Bloom], False, use_compute)
+
+        #Temporal Bloom against effect/Bloom, at the intervals it is meant to be used with
+        for interval in (2, 3):
+            def use_temporal(effect, interval=interval):
+                effect.temporal = True
+                effect.temporal_interval = interval
+            run(f'effect/Bloom_temporal_{interval}/{resolution}', [Bloom], False, use_temporal)
+
+        chain_types = get_chain_types()
+        for hdr in (False, True):
+            for length in range(1, len(chain_types) + 1):
+                run(f'chain/{length}/{"hdr" if hdr else "ldr"}/{resolution}', chain_types[:length], hdr)
+
+        source.release()
+        destination.release()
+        RenderTargetPool.get(context).release_all()
+
+    return results
+
+def compare(results, baseline, tolerance):
+    regressions = []
+
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        for metric in ('cpu_ms', 'gpu_ms', 'gpu_peak_ms'):
+            if previous.get(metric, 0.0) <= 0.0:
+                continue
+
+            change = result[metric] / previous[metric] - 1.0
+            marker = ""
+            if change > tolerance:
+                marker = "  REGRESSION"
+                regressions.append((name, metric))
+
+            print(f"{name} {metric}: {previous[metric]:.3f} -> {result[metric]:.3f} ms ({change * 100.0:+.1f}%){marker}")
+
+    return regressions
+
+def main():
+    arguments = parse_arguments()
+
+    #Shader paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    context = create_context(arguments.headless)
+
+    resolutions = arguments.resolutions.split(',')
+    results = run_benchmarks(context, resolutions, arguments.frames, arguments.warmup)
+
+    report = {
+        'renderer': context.limits.RENDERER,
+        'frames': arguments.frames,
+        'results': results,
+    }
+
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if arguments.compare is not None:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline['results'], arguments.tolerance)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} regression(s) over {arguments.tolerance * 100.0:.0f}%")
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
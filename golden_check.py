@@ -0,0 +1,241 @@
+"""
+
+Golden image check of the effect shaders against their NumPy reference implementations
+
+Renders a fixed test image through each effect (and some fused runs of them) on the GPU, reads the result back,
+and compares it to postprocessing/numpy_reference.py. Each case has its own tolerance for the largest and the
+mean error over the RGB channels: 8 bit targets and the GPU's bilinear filtering precision differ a little from
+float math, and the bloom pyramid is stored in a packed float format between passes.
+
+    python golden_check.py
+    python golden_check.py --images failures/
+
+With --images, the GL result, the reference and the amplified difference of every failing case are written
+as PNGs. The exit code is 1 if any case fails. --headless renders through EGL without a display.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy
+
+from benchmark import create_context
+
+#Even at every level of the bloom pyramid, where drivers agree on how mipmaps are built
+SIZE = (512, 256)
+
+#Largest and mean error allowed over RGB, in color units.
+#The bloom pyramid is packed R11G11B10F, drivers may round its 6 bit mantissas differently by a step
+PIXEL_TOLERANCE = (1.5 / 255.0, 0.25 / 255.0)
+FILTERED_TOLERANCE = (3.0 / 255.0, 0.5 / 255.0)
+BLOOM_TOLERANCE = (0.06, 0.003)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Check the effect shaders against NumPy reference implementations")
+    parser.add_argument('--cases', help="comma separated names of the cases to run, all by default")
+    parser.add_argument('--images', help="directory to write images of failing cases to")
+    parser.add_argument('--headless', action='store_true', help="create the context through EGL without a display")
+    return parser.parse_args()
+
+#A fixed test image: gradients, hard edges and noise, bottom row first like GL.
+#LDR images are quantized to 8 bits as they are uploaded, HDR images go up to 4.0
+def create_image(hdr):
+    width, height = SIZE
+    random = numpy.random.default_rng(1234)
+
+    u = numpy.linspace(0.0, 1.0, width, dtype=numpy.float32)[None, :]
+    v = numpy.linspace(0.0, 1.0, height, dtype=numpy.float32)[:, None]
+
+    image = numpy.empty((height, width, 4), dtype=numpy.float32)
+    image[..., 0] = u
+    image[..., 1] = v
+    image[..., 2] = random.random((height, width))
+    image[..., 3] = 1.0
+
+    #Hard edged blocks, bright enough to bloom in HDR
+    peak = 4.0 if hdr else 1.0
+    image[height // 4:height // 2, width // 8:width // 4, :3] = peak
+    image[height // 2:height * 3 // 4, width // 2:width * 5 // 8, :3] = (peak, peak * 0.5, 0.0)
+
+    if hdr:
+        return image.astype(numpy.float16).astype(numpy.float32)
+    return numpy.round(image * 255.0) / 255.0
+
+def get_cases():
+    from postprocessing import numpy_reference as reference
+    from postprocessing.effects.bloom import Bloom
+    from postprocessing.effects.chromatic_abberation import ChromaticAberration
+    from postprocessing.effects.greyscale import GreyScale
+    from postprocessing.effects.split_tone import SplitTone
+    from postprocessing.effects.tonemap import Tonemap
+    from postprocessing.effects.Vignette import Vignette
+
+    def configure_split_tone(effect):
+        effect.shadow_color = (0.1, 0.0, 0.2)
+        effect.highlight_color = (0.2, 0.1, 0.0)
+
+    def configure_greyscale(effect):
+        effect.strength = 0.75
+        effect.shadow_color = (0.1, 0.0, 0.0)
+
+    def configure_vignette(effect):
+        effect.inner_distance = 0.5
+        effect.outer_distance = 1.25
+        effect.color = (0.2, 0.0, 0.1, 1.0)
+
+    def configure_bloom(algorithm, hardware_downsample=True, backend=Bloom.FRAGMENT):
+        def configure(effect):
+            effect.algorithm = algorithm
+            effect.hardware_downsample = hardware_downsample
+            effect.backend = backend
+            effect.threshold = 1.0
+            effect.power = 1.5
+        return configure
+
+    def reference_bloom(algorithm, hardware_downsample=True):
+        return lambda image: reference.bloom(image, threshold=1.0, power=1.5, algorithm=algorithm, hardware_downsample=hardware_downsample)
+
+    split_tone = lambda image: reference.split_tone(image, 0.5, 0.05, (0.1, 0.0, 0.2), (0.2, 0.1, 0.0))
+    greyscale = lambda image: reference.greyscale(image, 0.75, (0.1, 0.0, 0.0), (1.0, 1.0, 1.0))
+    vignette = lambda image: reference.vignette(image, 0.5, 1.25, (0.2, 0.0, 0.1, 1.0))
+
+    #(name, hdr, [(effect type, configure)], reference, tolerance)
+    cases = [
+        ('blit', False, [], reference.blit, PIXEL_TOLERANCE),
+        ('tonemap', True, [(Tonemap, None)], lambda image: reference.tonemap(image, 2.0), PIXEL_TOLERANCE),
+        ('greyscale', False, [(GreyScale, configure_greyscale)], greyscale, PIXEL_TOLERANCE),
+        ('split_tone', False, [(SplitTone, configure_split_tone)], split_tone, PIXEL_TOLERANCE),
+        ('vignette', False, [(Vignette, configure_vignette)], vignette, PIXEL_TOLERANCE),
+        ('chromatic_aberration', False, [(ChromaticAberration, None)],
+            lambda image: reference.chromatic_aberration(image, 0.3, 0.01), FILTERED_TOLERANCE),
+        ('fused', False, [(SplitTone, configure_split_tone), (GreyScale, configure_greyscale), (Vignette, configure_vignette)],
+            lambda image: vignette(greyscale(split_tone(image))), PIXEL_TOLERANCE),
+        ('bloom_gaussian', True, [(Bloom, configure_bloom(Bloom.GAUSSIAN))], reference_bloom('gaussian'), BLOOM_TOLERANCE),
+        ('bloom_gaussian_blit_downsample', True, [(Bloom, configure_bloom(Bloom.GAUSSIAN, False))],
+            reference_bloom('gaussian', False), BLOOM_TOLERANCE),
+        ('bloom_dual_filter', True, [(Bloom, configure_bloom(Bloom.DUAL_FILTER))], reference_bloom('dual_filter'), BLOOM_TOLERANCE),
+    ]
+
+    #The compute blur thresholds each texel before filtering rather than after, which only shifts soft edges a little
+    cases.append(('bloom_gaussian_compute', True, [(Bloom, configure_bloom(Bloom.GAUSSIAN, True, Bloom.COMPUTE))],
+        reference_bloom('gaussian'), (BLOOM_TOLERANCE[0] * 2.0, BLOOM_TOLERANCE[1] * 2.0)))
+
+    return cases
+
+def upload(context, image, hdr):
+    from postprocessing.render_target import RenderTarget
+
+    if hdr:
+        target = RenderTarget(context, SIZE, 'f2')
+        target.texture.write(image.astype(numpy.float16).tobytes())
+    else:
+        target = RenderTarget(context, SIZE, 'f1')
+        target.texture.write(numpy.round(image * 255.0).astype(numpy.uint8).tobytes())
+    return target
+
+def download(target):
+    width, height = target.size
+    data = target.texture.read()
+
+    if target.texture_format == 'f2':
+        return numpy.frombuffer(data, dtype=numpy.float16).reshape(height, width, 4).astype(numpy.float32)
+    return numpy.frombuffer(data, dtype=numpy.uint8).reshape(height, width, 4).astype(numpy.float32) / 255.0
+
+def render(context, source, hdr, effects):
+    from postprocessing.post_processing_chain import PostProcessingChain
+    from postprocessing.render_target import RenderTarget
+
+    chain = PostProcessingChain(context, SIZE, hdr)
+    tonemapped = False
+    added = []
+    for effect_type, configure in effects:
+        effect = chain.add_effect(effect_type)
+        if configure is not None:
+            configure(effect)
+        tonemapped = tonemapped or effect.is_tonemapping_effect()
+        added.append(effect)
+
+    #An effect the chain skips as a no-op would pass as a blit whatever its shader does
+    planned = chain.get_planned_effects()
+    for effect in added:
+        assert effect in planned, f"{type(effect).__name__} is not part of the chain's plan"
+
+    #HDR cases without a tonemap keep their range in the destination
+    destination = RenderTarget(context, SIZE, 'f2' if hdr and not tonemapped else 'f1')
+
+    chain.apply_effects(source.texture, destination.framebuffer_object)
+    result = download(destination)
+
+    destination.release()
+    return result, destination.texture_format
+
+def write_images(directory, name, result, expected):
+    from PIL import Image
+
+    def save(image, suffix):
+        pixels = numpy.round(numpy.clip(image[::-1, :, :3], 0.0, 1.0) * 255.0).astype(numpy.uint8)
+        Image.fromarray(pixels, 'RGB').save(os.path.join(directory, f'{name}_{suffix}.png'))
+
+    save(result, 'gl')
+    save(expected, 'reference')
+    save(numpy.abs(result - expected) * 16.0, 'difference')
+
+def run_case(context, case, images_directory):
+    from postprocessing import numpy_reference as reference
+
+    name, hdr, effects, reference_function, tolerance = case
+
+    image = create_image(hdr)
+    source = upload(context, image, hdr)
+    result, texture_format = render(context, source, hdr, effects)
+    source.release()
+
+    expected = reference.store(reference_function(image), texture_format)
+
+    error = numpy.abs(result[..., :3] - expected[..., :3])
+    max_error = float(error.max())
+    mean_error = float(error.mean())
+    passed = max_error <= tolerance[0] and mean_error <= tolerance[1]
+
+    status = "ok" if passed else "FAILED"
+    print(f"{name}: max {max_error:.5f} (<= {tolerance[0]:.5f}), mean {mean_error:.6f} (<= {tolerance[1]:.6f}) {status}")
+
+    if not passed and images_directory is not None:
+        write_images(images_directory, name, result, expected)
+
+    return passed
+
+def main():
+    arguments = parse_arguments()
+
+    images_directory = None
+    if arguments.images is not None:
+        images_directory = os.path.abspath(arguments.images)
+        os.makedirs(images_directory, exist_ok=True)
+
+    #Shader paths are relative to the repository root
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    context = create_context(arguments.headless)
+
+    from postprocessing.effects.bloom import Bloom
+    cases = get_cases()
+    if not Bloom.compute_supported(context):
+        cases = [case for case in cases if case[0] != 'bloom_gaussian_compute']
+
+    if arguments.cases is not None:
+        names = arguments.cases.split(',')
+        cases = [case for case in cases if case[0] in names]
+
+    failures = [case[0] for case in cases if not run_case(context, case, images_directory)]
+
+    if len(failures) > 0:
+        print(f"{len(failures)} of {len(cases)} case(s) failed: {', '.join(failures)}")
+        return 1
+
+    print(f"All {len(cases)} case(s) passed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
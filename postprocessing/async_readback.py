@@ -0,0 +1,179 @@
+import ctypes
+
+from pyglet import gl
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#(GL type, numpy dtype) for each texture format a readback can return
+_readback_formats = {
+    'f1': (gl.GL_UNSIGNED_BYTE, 'u1'),
+    'f2': (gl.GL_HALF_FLOAT, 'f2'),
+    'f4': (gl.GL_FLOAT, 'f4'),
+}
+
+#Reads framebuffers back to the CPU without stalling the pipeline.
+#request() starts a glReadPixels into one of a ring of pixel buffer objects and places a fence behind it,
+#poll() checks the fences without waiting and maps the buffers whose copy has finished, usually a frame or two later.
+#Results are NumPy arrays of shape (height, width, 4), top row first
+class AsyncReadback:
+
+    #Readbacks that can be in flight at once
+    ring_size = 3
+
+    def __init__(self, context):
+        if numpy is None:
+            raise ImportError("AsyncReadback needs numpy")
+
+        self.context = context
+        self._buffers = [None] * AsyncReadback.ring_size
+        self._pending = [None] * AsyncReadback.ring_size
+        self._request_index = 0
+
+    #Start reading the framebuffer's viewport (or the given (x, y, width, height)) in the given texture format.
+    #Returns a ReadbackRequest, or None if every buffer of the ring is still in flight
+    def request(self, framebuffer, viewport=None, texture_format='f1', callback=None):
+        request = self.reserve(texture_format, callback)
+        if request is not None:
+            self.read(request, framebuffer, viewport)
+        return request
+
+    #Claim a buffer of the ring for a readback that is started later by read(), for callers that only know what to
+    #read once it has been rendered. Returns None if every buffer of the ring is still in flight
+    def reserve(self, texture_format='f1', callback=None):
+        slot = self._get_free_slot()
+        if slot is None:
+            return None
+
+        gl_type, dtype = _readback_formats[texture_format]
+
+        request = ReadbackRequest(dtype, callback)
+        request._slot = slot
+        request._gl_type = gl_type
+        request._index = self._request_index
+        self._request_index += 1
+        self._pending[slot] = request
+
+        return request
+
+    #Start the copy of a reserved readback
+    def read(self, request, framebuffer, viewport=None):
+        if viewport is None:
+            viewport = framebuffer.viewport
+        x, y, width, height = viewport
+
+        request.shape = (height, width, 4)
+        size = width * height * 4 * numpy.dtype(request.dtype).itemsize
+
+        buffer = self._buffers[request._slot]
+        if buffer is None:
+            buffer = self._buffers[request._slot] = self.context.buffer(reserve=size, usage='stream')
+        elif buffer.size < size:
+            buffer.orphan(size)
+
+        framebuffer.use()
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, buffer.glo)
+        gl.glReadPixels(x, y, width, height, gl.GL_RGBA, request._gl_type, 0)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+
+        request._fence = gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def _get_free_slot(self):
+        for slot, request in enumerate(self._pending):
+            if request is None:
+                return slot
+        return None
+
+    #Complete every readback whose copy has finished, without waiting on the GPU.
+    #With wait, if none had finished, blocks until the oldest one has, for callers that need a free buffer to go on
+    def poll(self, wait=False):
+        completed = 0
+        for slot in self._get_copying_slots():
+            if self._try_complete(slot, 0):
+                completed += 1
+
+        copying = self._get_copying_slots()
+        if wait and completed == 0 and len(copying) > 0:
+            oldest = min(copying, key=lambda slot: self._pending[slot]._index)
+            self._try_complete(oldest, gl.GL_TIMEOUT_IGNORED)
+
+    #Slots whose copy was started, reserved readbacks are not waited on
+    def _get_copying_slots(self):
+        return [slot for slot, request in enumerate(self._pending) if request is not None and request._fence is not None]
+
+    def _try_complete(self, slot, timeout):
+        request = self._pending[slot]
+
+        status = gl.glClientWaitSync(request._fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, timeout)
+        if status != gl.GL_ALREADY_SIGNALED and status != gl.GL_CONDITION_SATISFIED:
+            return False
+
+        gl.glDeleteSync(request._fence)
+        request._fence = None
+
+        self._pending[slot] = None
+        self._complete(self._buffers[slot], request)
+        return True
+
+    #Block until every readback in flight has completed
+    def finish(self):
+        while len(self._get_copying_slots()) > 0:
+            self.poll(wait=True)
+
+    #The mapping is copied into an array the caller owns. A view of the mapped buffer would have to stay mapped until
+    #the ring wraps around to it, and reading it after that would crash rather than raise, so the copy is deliberate
+    def _complete(self, buffer, request):
+        result = numpy.empty(request.shape, dtype=request.dtype)
+
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, buffer.glo)
+        pointer = gl.glMapBufferRange(gl.GL_PIXEL_PACK_BUFFER, 0, result.nbytes, gl.GL_MAP_READ_BIT)
+        if not pointer:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+            raise RuntimeError(f"Could not map the readback buffer (GL error {gl.glGetError()})")
+
+        ctypes.memmove(result.ctypes.data, pointer, result.nbytes)
+        gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+
+        #GL rows start at the bottom, flipping is a view and does not copy
+        request.result = result[::-1]
+        request.done = True
+
+        if request.callback is not None:
+            request.callback(request.result)
+
+    @property
+    def pending_count(self):
+        return sum(1 for request in self._pending if request is not None)
+
+    def release(self):
+        for request in self._pending:
+            if request is not None and request._fence is not None:
+                gl.glDeleteSync(request._fence)
+
+        for buffer in self._buffers:
+            if buffer is not None:
+                buffer.release()
+
+        self._buffers = [None] * AsyncReadback.ring_size
+        self._pending = [None] * AsyncReadback.ring_size
+
+
+#A readback started by AsyncReadback.request(), result holds the array once done is set
+class ReadbackRequest:
+
+    def __init__(self, dtype, callback):
+        #Set when the copy starts, see AsyncReadback.read()
+        self.shape = None
+        self.dtype = dtype
+        self.callback = callback
+
+        self.done = False
+        self.result = None
+
+        self._fence = None
+        self._slot = 0
+        self._gl_type = None
+        self._index = 0
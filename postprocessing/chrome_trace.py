@@ -0,0 +1,107 @@
+import json
+import os
+import queue
+import threading
+import time
+
+#Records CPU timestamps of the chain, its effects, their sub-passes and render target binds,
+#and streams them to a Chrome trace-event JSON file (load it in chrome://tracing or Perfetto).
+#Events are handed to a background thread through a bounded queue, so recording costs a tuple and a queue
+#put on the render thread and memory use does not grow with the length of the capture.
+#If the writer falls behind, events are dropped rather than stalling the frame, see dropped_events.
+#
+#Only one trace records at a time, hooks check ChromeTrace.active and do nothing while it is None
+class ChromeTrace:
+
+    active = None
+
+    #Most events waiting to be written before new ones are dropped
+    max_queued_events = 65536
+
+    def start(path):
+        ChromeTrace.stop()
+        ChromeTrace.active = ChromeTrace(path)
+        return ChromeTrace.active
+
+    def stop():
+        trace = ChromeTrace.active
+        if trace is not None:
+            ChromeTrace.active = None
+            trace.close()
+
+    def __init__(self, path):
+        self.path = path
+        self.dropped_events = 0
+        self._open = []
+
+        self._process_id = os.getpid()
+        self._thread_id = threading.get_ident()
+
+        #Opened here rather than by the writer, so a bad path raises to the caller
+        self._file = open(path, 'w')
+
+        self._queue = queue.Queue(maxsize=ChromeTrace.max_queued_events)
+        self._writer = threading.Thread(target=self._write_events, name="ChromeTraceWriter", daemon=True)
+        self._writer.start()
+
+    def timestamp(self):
+        return time.perf_counter_ns()
+
+    def _record(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped_events += 1
+
+    #Sections nest, they are closed in the reverse order they were opened.
+    #Each section is written as a single complete event when it ends, so a dropped event never unbalances the trace
+    def begin(self, name, category="effect"):
+        self._open.append((name, category, self.timestamp()))
+
+    def end(self):
+        name, category, start = self._open.pop()
+        self.complete(name, start, category)
+
+    #A section whose start time was taken earlier, used for short events like binds
+    def complete(self, name, start, category):
+        self._record((name, category, start, self.timestamp() - start))
+
+    #If the writer died (e.g. the disk filled up) nothing drains the queue, so never block on it
+    def close(self):
+        while self._writer.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+        self._writer.join()
+
+    def _write_events(self):
+        with self._file as trace_file:
+            trace_file.write('[\n')
+            trace_file.write(json.dumps({
+                "name": "thread_name", "ph": "M", "pid": self._process_id, "tid": self._thread_id,
+                "args": {"name": "Post-processing"},
+            }))
+
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    break
+
+                name, category, timestamp, duration = event
+                entry = {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": timestamp / 1000.0,
+                    "dur": duration / 1000.0,
+                    "pid": self._process_id,
+                    "tid": self._thread_id,
+                }
+
+                trace_file.write(',\n')
+                trace_file.write(json.dumps(entry))
+
+            trace_file.write('\n]\n')
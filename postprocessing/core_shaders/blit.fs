@@ -3,9 +3,12 @@
 uniform sampler2D t_source;
 
 in vec2 v_uv;
+#include "viewport.glsl"
+
 out vec4 out_color;
 
 void main() {
-    vec4 color = texture(t_source, v_uv);
+    //Blits also down and upsample between targets of different sizes
+    vec4 color = texture(t_source, clamp_to_viewport(v_uv, vec2(textureSize(t_source, 0))));
     out_color = color;
 }
\ No newline at end of file
@@ -3,9 +3,26 @@
 in vec2 in_vert;
 in vec2 in_uv;
 
+//One instance is drawn per viewport, see viewports.py
+#define MAX_VIEWPORTS 4
+
+layout(std140) uniform Viewports
+{
+    vec4 u_viewports[MAX_VIEWPORTS];//x, y, width, height in UVs
+};
+
 out vec2 v_uv;
+//Position inside the viewport, 0 to 1
+out vec2 v_local_uv;
+//UV rectangle of the viewport as (min, max)
+flat out vec4 v_viewport;
 
 void main() {
-    gl_Position = vec4(in_vert, 0.0, 1.0);
-    v_uv = in_uv;
+    vec4 viewport = u_viewports[gl_InstanceID];
+    vec2 uv = viewport.xy + in_uv * viewport.zw;
+
+    gl_Position = vec4(uv * 2.0 - 1.0, 0.0, 1.0);
+    v_uv = uv;
+    v_local_uv = in_uv;
+    v_viewport = vec4(viewport.xy, viewport.xy + viewport.zw);
 }
\ No newline at end of file
@@ -0,0 +1,10 @@
+//UV rectangle of the viewport being drawn as (min, max), see viewports.py
+flat in vec4 v_viewport;
+
+//Keep a fetch on the texels of the viewport being drawn, so filters do not bleed across viewport borders
+vec2 clamp_to_viewport(vec2 uv, vec2 texture_size)
+{
+    vec2 first = ceil(v_viewport.xy * texture_size - 0.5) + 0.5;
+    vec2 last = max(ceil(v_viewport.zw * texture_size - 0.5) - 0.5, first);
+    return clamp(uv * texture_size, first, last) / texture_size;
+}
\ No newline at end of file
@@ -0,0 +1,87 @@
+import math
+
+#Adjusts the render_scale of a set of effects to keep the chain within a GPU time budget.
+#Attach it with PostProcessingChain.enable_dynamic_resolution(), which feeds it the chain's measured GPU time every frame.
+#Scale goes down quickly when over budget and comes back up slowly once there is headroom again,
+#so a load spike costs some sharpness for a moment rather than dropped frames.
+class DynamicResolutionController:
+
+    #Scale change per adjustment
+    step = 0.05
+
+    #Effects are only rescaled when the scale crosses a multiple of this, rounded up, so the small steps
+    #do not re-plan the chain and reallocate targets every time
+    quantum = 0.125
+
+    #Frames averaged between adjustments
+    interval = 15
+
+    #Only scale back up when the average frame is below this fraction of the budget
+    headroom = 0.85
+
+    #A frame over this fraction of the budget drops the scale straight away, by two steps...
+    spike = 1.25
+    #...but at most once per this many frames, as measured times arrive a few frames late
+    spike_interval = 5
+
+    def __init__(self, effects, budget_ms, min_scale=0.5, max_scale=1.0):
+        self.effects = list(effects)
+        self.budget_ms = budget_ms
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+
+        self.scale = max_scale
+        self._frames = 0
+        self._total_ms = 0.0
+
+        #Scale the effects were last set to, see quantum
+        self.applied_scale = None
+
+        self._apply_scale()
+
+    #Called once per frame with the GPU time of the last measured frame
+    def update(self, frame_ms):
+        self._frames += 1
+        self._total_ms += frame_ms
+
+        if frame_ms > self.budget_ms * DynamicResolutionController.spike and self._frames >= DynamicResolutionController.spike_interval:
+            self._set_scale(self.scale - DynamicResolutionController.step * 2.0)
+            return
+
+        if self._frames < DynamicResolutionController.interval:
+            return
+
+        average_ms = self._total_ms / self._frames
+        if average_ms > self.budget_ms:
+            self._set_scale(self.scale - DynamicResolutionController.step)
+        elif average_ms < self.budget_ms * DynamicResolutionController.headroom:
+            self._set_scale(self.scale + DynamicResolutionController.step)
+        else:
+            self._set_scale(self.scale)
+
+    def _set_scale(self, scale):
+        scale = round(min(max(scale, self.min_scale), self.max_scale), 3)
+
+        #Start a new measurement, frames rendered before the change no longer say anything about the new scale
+        self._frames = 0
+        self._total_ms = 0.0
+
+        if scale == self.scale:
+            return
+
+        self.scale = scale
+        self._apply_scale()
+
+    #The scale rounded up to the next quantum, at most max_scale
+    def get_quantized_scale(self):
+        quantum = DynamicResolutionController.quantum
+        return min(math.ceil(round(self.scale / quantum, 6)) * quantum, self.max_scale)
+
+    def _apply_scale(self):
+        scale = self.get_quantized_scale()
+        if scale == self.applied_scale:
+            return
+
+        self.applied_scale = scale
+        for effect in self.effects:
+            effect.render_scale = scale
@@ -1,5 +1,6 @@
 import arcade
 from postprocessing.post_effect import PostEffect
+from postprocessing.pixel_stage import load_pixel_stage_program
 
 try:
     import imgui
@@ -9,23 +10,30 @@ except:
 
 class Vignette(PostEffect):
 
+    pixel_stage = 'postprocessing/effects/shaders/vignette.glsl'
+
+    property_uniforms = {'inner_distance': 'u_inner_distance', 'outer_distance': 'u_outer_distance', 'color': 'u_color'}
+
+    #Distance from the center to a corner, distances are measured with the screen remapped to -1..1
+    corner_distance = 2.0 ** 0.5
+
     def __init__(self, context, window_size):
         super().__init__(context, window_size)
 
-        self.program = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/vignette.fs",
-        )
-
-        self.program["t_source"] = 0
+        self.program = load_pixel_stage_program(context, [self.pixel_stage])
+        self.create_parameter_block()
 
         self.inner_distance = 1.0
         self.outer_distance = 2.0
         self.color = (0.0, 0.0, 0.0, 1.0)
 
+    #The vignette only starts past the corners of the screen
+    def is_noop(self):
+        return self.inner_distance >= Vignette.corner_distance and self.outer_distance > self.inner_distance
+
     def apply(self, render_target_pair):
         render_target_pair.bind(0)
-        PostEffect.fullscreen_quad.render(self.program)
+        PostEffect.fullscreen_quad.render(self.use_program())
 
     @property
     def outer_distance(self):
@@ -34,7 +42,7 @@ class Vignette(PostEffect):
     @outer_distance.setter
     def outer_distance(self, value):
         self._outer_distance = value
-        self.program["u_outer_distance"] = value
+        self.set_uniform('u_outer_distance', value)
 
     @property
     def inner_distance(self):
@@ -43,7 +51,7 @@ class Vignette(PostEffect):
     @inner_distance.setter
     def inner_distance(self, value):
         self._inner_distance = value
-        self.program["u_inner_distance"] = value
+        self.set_uniform('u_inner_distance', value)
 
     @property
     def color(self):
@@ -52,7 +60,7 @@ class Vignette(PostEffect):
     @color.setter
     def color(self, value):
         self._color = value
-        self.program["u_color"] = value
+        self.set_uniform('u_color', value)
 
     def show_ui(self):
         super().show_ui()
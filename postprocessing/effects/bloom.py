@@ -2,8 +2,10 @@ import arcade
 import math
 
 from postprocessing.post_effect import PostEffect
-from postprocessing.render_target import RenderTarget
-from postprocessing.ping_pong_buffer import PingPongBuffer
+from postprocessing.render_target import RenderTarget, PACKED_HDR
+from postprocessing.mip_chain import MipPingPongBuffer
+from postprocessing.gaussian_kernel import linear_sampled_kernel
+from postprocessing.uniform_block import PARAMETER_BLOCK, bind_uniform_block
 from pyglet import gl
 
 try:
@@ -13,117 +15,379 @@ except:
     pass
 
 class Bloom(PostEffect):
-    def __init__(self, context, window_size):
-        super().__init__(context, window_size)
-        
-        self.extract_blur_x = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/extract_blur_x.fs"
-        )
 
-        self.blur_y_power = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/blur_y_power.fs"
-        )
+    #Bloom algorithms
+    #GAUSSIAN: separable gaussian blur of every level of the chain, thresholding on every tap
+    #DUAL_FILTER: threshold once, then 5 tap dual filter (Kawase) down and up passes, a fraction of the fill-rate cost
+    GAUSSIAN = 'gaussian'
+    DUAL_FILTER = 'dual_filter'
+    algorithms = [GAUSSIAN, DUAL_FILTER]
+
+    # Largest radius whose linear sampled kernel fits the MAX_TAPS entries of the parameter block
+    max_blur_radius = 30
+
+    # Smallest blur_sigma, a kernel this narrow already leaves the image unblurred
+    min_blur_sigma = 0.1
+
+    # Range of temporal_interval and temporal_blend, longer intervals lag too far behind moving lights
+    max_temporal_interval = 4
+    min_temporal_blend = 0.1
+
+    #Backends for the gaussian pyramid
+    #FRAGMENT: full-screen quad draws into each level
+    #COMPUTE: compute dispatches writing each level as an image, the blur reads each texel once into shared memory
+    FRAGMENT = 'fragment'
+    COMPUTE = 'compute'
+    backends = [FRAGMENT, COMPUTE]
+
+    # The pyramid only holds thresholded light, which is never negative and has no use for alpha
+    pyramid_format = PACKED_HDR
+
+    # GLSL image format qualifiers of the formats the pyramid can have, for the compute backend
+    image_formats = {PACKED_HDR: 'r11f_g11f_b10f', 'f2': 'rgba16f', 'f4': 'rgba32f'}
 
-        self.set_universal_shader_args(self.extract_blur_x)
-        self.set_universal_shader_args(self.blur_y_power)
+    # Work group size along the blur axis, must match TILE_SIZE in bloom_blur.comp
+    compute_tile_size = 128
 
-        self.blur_y_power['t_last'] = 1
+    # Kernel and pyramid depth per quality tier, the wide glow of the lower levels is the first to go
+    quality_settings = {
+        PostEffect.LOW: {'blur_radius': 2, 'levels': 4},
+        PostEffect.MEDIUM: {'blur_radius': 3, 'levels': 5},
+        PostEffect.HIGH: {'blur_radius': 5, 'levels': 5},
+        PostEffect.ULTRA: {'blur_radius': 8, 'levels': 6},
+    }
 
+    # Properties viewports can override, see PostEffect.get_property_uniforms()
+    property_uniforms = {'threshold': 'u_threshold'}
+
+    # Programs the threshold picks the variant of, see load_variant_programs()
+    variant_attributes = ('extract_blur_x', 'blur_y_power', 'compute_downsample', 'compute_blur_x', 'compute_blur_y',
+        'blur_y_temporal', 'bloom_prefilter')
+
+    # render_scale only shrinks the pyramid, the composite stays at full resolution, see PostEffect.dynamic_resolution
+    dynamic_resolution = True
+
+    # The pyramid is sized for render_scale rounded up to a multiple of this, so it is only reallocated (and the temporal
+    # history dropped) when the scale crosses a step, not on every small change a DynamicResolutionController makes
+    render_scale_step = 0.125
+
+    # Compute shaders need GL 4.3, and an arcade version that has them
+    def compute_supported(context):
+        return hasattr(context, 'compute_shader') and context.gl_version >= (4, 3)
+
+    def __init__(self, context, window_size):
+        super().__init__(context, window_size)
+        
+        # Blur kernel for the gaussian algorithm, a sigma of None uses a third of the radius
+        self._blur_radius = 5
+        self._blur_sigma = None
+
+        # The shaders are compiled without thresholding while the threshold is zero, see threshold
+        self._threshold = 1.0
+
+        # Compute programs are only loaded once the compute backend is selected
+        self._backend = Bloom.FRAGMENT
+        self.compute_downsample = None
+        self.compute_blur_x = None
+        self.compute_blur_y = None
+
+        # Temporal amortization of the gaussian blur, see temporal
+        self._temporal = False
+        self._temporal_interval = 2
+        self._temporal_blend = 1.0
+        self.history = None
+        self.blur_y_temporal = None
+        self.bloom_accumulate = None
+        self._temporal_frame = 0
+        self._temporal_levels = []
+        self._history_valid = False
+
+        self.load_blur_programs()
+
+        self.load_dual_filter(context)
         self.load_apply_bloom(context)
 
+        # Downsampling blits into the pyramid
+        RenderTarget._init_blit_shaders(context)
+
+        self.algorithm = Bloom.GAUSSIAN
+
+        self.pyramid = None
         self.chain = []
         self._desired_chain = 5
 
+        # Build the levels below the top of the gaussian pyramid with glGenerateMipmap instead of a blit per level
+        self.hardware_downsample = True
+
         self.threshold = 1.0
         self.power = 1.0
 
         # Allocate the downscaled render targets and blur buffers
         self.allocate_whole_chain()
 
-    def set_universal_shader_args(self, program):
+    # Load the blur shaders for the current kernel, the shaders are compiled with a loop of the matching length
+    def load_blur_programs(self):
+        offsets, weights = linear_sampled_kernel(self._blur_radius, self._blur_sigma)
+        defines = self.get_blur_defines(offsets)
+
+        self.extract_blur_x, self.blur_y_power = self.load_fragment_programs(defines)
+
+        # All bloom shaders share one parameter block layout, the kernel lives in it as well
+        if self.parameters is None:
+            self.create_parameter_block(self.extract_blur_x)
+
+        self.set_uniform("u_offsets", offsets)
+        self.set_uniform("u_weights", weights)
+
+        if self._backend == Bloom.COMPUTE:
+            self.load_compute_programs(defines)
+
+        if self._temporal:
+            self.load_temporal_programs(defines)
+
+    def get_blur_defines(self, offsets):
+        return dict(self.get_threshold_defines(self._threshold), TAP_COUNT=str(len(offsets)))
+
+    def get_threshold_defines(self, threshold):
+        return {"THRESHOLD": "1" if threshold > 0.0 else "0"}
+
+    def load_fragment_programs(self, defines):
+        extract_blur_x = self.load_program("postprocessing/effects/shaders/extract_blur_x.fs", defines)
+        blur_y_power = self.load_program("postprocessing/effects/shaders/blur_y_power.fs", defines)
+
+        extract_blur_x["t_source"] = 0
+        blur_y_power["t_source"] = 0
+        blur_y_power['t_last'] = 1
+        return extract_blur_x, blur_y_power
+
+    def load_prefilter(self, defines):
+        program = self.load_program("postprocessing/effects/shaders/bloom_prefilter.fs", defines)
         program["t_source"] = 0
+        return program
+
+    # The programs of the threshold variant the given defines select, for the current kernel, backend and mode
+    def load_variant_programs(self, defines):
+        offsets, weights = linear_sampled_kernel(self._blur_radius, self._blur_sigma)
+        blur_defines = dict(self.get_blur_defines(offsets), **defines)
+
+        programs = {}
+        programs['extract_blur_x'], programs['blur_y_power'] = self.load_fragment_programs(blur_defines)
+        programs['bloom_prefilter'] = self.load_prefilter(dict(self.get_threshold_defines(self._threshold), **defines))
+
+        if self._backend == Bloom.COMPUTE:
+            programs['compute_downsample'], programs['compute_blur_x'], programs['compute_blur_y'] = self.get_compute_programs(blur_defines)
+        if self._temporal:
+            programs['blur_y_temporal'] = self.get_temporal_blur_program(blur_defines)
+        return programs
+
+    # power is written to the shaders halved
+    def get_property_uniforms(self, name, value):
+        if name == 'power':
+            return {'u_power': value * 0.5}
+        return super().get_property_uniforms(name, value)
+
+    def get_property_defines(self, name, value):
+        if name == 'threshold':
+            return self.get_threshold_defines(value)
+        return {}
+
+    def load_compute_programs(self, defines):
+        self.compute_downsample, self.compute_blur_x, self.compute_blur_y = self.get_compute_programs(defines)
+
+    def get_compute_programs(self, defines):
+        defines = dict(defines, IMAGE_FORMAT=Bloom.image_formats[Bloom.pyramid_format])
+
+        programs = (
+            self.program_cache.load_compute_shader("postprocessing/effects/shaders/bloom_downsample.comp", defines),
+            self.program_cache.load_compute_shader("postprocessing/effects/shaders/bloom_blur.comp", dict(defines, HORIZONTAL="1")),
+            self.program_cache.load_compute_shader("postprocessing/effects/shaders/bloom_blur.comp", dict(defines, HORIZONTAL="0")),
+        )
 
-        weights = self.get_blur_coefficents(11)  # must match shader
-        weights_sum = 0
-        for x in weights:
-            weights_sum += x
+        for program in programs[1:]:
+            bind_uniform_block(program, PARAMETER_BLOCK, 0)
+        return programs
 
-        program["u_weights"] = weights
-        program["u_weight_sum"] = weights_sum
+    def load_temporal_programs(self, defines):
+        self.blur_y_temporal = self.get_temporal_blur_program(defines)
+        self.bloom_accumulate = self.load_program("postprocessing/effects/shaders/bloom_accumulate.fs")
 
+        self.bloom_accumulate["t_source"] = 0
+        self.bloom_accumulate["t_last"] = 1
+
+    def get_temporal_blur_program(self, defines):
+        program = self.load_program("postprocessing/effects/shaders/blur_y_power.fs", dict(defines, TEMPORAL="1"))
+        program["t_source"] = 0
+        program["t_last"] = 1
+        return program
+
+    # Compile the blur programs of a tier's kernel for the current backend and mode
+    def preload_quality(self, tier):
+        offsets, weights = linear_sampled_kernel(Bloom.quality_settings[tier]['blur_radius'], self._blur_sigma)
+        defines = self.get_blur_defines(offsets)
+
+        self.load_fragment_programs(defines)
+
+        if self._backend == Bloom.COMPUTE:
+            self.get_compute_programs(defines)
+        if self._temporal:
+            self.get_temporal_blur_program(defines)
 
     def adjust_chain_size(self, size):
         if len(self.chain) == size:
             return
-        if size < len(self.chain):
-            self.chain = self.chain[0:size]
-        else:
-            current_min_size = self.chain[-1].size
-            self.allocate_chain(size-len(self.chain), current_min_size)
 
+        self._desired_chain = size
+        self.allocate_whole_chain()
+
+    # Levels of the pyramid, each adds a wider and fainter glow. Small targets may have fewer
+    @property
+    def levels(self):
+        return self._desired_chain
+
+    @levels.setter
+    def levels(self, value):
+        value = max(1, int(value))
+        if value != self._desired_chain:
+            self._desired_chain = value
+            self.allocate_whole_chain()
+
+    # The pyramid is the mip chain of two textures, one ping-pong buffer per level.
+    # The top of the chain is half of the scaled size, render_scale shrinks the whole pyramid in steps of render_scale_step.
+    # The pyramid is owned by the effect rather than borrowed from the RenderTargetPool, which only hands out whole
+    # render targets. The trade-off is that it is not aliased: every Bloom keeps its own pyramid between frames, where
+    # per-level targets from the pool were shared with other Blooms and chains. See get_allocated_bytes()
     def allocate_whole_chain(self):
-        self.chain = []
-        self.allocate_chain(self._desired_chain, self.window_size)
+        if self.pyramid is not None:
+            self.pyramid.release()
 
-    def allocate_chain(self, remaining, size):
-        if remaining == 0:
-            return
-        
-        if size[0] == 0 or size[1] == 0:
-            return
+        scale = self.get_pyramid_scale()
+        scaled_size = (max(1, int(self.window_size[0] * scale)), max(1, int(self.window_size[1] * scale)))
+        top_size = (scaled_size[0] // 2, scaled_size[1] // 2)
+
+        self.pyramid = MipPingPongBuffer(self.context, top_size, self._desired_chain, Bloom.pyramid_format)
+        self.chain = self.pyramid.levels
+
+        if self._temporal:
+            self.allocate_history()
+
+    # Scale the pyramid is allocated at, see render_scale_step
+    def get_pyramid_scale(self):
+        step = Bloom.render_scale_step
+        return min(1.0, math.ceil(round(self.render_scale / step, 6)) * step)
 
-        size = (size[0] // 2 , size[1] // 2)
-        ping_pong = PingPongBuffer(self.context, size, texture_format='f2')#TODO: Is HDR
-        self.chain.append(ping_pong)
-        self.allocate_chain(remaining-1, size)
+    # Each level's own light from the frame it was last blurred, double buffered to blend into it
+    def allocate_history(self):
+        if self.history is not None:
+            self.history.release()
+
+        self.history = MipPingPongBuffer(self.context, self.chain[0].size, len(self.chain), Bloom.pyramid_format)
+        self._history_valid = False
+
+    def load_dual_filter(self, context):
+        self.bloom_prefilter = self.load_prefilter(self.get_threshold_defines(self._threshold))
+        self.dual_filter_down = self.load_program("postprocessing/effects/shaders/dual_filter_down.fs")
+        self.dual_filter_up = self.load_program("postprocessing/effects/shaders/dual_filter_up.fs")
+
+        self.dual_filter_down["t_source"] = 0
+        self.dual_filter_up["t_source"] = 0
+        self.dual_filter_up["t_last"] = 1
 
     def load_apply_bloom(self, context):
 
-        self.apply_bloom = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/apply_bloom.fs",
-        )
+        self.apply_bloom = self.load_program("postprocessing/effects/shaders/apply_bloom.fs")
 
         self.apply_bloom["t_source"] = 0
         self.apply_bloom["t_half"] = 1
         #self.apply_bloom["t_quater"] = 2
 
     def resize(self, window_size):
+        if tuple(window_size) == tuple(self.window_size):
+            return
+
         super(Bloom, self).resize(window_size)
         self.allocate_whole_chain()
 
-    def get_blur_coefficents(self, count):
-        midpoint = math.floor(count / 2)
-        stdev = midpoint / 3.0  # I think this is right but #GameJam
+    def get_allocated_bytes(self):
+        total = self.pyramid.allocated_bytes
+        if self.history is not None:
+            total += self.history.allocated_bytes
+        return total
 
-        coefficents = [0.0] * count
+    def get_cache_key(self):
+        key = super().get_cache_key() + (self.algorithm, self._backend, self.hardware_downsample, len(self.chain), self._temporal)
 
-        for x in range(0, midpoint + 1):
-            distance = midpoint - x
-            factor = self.gaussian(distance, stdev)
+        # The history changes from frame to frame even while the source does not
+        if self.is_temporal():
+            key += (self._temporal_interval, self._temporal_blend, self._temporal_frame)
+        return key
 
-            coefficents[x] = factor
-            coefficents[count - (1 + x)] = factor
+    # Every level is scaled by power, with no power there is no light to add
+    def is_noop(self):
+        return self.power == 0.0
 
-        return coefficents
+    def apply(self, render_target_pair):
 
-    def gaussian(self, distance, stdev):
-        # See this for the math: https://en.wikipedia.org/wiki/Gaussian_blur
-        preamble = 1.0 / math.sqrt(2.0 * math.pi * stdev * stdev)
-        exponent = -((distance * distance) / (2.0 * stdev * stdev))
+        # Programs are shared with other Bloom instances, bind this instance's parameters for all of them
+        self.use_program(self.extract_blur_x)
 
-        return preamble * math.exp(exponent)
+        self.pyramid.reset()
 
-    def apply(self, render_target_pair):
+        # The driver's mipmaps and the compute tiles filter across viewport borders, split frames take the fragment path
+        split = PostEffect.fullscreen_quad.is_split
+
+        if self.algorithm == Bloom.DUAL_FILTER:
+            self.apply_dual_filter(render_target_pair.texture)
+        elif self._temporal:
+            self.apply_gaussian_temporal(render_target_pair.texture, self.hardware_downsample and not split)
+        elif self._backend == Bloom.COMPUTE and not split:
+            self.apply_gaussian_compute(render_target_pair.texture)
+        else:
+            self.apply_gaussian(render_target_pair.texture, self.hardware_downsample and not split)
+
+        # Apply top of chain to main image, as it has all the lower levels added already
+        self.begin_timing('Composite')
+        render_target_pair.bind(0)
+        self.chain[0].texture.use(1)
+
+        PostEffect.fullscreen_quad.render(self.apply_bloom)
+        self.end_timing()
+
+    # Viewports with their own parameters run apply() once per group (see PostEffect.apply_viewports), but the temporal
+    # round robin only moves on once per frame: every group blurs the same levels into the same side of the history,
+    # and the history is flipped to the new side after the last group
+    def apply_viewports(self, render_target_pair):
+        temporal = self.is_temporal()
+
+        if temporal:
+            # There is nothing to blend with on the first frame after the history was allocated
+            if self._history_valid:
+                self._temporal_levels = self.get_temporal_levels()
+            else:
+                self._temporal_levels = [(index, None) for index in range(len(self.chain))]
+        else:
+            # The history only holds what the temporal path blurred on the frames before
+            self._history_valid = False
+
+        super().apply_viewports(render_target_pair)
+
+        if temporal:
+            for index, rows in self._temporal_levels:
+                if rows is None:
+                    self.history.levels[index].flip_buffers()
+
+            self._history_valid = True
+            self._temporal_frame += 1
+
+    def apply_gaussian(self, source_texture, hardware_downsample):
 
         # Downsample main RT to half and quater size
-        self.downsample_to_ping(render_target_pair.texture)
+        self.downsample_to_ping(source_texture, hardware_downsample)
 
         # run ping pong back and forth to blur the light buffer
-        for ping_pong in self.chain:
+        for index, ping_pong in enumerate(self.chain):
+            self.begin_timing(f'Level {index}')
             self.apply_blur_down(ping_pong)
+            self.end_timing()
 
         #clear texture 1 so that the bottom of the chain reads from a unbound black texture
         gl.glActiveTexture(gl.GL_TEXTURE0 + 1)
@@ -131,35 +395,230 @@ class Bloom(PostEffect):
        
         #run up and down the chain
         last = None
-        for ping_pong in reversed(self.chain):
+        for index in reversed(range(len(self.chain))):
+            ping_pong = self.chain[index]
+
+            self.begin_timing(f'Level {index}')
             self.apply_blur_up(ping_pong, last)
+            self.end_timing()
+
             last = ping_pong
 
-        # Apply top of chain to main image, as it has all the lower levels added already
-        render_target_pair.bind(0)
-        self.chain[0].texture.use(1)
+    # apply_gaussian for a fraction of the levels each frame, see temporal.
+    # The blurred light of each level is kept in the history without the levels below it, which are added back up
+    # the chain every frame instead. That only costs a fetch or two per texel, so levels can be blurred on different frames
+    def apply_gaussian_temporal(self, source_texture, hardware_downsample):
 
-        PostEffect.fullscreen_quad.render(self.apply_bloom)
+        # Downsampling every level is cheap, and keeps the blurred levels up to date with the source
+        self.downsample_to_ping(source_texture, hardware_downsample)
 
-    def apply_blur(self, ping_pong):
+        # The levels to blur this frame, picked once for all viewport groups by apply_viewports()
+        levels = self._temporal_levels
+        self.blur_y_temporal["u_blend"] = self.temporal_blend if self._history_valid else 1.0
 
-        # Set arugments for pass size
-        texel_uv_size = (1.0 / ping_pong.size[0], 1.0 / ping_pong.size[1])
+        # The horizontal blur of a band of rows covers the rows its vertical taps reach beyond the band
+        margin = self._blur_radius + 1
 
-        self.extract_blur_x["u_texel_size"] = texel_uv_size
-        self.blur_y_power["u_texel_size"] = texel_uv_size
+        for index, rows in levels:
+            ping_pong = self.chain[index]
+            history = self.history.levels[index]
+            texel_uv_size = (1.0 / ping_pong.size[0], 1.0 / ping_pong.size[1])
 
-        # blur ping onto pong
-        ping_pong.bind(0)
-        PostEffect.fullscreen_quad.render(self.extract_blur_x)
-        ping_pong.flip_buffers()
+            self.begin_timing(f'Level {index}')
+            self.extract_blur_x["u_texel_size"] = texel_uv_size
+
+            ping_pong.bind(0)
+            self.scissor_rows(ping_pong.framebuffer, rows, margin)
+            PostEffect.fullscreen_quad.render(self.extract_blur_x)
+            ping_pong.flip_buffers()
+
+            # Blur vertically into the history of this level, blending with what it held
+            self.blur_y_temporal["u_texel_size"] = texel_uv_size
+
+            ping_pong.texture.use(0)
+            history.texture.use(1)
+            history.framebuffer.use()
+            self.scissor_rows(history.framebuffer, rows)
+            PostEffect.fullscreen_quad.render(self.blur_y_temporal)
+
+            if rows is None:
+                history.flip_buffers()
+            else:
+                # Only the band is new on the side just written, the other rows are only current on the side being read.
+                # Copy the band over instead of flipping, so the history stays whole on one side
+                history.flip_buffers()
+                history.bind(0)
+                self.scissor_rows(history.framebuffer, rows)
+                PostEffect.fullscreen_quad.render(RenderTarget.blit_program)
+                history.flip_buffers()
+
+                self.scissor_rows(history.framebuffer, None)
+            self.end_timing()
+
+        #clear texture 1 so that the bottom of the chain reads from a unbound black texture
+        gl.glActiveTexture(gl.GL_TEXTURE0 + 1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        # Add the light of each level up the chain, into the pyramid
+        self.begin_timing('Accumulate')
+        last = None
+        for index in reversed(range(len(self.chain))):
+            ping_pong = self.chain[index]
+
+            if last is not None:
+                last.texture.use(1)
+
+            self.history.levels[index].texture.use(0)
+            ping_pong.framebuffer.use()
+            PostEffect.fullscreen_quad.render(self.bloom_accumulate)
+            ping_pong.flip_buffers()
+
+            last = ping_pong
+        self.end_timing()
+
+        # Back to reading last frame's history, so the next viewport group blends with the same light this one did
+        for index, rows in levels:
+            if rows is None:
+                self.history.levels[index].flip_buffers()
+
+    # Restrict the following draws into framebuffer to rows (first row, row count) grown by margin, None for every row.
+    # Must be called after the framebuffer is bound, as binding it resets the scissor box to its viewport
+    def scissor_rows(self, framebuffer, rows, margin=0):
+        x, y, width, height = framebuffer.viewport
+        if rows is not None:
+            first, count = rows
+            y = max(0, first - margin)
+            height = min(height, first + count + margin) - y
+
+        gl.glScissor(x, y, width, height)
+
+    # The levels to blur this frame, as (index, rows) where rows is None for the whole level or (first row, row count).
+    # The levels are spread over temporal_interval frames, giving each frame a similar share of the texels. The top level
+    # alone holds three quarters of them, so the levels that would unbalance the frames (more than a quarter of a frame's
+    # share) are blurred a band of rows per frame instead of whole on one frame
+    def get_temporal_levels(self):
+        interval = self._temporal_interval
+        total = sum(level.size[0] * level.size[1] for level in self.chain)
+
+        slots = [[] for _ in range(interval)]
+        texels = [0] * interval
+        for index, level in enumerate(self.chain):
+            width, height = level.size
+
+            if interval > 1 and height >= interval and width * height * interval * 4 > total:
+                for band in range(interval):
+                    first = height * band // interval
+                    count = height * (band + 1) // interval - first
+                    slots[band].append((index, (first, count)))
+                    texels[band] += width * count
+                continue
+
+            slot = texels.index(min(texels))
+            slots[slot].append((index, None))
+            texels[slot] += width * height
+
+        return slots[self._temporal_frame % interval]
+
+    # Same passes as apply_gaussian, as compute dispatches.
+    # The threshold is applied once per texel as it is loaded, rather than to each bilinear fetch
+    def apply_gaussian_compute(self, source_texture):
+
+        # Downsample the source down the chain
+        self.begin_timing('Downsample')
+        for ping_pong in self.chain:
+            self.dispatch(self.compute_downsample, source_texture, ping_pong, 8, 8)
+            source_texture = ping_pong.texture
+
+            if self.hardware_downsample:
+                self.pyramid.generate_mipmaps()
+                break
+        self.end_timing()
+
+        # Threshold and blur each level horizontally
+        for index, ping_pong in enumerate(self.chain):
+            self.begin_timing(f'Level {index}')
+            self.dispatch(self.compute_blur_x, ping_pong.texture, ping_pong, Bloom.compute_tile_size, 1)
+            self.end_timing()
+
+        #clear texture 1 so that the bottom of the chain reads from a unbound black texture
+        gl.glActiveTexture(gl.GL_TEXTURE0 + 1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        # Blur vertically up the chain, adding the level below
+        last = None
+        for index in reversed(range(len(self.chain))):
+            ping_pong = self.chain[index]
+
+            self.begin_timing(f'Level {index}')
+            if last is not None:
+                last.texture.use(1)
+
+            self.dispatch(self.compute_blur_y, ping_pong.texture, ping_pong, 1, Bloom.compute_tile_size)
+            self.end_timing()
+
+            last = ping_pong
+
+    # Run a compute program reading source_texture and writing the render target side of ping_pong, then flip it
+    def dispatch(self, program, source_texture, ping_pong, group_width, group_height):
+        source_texture.use(0)
+
+        output_texture = ping_pong.output_texture
+        gl.glBindImageTexture(0, output_texture.glo, output_texture.level, gl.GL_FALSE, 0, gl.GL_WRITE_ONLY, output_texture.internal_format)
+
+        width, height = ping_pong.size
+        program.run(math.ceil(width / group_width), math.ceil(height / group_height))
+
+        # Make the image writes visible to the texture fetches of the following passes
+        gl.glMemoryBarrier(gl.GL_SHADER_IMAGE_ACCESS_BARRIER_BIT | gl.GL_TEXTURE_FETCH_BARRIER_BIT)
 
-        # blur pong back to ping
-        ping_pong.bind(0)
-        PostEffect.fullscreen_quad.render(self.blur_y_power)
         ping_pong.flip_buffers()
 
-        pass
+    def apply_dual_filter(self, source_texture):
+
+        # Threshold and downsample the source into the top of the chain
+        self.begin_timing('Level 0')
+        self.bloom_prefilter["u_texel_size"] = (1.0 / source_texture.width, 1.0 / source_texture.height)
+
+        self.chain[0].framebuffer.use()
+        source_texture.use(0)
+        PostEffect.fullscreen_quad.render(self.bloom_prefilter)
+        self.chain[0].flip_buffers()
+        self.end_timing()
+
+        # Downsample each level into the next
+        last = self.chain[0]
+        for index, ping_pong in enumerate(self.chain[1:], 1):
+            self.begin_timing(f'Level {index}')
+            self.dual_filter_down["u_texel_size"] = (1.0 / last.size[0], 1.0 / last.size[1])
+
+            ping_pong.framebuffer.use()
+            last.texture.use(0)
+            PostEffect.fullscreen_quad.render(self.dual_filter_down)
+            ping_pong.flip_buffers()
+            self.end_timing()
+
+            last = ping_pong
+
+        #clear texture 1 so that the bottom of the chain reads from a unbound black texture
+        gl.glActiveTexture(gl.GL_TEXTURE0 + 1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        # Upsample back up the chain, adding each level's light
+        last = None
+        for index in reversed(range(len(self.chain))):
+            ping_pong = self.chain[index]
+
+            self.begin_timing(f'Level {index}')
+            if last is not None:
+                self.dual_filter_up["u_texel_size"] = (1.0 / last.size[0], 1.0 / last.size[1])
+                last.texture.use(1)
+
+            ping_pong.bind(0)
+            PostEffect.fullscreen_quad.render(self.dual_filter_up)
+            ping_pong.flip_buffers()
+            self.end_timing()
+
+            last = ping_pong
 
     def apply_blur_down(self, ping_pong):
 
@@ -195,10 +654,11 @@ class Bloom(PostEffect):
 
         pass
 
-    def downsample_to_ping(self, source_texture):
+    def downsample_to_ping(self, source_texture, hardware_downsample):
 
         program = RenderTarget.blit_program #TODO:Set to extract
 
+        self.begin_timing('Downsample')
         for ping_pong in self.chain:
 
             ping_pong.framebuffer.use()
@@ -208,7 +668,116 @@ class Bloom(PostEffect):
             ping_pong.flip_buffers()
             source_texture = ping_pong.texture
 
+            # Only the top is drawn, the driver fills in the rest of the mip chain from it
+            if hardware_downsample:
+                self.pyramid.generate_mipmaps()
+                break
+
             program = RenderTarget.blit_program
+        self.end_timing()
+
+    # Opt-in temporal amortization of the gaussian algorithm for slowly changing scenes.
+    # Each level is only blurred every temporal_interval frames, in a round robin that spreads the levels evenly over
+    # the frames (the largest levels a band of rows at a time), and keeps its light in a history in between.
+    # The most expensive frame blurs about 52% of the pyramid's texels at an interval of 2 and about 36% at 3, see
+    # get_temporal_levels(), but every frame still downsamples, adds all levels up the chain and copies the blurred bands,
+    # so the saving on the blur is less than the interval. benchmark.py measures the average and the peak frame.
+    # Light lags moving sources by up to interval - 1 frames.
+    # temporal_blend is the weight of a level's new blur against its history: 1.0 replaces the history, lower values
+    # smooth the steps between updates but leave trails behind moving lights. There are no motion vectors to reproject with.
+    # Uses the fragment backend
+    @property
+    def temporal(self):
+        return self._temporal
+
+    @temporal.setter
+    def temporal(self, value):
+        if value == self._temporal:
+            return
+
+        self._temporal = value
+        if value:
+            self.load_blur_programs()
+            self.allocate_history()
+        else:
+            self.history.release()
+            self.history = None
+
+    @property
+    def temporal_interval(self):
+        return self._temporal_interval
+
+    @temporal_interval.setter
+    def temporal_interval(self, value):
+        value = min(max(1, int(value)), Bloom.max_temporal_interval)
+        if value != self._temporal_interval:
+            self._temporal_interval = value
+            PostEffect.state_serial += 1
+
+    @property
+    def temporal_blend(self):
+        return self._temporal_blend
+
+    @temporal_blend.setter
+    def temporal_blend(self, value):
+        value = min(max(Bloom.min_temporal_blend, float(value)), 1.0)
+        if value != self._temporal_blend:
+            self._temporal_blend = value
+            PostEffect.state_serial += 1
+
+    def is_temporal(self):
+        return self._temporal and self.algorithm == Bloom.GAUSSIAN
+
+    # Falls back to FRAGMENT where compute shaders are not available
+    @property
+    def backend(self):
+        return self._backend
+
+    @backend.setter
+    def backend(self, value):
+        if value == Bloom.COMPUTE and not Bloom.compute_supported(self.context):
+            value = Bloom.FRAGMENT
+
+        if value != self._backend:
+            self._backend = value
+            self.load_blur_programs()
+
+    # Bloom composites at full resolution, render_scale only applies to its pyramid
+    def get_output_scale(self):
+        return 1.0
+
+    @PostEffect.render_scale.setter
+    def render_scale(self, value):
+        previous = self.get_pyramid_scale()
+        PostEffect.render_scale.fset(self, value)
+
+        if self.get_pyramid_scale() != previous:
+            self.allocate_whole_chain()
+
+    @property
+    def blur_radius(self):
+        return self._blur_radius
+
+    @blur_radius.setter
+    def blur_radius(self, value):
+        # A radius of 0 would be a single tap kernel, with no offsets for the blur loop to read
+        value = min(max(1, int(value)), Bloom.max_blur_radius)
+        if value != self._blur_radius:
+            self._blur_radius = value
+            self.load_blur_programs()
+
+    @property
+    def blur_sigma(self):
+        return self._blur_sigma
+
+    # None picks the sigma that fits the kernel to blur_radius, see gaussian_kernel.default_sigma()
+    @blur_sigma.setter
+    def blur_sigma(self, value):
+        if value is not None:
+            value = max(Bloom.min_blur_sigma, float(value))
+        if value != self._blur_sigma:
+            self._blur_sigma = value
+            self.load_blur_programs()
 
     @property
     def threshold(self):
@@ -216,8 +785,14 @@ class Bloom(PostEffect):
 
     @threshold.setter
     def threshold(self, value):
+        thresholded = self._threshold > 0.0
         self._threshold = value
-        self.extract_blur_x["u_threshold"] = value
+        self.set_uniform("u_threshold", value)
+
+        # Switch to the variants with or without thresholding
+        if (value > 0.0) != thresholded:
+            self.load_blur_programs()
+            self.load_dual_filter(self.context)
 
     @property
     def power(self):
@@ -226,10 +801,28 @@ class Bloom(PostEffect):
     @power.setter
     def power(self, value):
         self._power = value * 0.5
-        self.blur_y_power["u_power"] = value * 0.5
+        self.set_property_uniforms('power', value)
 
     def show_ui(self):
         super().show_ui()
 
+        algorithm_index = Bloom.algorithms.index(self.algorithm)
+        algorithm_index = imgui.combo(f'Algorithm##{self.ui_index}', algorithm_index, Bloom.algorithms)[1]
+        self.algorithm = Bloom.algorithms[algorithm_index]
+
         self.power = imgui.slider_float(f'Strength##{self.ui_index}', self.power, 0.0, 5.0)[1]
-        self.threshold = imgui.slider_float(f'Threshold##{self.ui_index}', self.threshold, 0.0, 16.0, power=2.0)[1]
\ No newline at end of file
+        self.threshold = imgui.slider_float(f'Threshold##{self.ui_index}', self.threshold, 0.0, 16.0, power=2.0)[1]
+        self.levels = imgui.slider_int(f'Levels##{self.ui_index}', self.levels, 1, 8)[1]
+
+        if self.algorithm == Bloom.GAUSSIAN:
+            if Bloom.compute_supported(self.context):
+                backend_index = Bloom.backends.index(self.backend)
+                backend_index = imgui.combo(f'Backend##{self.ui_index}', backend_index, Bloom.backends)[1]
+                self.backend = Bloom.backends[backend_index]
+
+            self.blur_radius = imgui.slider_int(f'Blur Radius##{self.ui_index}', self.blur_radius, 1, 16)[1]
+
+            self.temporal = imgui.checkbox(f'Temporal##{self.ui_index}', self.temporal)[1]
+            if self.temporal:
+                self.temporal_interval = imgui.slider_int(f'Temporal Interval##{self.ui_index}', self.temporal_interval, 1, Bloom.max_temporal_interval)[1]
+                self.temporal_blend = imgui.slider_float(f'Temporal Blend##{self.ui_index}', self.temporal_blend, Bloom.min_temporal_blend, 1.0)[1]
\ No newline at end of file
@@ -1,6 +1,5 @@
 
 import arcade
-import imgui
 from postprocessing.post_effect import PostEffect
 
 try:
@@ -11,14 +10,23 @@ except:
 
 class ChromaticAberration(PostEffect):
 
+    property_uniforms = {'distance_scale': 'u_distance_scale'}
+
+    # Must not exceed MAX_SAMPLES in chromatic_abberation.fs
+    max_sample_count = 25
+
+    quality_settings = {
+        PostEffect.LOW: {'sample_count': 5},
+        PostEffect.MEDIUM: {'sample_count': 9},
+        PostEffect.HIGH: {'sample_count': 15},
+        PostEffect.ULTRA: {'sample_count': 25},
+    }
+
     def __init__(self, context, window_size):
         super().__init__(context, window_size)
-        self.program = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/chromatic_abberation.fs",
-        )
-
-        self.program['t_source'] = 0
+        self._sample_count = None
+        self.sample_count = 15
+        self.create_parameter_block()
 
         self._axial = 0.0
         self._transverse = 0.0
@@ -28,10 +36,40 @@ class ChromaticAberration(PostEffect):
 
         self.distance_scale = 0.01
 
-        newWeights = self.compute_weights(15)
+        self.set_sample_weights()
+
+    # The shader is compiled with a loop of the matching length for each sample count
+    def load_sample_program(self, sample_count):
+        program = self.load_program("postprocessing/effects/shaders/chromatic_abberation.fs", {"SAMPLE_COUNT": str(sample_count)})
+        program['t_source'] = 0
+        return program
+
+    def set_sample_weights(self):
+        newWeights = self.compute_weights(self._sample_count)
+
+        self.set_uniform('u_channel_weights', newWeights[0])
+        self.set_uniform('u_channel_sums', newWeights[1])
 
-        self.program['u_channel_weights'] = newWeights[0]
-        self.program['u_channel_sums'] = newWeights[1]
+    # Samples spread over the aberration, fewer are cheaper but show banding on strong aberration
+    @property
+    def sample_count(self):
+        return self._sample_count
+
+    @sample_count.setter
+    def sample_count(self, value):
+        # Odd counts keep a sample on the pixel itself, with as many on either side
+        value = min(max(1, int(value)), ChromaticAberration.max_sample_count) // 2 * 2 + 1
+        if value == self._sample_count:
+            return
+
+        self._sample_count = value
+        self.program = self.load_sample_program(value)
+
+        if self.parameters is not None:
+            self.set_sample_weights()
+
+    def preload_quality(self, tier):
+        self.load_sample_program(ChromaticAberration.quality_settings[tier]['sample_count'])
 
 
     def compute_weights(self, count):
@@ -65,9 +103,13 @@ class ChromaticAberration(PostEffect):
 
         return (weights, weight_sums)
 
+    #No aberration is mixed in, or all of its samples land on the same pixel
+    def is_noop(self):
+        return self.axial == 0.0 or self.distance_scale == 0.0
+
     def apply(self, render_target_pair):
         render_target_pair.bind(0)
-        PostEffect.fullscreen_quad.render(self.program)
+        PostEffect.fullscreen_quad.render(self.use_program())
 
     def clamp(value, min_val, max_val):
         return max(min(value,max_val),min_val)
@@ -79,12 +121,17 @@ class ChromaticAberration(PostEffect):
     @axial.setter
     def axial(self, value):
         self._axial = ChromaticAberration.clamp(value, 0.0, 1.0)
-        self.program['u_axial'] = self._axial
+        self.set_property_uniforms('axial', value)
 
         #Ensure that axial + transverse do not sum to more than 1.0
         if self._axial + self.transverse > 1.0:
             self.transverse = 1.0 - self._axial
      
+    def get_property_uniforms(self, name, value):
+        if name == 'axial':
+            return {'u_axial': ChromaticAberration.clamp(value, 0.0, 1.0)}
+        return super().get_property_uniforms(name, value)
+
     @property
     def transverse(self):
         return self._transverse
@@ -105,7 +152,7 @@ class ChromaticAberration(PostEffect):
     @distance_scale.setter
     def distance_scale(self,value):
         self._distance_scale = value
-        self.program['u_distance_scale'] = value
+        self.set_uniform('u_distance_scale', value)
 
     def show_ui(self):
         super().show_ui()
@@ -2,6 +2,7 @@
 import math
 import arcade
 from postprocessing.post_effect import PostEffect
+from postprocessing.pixel_stage import load_pixel_stage_program
 
 try:
     import imgui
@@ -11,14 +12,15 @@ except:
 
 class GreyScale(PostEffect):
 
+    pixel_stage = 'postprocessing/effects/shaders/greyscale.glsl'
+
+    property_uniforms = {'strength': 'u_strength', 'shadow_color': 'u_shadow_color', 'highlight_color': 'u_highlight_color'}
+
     def __init__(self, context, window_size):
         super().__init__(context, window_size)
 
-        self.program = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/greyscale.fs",
-        )
-        self.program['t_source'] = 0
+        self.program = load_pixel_stage_program(context, [self.pixel_stage])
+        self.create_parameter_block()
 
         self.strength = 1.0
         self.shadow_color = (0.0,0.0,0.0)
@@ -31,7 +33,7 @@ class GreyScale(PostEffect):
     @strength.setter
     def strength(self,value):
         self._strength = value
-        self.program['u_strength'] = value
+        self.set_uniform('u_strength', value)
 
     @property
     def shadow_color(self):
@@ -40,7 +42,7 @@ class GreyScale(PostEffect):
     @shadow_color.setter
     def shadow_color(self,value):
         self._shadow_color = value
-        self.program['u_shadow_color'] = value
+        self.set_uniform('u_shadow_color', value)
 
     @property
     def highlight_color(self):
@@ -49,11 +51,19 @@ class GreyScale(PostEffect):
     @highlight_color.setter
     def highlight_color(self, value):
         self._highlight_color = value
-        self.program['u_highlight_color'] = value
+        self.set_uniform('u_highlight_color', value)
+
+    def get_hdr_format(self):
+        if min(self.shadow_color) < 0.0 or min(self.highlight_color) < 0.0:
+            return 'f2'
+        return super().get_hdr_format()
+
+    def is_noop(self):
+        return self.strength == 0.0
 
     def apply(self, render_target_pair):
         render_target_pair.bind(0)
-        PostEffect.fullscreen_quad.render(self.program)
+        PostEffect.fullscreen_quad.render(self.use_program())
 
     def show_ui(self):
         super().show_ui()
@@ -6,13 +6,15 @@ uniform sampler2D t_half;
 uniform sampler2D t_quater;
 
 in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
 out vec4 out_color;
 
 void main() 
 {
     vec4 finalColor = texture(t_source, v_uv).rgba;
 
-    vec3 half_bloom = texture(t_half, v_uv).rgb;
+    vec3 half_bloom = texture(t_half, clamp_to_viewport(v_uv, vec2(textureSize(t_half, 0)))).rgb;
     vec3 quater_bloom = texture(t_quater, v_uv).rgb; 
 
     finalColor.rgb += half_bloom;
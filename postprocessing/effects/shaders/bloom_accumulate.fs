@@ -0,0 +1,20 @@
+#version 330
+
+//Temporal bloom, step 2 (see Bloom.temporal)
+//Adds the light of a level to the accumulated light of the levels below it
+
+uniform sampler2D t_source;//Light of this level
+uniform sampler2D t_last;//Accumulated light of the level below
+
+in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
+out vec4 out_color;
+
+void main() 
+{
+    vec3 final_color = texture(t_source, v_uv).rgb;
+    final_color += texture(t_last, clamp_to_viewport(v_uv, vec2(textureSize(t_last, 0)))).rgb;
+
+    out_color = vec4(final_color, 1.0);
+}
@@ -0,0 +1,26 @@
+//Parameters shared by all bloom shaders, see Bloom
+
+//0 for a threshold of zero, which keeps all light and skips thresholding altogether. Replaced from Python
+#define THRESHOLD 1
+
+#define MAX_TAPS 16
+
+layout(std140) uniform EffectParameters
+{
+    float u_threshold;
+    float u_power;
+    float u_offsets[MAX_TAPS];//Offsets in texels, each tap past the center is fetched on both sides
+    float u_weights[MAX_TAPS];//Normalized weights
+};
+
+vec3 extract_bright(vec3 sample)
+{
+#if THRESHOLD
+    float brightness = max(max(sample.x, sample.y), sample.z);
+    float knee = (brightness - u_threshold) / brightness;
+    knee = clamp(knee, 0.0, 1.0);
+    return sample * knee;
+#else
+    return sample;
+#endif
+}
\ No newline at end of file
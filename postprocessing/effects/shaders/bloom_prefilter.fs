@@ -0,0 +1,30 @@
+#version 330
+
+//Dual filter bloom, step 1
+//Thresholds the source once and downsamples it to the first level of the chain with 4 bilinear taps
+
+uniform sampler2D t_source;
+uniform vec2 u_texel_size;//Texel size of the source
+
+#include "bloom_parameters.glsl"
+
+in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
+out vec4 out_color;
+
+vec3 extract_tap(vec2 uv)
+{
+    return extract_bright(texture(t_source, clamp_to_viewport(uv, 1.0 / u_texel_size)).rgb);
+}
+
+void main() 
+{
+    //Each tap lands on a texel corner, so the 4 taps together average a 4x4 block of the source
+    vec3 final_color = extract_tap(v_uv + vec2(-1.0, -1.0) * u_texel_size);
+    final_color += extract_tap(v_uv + vec2( 1.0, -1.0) * u_texel_size);
+    final_color += extract_tap(v_uv + vec2(-1.0,  1.0) * u_texel_size);
+    final_color += extract_tap(v_uv + vec2( 1.0,  1.0) * u_texel_size);
+
+    out_color = vec4(final_color * 0.25, 1.0);
+}
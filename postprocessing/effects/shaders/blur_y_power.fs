@@ -1,46 +1,48 @@
 #version 330
 
+//Number of entries in the linear sampled kernel, replaced from Python to match the blur radius
+#define TAP_COUNT 4
+
+//Temporal bloom (see Bloom.temporal): blend with this level's history in t_last instead of adding the level below
+#define TEMPORAL 0
+
 uniform sampler2D t_source;
 uniform sampler2D t_last;
-const int samples = 11;
-const int midpoint = samples/2;
 
-uniform float u_weights[11];
-uniform float u_weight_sum;
 uniform vec2 u_texel_size;
 
-uniform float u_power;//Scale bloom effect up or down in intensity
+#if TEMPORAL
+uniform float u_blend;//Weight of the new blur against the history
+#endif
+
+#include "bloom_parameters.glsl"
 
 in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
 out vec4 out_color;
 
-void main() 
+vec3 blur_tap(float offset)
 {
-    vec3 color = texture(t_source, v_uv).rgb;
+    vec2 uv = v_uv + vec2(0.0, offset * u_texel_size.y);
+    return texture(t_source, clamp_to_viewport(uv, 1.0 / u_texel_size)).rgb;
+}
 
-    vec2 sample_pos = v_uv;
-    sample_pos.y -= midpoint * u_texel_size.y;
+#include "gaussian_blur.glsl"
 
-    vec3 final_color = vec3(0.0);
-
-    for(int i = 0; i < samples; i++)
-    {
-        vec3 sample = texture(t_source, sample_pos).xyz;
-
-        //Apply guassian weight
-        final_color += sample * u_weights[i];
-        //Advance sample position
-        sample_pos.y += u_texel_size.y;
-    }
-
-    //Divide by weight sum to ensure no gain or loss of energy
-    final_color /= u_weight_sum; //TODO: Reciprocal on CPU
+void main() 
+{
+    vec3 final_color = gaussian_blur();
 
     //Apply power
     final_color *= u_power;
 
+#if TEMPORAL
+    final_color = mix(texture(t_last, v_uv).rgb, final_color, u_blend);
+#else
     //Apply post processing from last step
-    final_color += texture(t_last, v_uv).rgb;
+    final_color += texture(t_last, clamp_to_viewport(v_uv, vec2(textureSize(t_last, 0)))).rgb;
+#endif
 
     out_color = vec4(final_color, 1.0);
 }
\ No newline at end of file
@@ -2,40 +2,52 @@
 
 // Color passed in from the vertex shader
 in vec2 v_uv;
+in vec2 v_local_uv;
+
+#include "postprocessing/core_shaders/viewport.glsl"
 
 // The pixel we are writing to in the framebuffer
 out vec4 fragColor;
 
 uniform sampler2D t_source;
 
-uniform float u_axial;
-uniform float u_transverse;
-
 const float u_strength = 0.01;
 
-const int sample_count = 15;
-uniform vec3 u_channel_weights [sample_count];
-uniform vec3 u_channel_sums;
+//Number of samples, replaced from Python for the quality tier (see ChromaticAberration.sample_count)
+#define SAMPLE_COUNT 15
 
-uniform float u_distance_scale;
+//Size of the weight array, the same for every sample count so all variants share one parameter block layout
+#define MAX_SAMPLES 25
+
+layout(std140) uniform EffectParameters
+{
+    float u_axial;
+    float u_transverse;
+    vec3 u_channel_weights [MAX_SAMPLES];
+    vec3 u_channel_sums;
+    float u_distance_scale;
+};
 
 void main() 
 {
 
-    vec2 direction = v_uv * 2.0 - 1.0;
+    //Aberration spreads from the center of the viewport, and scales with its size
+    vec2 direction = v_local_uv * 2.0 - 1.0;
+    vec2 viewport_size = v_viewport.zw - v_viewport.xy;
+    vec2 source_size = vec2(textureSize(t_source, 0));
 
     float dist = length(direction);
     direction /= dist;
 
-    int stepsPerSide = sample_count / 2;
+    int stepsPerSide = SAMPLE_COUNT / 2;
 
-    vec2 step = direction * dist * u_distance_scale / float(stepsPerSide);
+    vec2 step = direction * dist * u_distance_scale / float(stepsPerSide) * viewport_size;
     vec2 samplePos = v_uv - (step * float(stepsPerSide));
 
     vec3 colorSum = vec3(0.0);
-    for(int i = 0; i < sample_count; i++)
+    for(int i = 0; i < SAMPLE_COUNT; i++)
     {
-        colorSum += texture(t_source, samplePos).rgb * u_channel_weights[i];
+        colorSum += texture(t_source, clamp_to_viewport(samplePos, source_size)).rgb * u_channel_weights[i];
         samplePos += step;
     }
 
@@ -0,0 +1,25 @@
+#version 330
+
+//Dual filter bloom, step 2
+//Downsamples one level of the chain to the next with 5 bilinear taps
+
+uniform sampler2D t_source;
+uniform vec2 u_texel_size;//Texel size of the source level
+
+in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
+out vec4 out_color;
+
+void main() 
+{
+    vec2 source_size = 1.0 / u_texel_size;
+    vec3 final_color = texture(t_source, clamp_to_viewport(v_uv, source_size)).rgb * 4.0;
+
+    final_color += texture(t_source, clamp_to_viewport(v_uv + vec2(-1.0, -1.0) * u_texel_size, source_size)).rgb;
+    final_color += texture(t_source, clamp_to_viewport(v_uv + vec2( 1.0, -1.0) * u_texel_size, source_size)).rgb;
+    final_color += texture(t_source, clamp_to_viewport(v_uv + vec2(-1.0,  1.0) * u_texel_size, source_size)).rgb;
+    final_color += texture(t_source, clamp_to_viewport(v_uv + vec2( 1.0,  1.0) * u_texel_size, source_size)).rgb;
+
+    out_color = vec4(final_color * 0.125, 1.0);
+}
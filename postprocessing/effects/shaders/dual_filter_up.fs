@@ -0,0 +1,30 @@
+#version 330
+
+//Dual filter bloom, step 3
+//Upsamples the level below with a 4 tap tent filter, and adds this level's light on top
+
+uniform sampler2D t_source;
+uniform sampler2D t_last;
+uniform vec2 u_texel_size;//Texel size of the level below
+
+#include "bloom_parameters.glsl"
+
+in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
+out vec4 out_color;
+
+void main() 
+{
+    vec3 final_color = texture(t_source, v_uv).rgb * u_power;
+
+    vec2 last_size = 1.0 / u_texel_size;
+    vec3 last_color = texture(t_last, clamp_to_viewport(v_uv + vec2(-1.0, -1.0) * u_texel_size, last_size)).rgb;
+    last_color += texture(t_last, clamp_to_viewport(v_uv + vec2( 1.0, -1.0) * u_texel_size, last_size)).rgb;
+    last_color += texture(t_last, clamp_to_viewport(v_uv + vec2(-1.0,  1.0) * u_texel_size, last_size)).rgb;
+    last_color += texture(t_last, clamp_to_viewport(v_uv + vec2( 1.0,  1.0) * u_texel_size, last_size)).rgb;
+
+    final_color += last_color * 0.25;
+
+    out_color = vec4(final_color, 1.0);
+}
@@ -1,45 +1,28 @@
 #version 330
 
-uniform sampler2D t_source;
+//Number of entries in the linear sampled kernel, replaced from Python to match the blur radius
+#define TAP_COUNT 4
 
-const int samples = 11;
-const int midpoint = samples/2;
+uniform sampler2D t_source;
 
-uniform float u_weights[11];
-uniform float u_weight_sum;
 uniform vec2 u_texel_size;
 
-uniform float u_threshold;
+#include "bloom_parameters.glsl"
 
 in vec2 v_uv;
+#include "postprocessing/core_shaders/viewport.glsl"
+
 out vec4 out_color;
 
-void main() 
+vec3 blur_tap(float offset)
 {
-    vec3 color = texture(t_source, v_uv).rgb;
-
-    vec2 sample_pos = v_uv;
-    sample_pos.x -= midpoint * u_texel_size.x;
-
-    vec3 final_color = vec3(0.0);
+    vec2 uv = v_uv + vec2(offset * u_texel_size.x, 0.0);
+    return extract_bright(texture(t_source, clamp_to_viewport(uv, 1.0 / u_texel_size)).rgb);
+}
 
-    for(int i = 0; i < samples; i++)
-    {
-        vec3 sample = texture(t_source, sample_pos).xyz;
+#include "gaussian_blur.glsl"
 
-        float brightness = max(max(sample.x, sample.y), sample.z);
-        float knee = (brightness - u_threshold) / brightness;
-        knee = clamp(knee, 0.0, 1.0);
-        sample *= knee;
-
-        //Apply guassian weight
-        final_color += sample * u_weights[i];
-        //Advance sample position
-        sample_pos.x += u_texel_size.x;
-    }
-
-    //Divide by weight sum to ensure no gain or loss of energy
-    final_color /= u_weight_sum;
-
-    out_color = vec4(final_color, 1.0);
+void main() 
+{
+    out_color = vec4(gaussian_blur(), 1.0);
 }
\ No newline at end of file
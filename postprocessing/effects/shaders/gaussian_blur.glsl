@@ -0,0 +1,15 @@
+//Separable blur with the linear sampled kernel of the bloom parameters, see gaussian_kernel.py.
+//The including shader defines TAP_COUNT and blur_tap(offset), the color the given number of texels from the center
+//along the blur axis
+vec3 gaussian_blur()
+{
+    vec3 final_color = blur_tap(0.0) * u_weights[0];
+
+    for(int i = 1; i < TAP_COUNT; i++)
+    {
+        //Apply guassian weight, each bilinear fetch covers 2 texels of the kernel
+        final_color += (blur_tap(-u_offsets[i]) + blur_tap(u_offsets[i])) * u_weights[i];
+    }
+
+    return final_color;
+}
\ No newline at end of file
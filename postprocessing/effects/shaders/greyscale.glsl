@@ -0,0 +1,20 @@
+#include "luminance.glsl"
+
+layout(std140) uniform EffectParameters
+{
+    float u_strength;
+    vec3 u_shadow_color;
+    vec3 u_highlight_color;
+};
+
+vec4 apply_stage(vec4 sourceColor, vec2 uv) {
+
+    //Compute the luminance of the color
+    float luminance = clamp(calculate_lumanince(sourceColor.rgb), 0.0, 1.0);
+
+    vec3 greyColor = mix(u_shadow_color, u_highlight_color, luminance);
+
+    //Add split tone color to original color
+    vec3 finalColor = mix(sourceColor.rgb, greyColor, u_strength);
+    return vec4(finalColor, sourceColor.a);
+}
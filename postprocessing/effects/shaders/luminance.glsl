@@ -0,0 +1,13 @@
+#define USE_PRECEPTUAL_LUMANINCE 1
+//If 0, use vector length instead
+
+const vec3 perceptual_weights = vec3(0.2126, 0.7152, 0.0722);
+
+float calculate_lumanince(vec3 color){
+    //Multiply each component of the color by it's perceptual weight, and then add the results together
+#if USE_PRECEPTUAL_LUMANINCE
+    return dot(color, perceptual_weights);
+#else
+    return length(color);//Vector legnth probably not the best way to do this :(
+#endif
+}
\ No newline at end of file
@@ -0,0 +1,29 @@
+#include "luminance.glsl"
+
+layout(std140) uniform EffectParameters
+{
+    float u_threshold;
+    float u_crossover_half;
+    vec3 u_shadow_color;
+    vec3 u_highlight_color;
+};
+
+vec4 apply_stage(vec4 color, vec2 uv) {
+
+    vec3 sourceColor = color.xyz;
+
+    //Compute the luminance of the color
+    float luminance = calculate_lumanince(sourceColor);
+
+    //Use smoothstep to find out where we are in the crossover band centered aroud the threshold.
+    //This clamps to 0.0 anywhere past the full shadow side, and 1.0 anywhere past the full highlight side
+    float lerpTime = smoothstep(u_threshold - u_crossover_half,u_threshold + u_crossover_half, luminance);
+
+    //Blend the 2 split tone colors together based on where we are in the crossover band, or select 1 if we are fully outside of it
+    vec3 splitToneColor = mix(u_shadow_color, u_highlight_color, lerpTime);
+
+    //Add split tone color to original color
+    vec3 finalColor = sourceColor + splitToneColor;
+
+    return vec4(finalColor, 0.0);
+}
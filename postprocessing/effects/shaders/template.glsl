@@ -0,0 +1,7 @@
+//Pixel stage template, see postprocessing/pixel_stage.py
+//Declare uniforms here, they are namespaced automatically if this stage is fused with others
+
+vec4 apply_stage(vec4 sourceColor, vec2 uv) {
+
+    return sourceColor;
+}
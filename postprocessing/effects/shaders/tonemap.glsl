@@ -0,0 +1,15 @@
+layout(std140) uniform EffectParameters
+{
+    float u_whitePoint_2;//Pre squred white point
+};
+
+vec4 apply_stage(vec4 color, vec2 uv) {
+
+    vec3 hdrColor = color.xyz;
+
+    vec3 numerator = hdrColor * (1.0 + (hdrColor / u_whitePoint_2));
+
+    //Reinhard tonemapping, basic but works good enough for this
+    vec3 ldrColor = numerator / (1.0 + hdrColor);
+    return vec4(ldrColor, 0.0);
+}
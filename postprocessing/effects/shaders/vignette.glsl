@@ -0,0 +1,22 @@
+layout(std140) uniform EffectParameters
+{
+    float u_inner_distance;
+    float u_outer_distance;
+    vec4 u_color;
+};
+
+vec4 apply_stage(vec4 sourceColor, vec2 uv)
+{
+    vec3 color = sourceColor.rgb;
+
+    //Remap to -1 1 so length is distance from center
+    vec2 pos = (uv - 0.5) * 2.0;
+
+    float dist = length(pos);
+
+    float factor = smoothstep(u_inner_distance, u_outer_distance, dist);
+
+    vec3 finalColor = mix(color, u_color.rgb, factor);
+
+    return vec4(finalColor, 1.0);
+}
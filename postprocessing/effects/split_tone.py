@@ -2,6 +2,7 @@
 import math
 import arcade
 from postprocessing.post_effect import PostEffect
+from postprocessing.pixel_stage import load_pixel_stage_program
 
 try:
     import imgui
@@ -19,14 +20,15 @@ except:
 #NOTE: Values can be HDR if this stage runs before tonemapping
 class SplitTone(PostEffect):
 
+    pixel_stage = 'postprocessing/effects/shaders/split_tone.glsl'
+
+    property_uniforms = {'threshold': 'u_threshold', 'shadow_color': 'u_shadow_color', 'highlight_color': 'u_highlight_color'}
+
     def __init__(self, context, window_size):
         super().__init__(context, window_size)
 
-        self.program = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/split_tone.fs",
-        )
-        self.program['t_source'] = 0
+        self.program = load_pixel_stage_program(context, [self.pixel_stage])
+        self.create_parameter_block()
 
         self.threshold = 0.5
         self.crossover = 0.05
@@ -40,7 +42,7 @@ class SplitTone(PostEffect):
     @threshold.setter
     def threshold(self,value):
         self._threshold = value
-        self.program['u_threshold'] = value
+        self.set_uniform('u_threshold', value)
 
     @property
     def crossover(self):
@@ -48,9 +50,14 @@ class SplitTone(PostEffect):
 
     @crossover.setter
     def crossover(self,value):
-        value = max(0.0, value)
-        self._crossover = value
-        self.program['u_crossover_half'] = value * 0.5
+        self._crossover = max(0.0, value)
+        self.set_property_uniforms('crossover', value)
+
+    #The shader takes half of the crossover band, on either side of the threshold
+    def get_property_uniforms(self, name, value):
+        if name == 'crossover':
+            return {'u_crossover_half': max(0.0, value) * 0.5}
+        return super().get_property_uniforms(name, value)
 
     @property
     def shadow_color(self):
@@ -59,7 +66,7 @@ class SplitTone(PostEffect):
     @shadow_color.setter
     def shadow_color(self,value):
         self._shadow_color = value
-        self.program['u_shadow_color'] = value
+        self.set_uniform('u_shadow_color', value)
 
     @property
     def highlight_color(self):
@@ -68,11 +75,21 @@ class SplitTone(PostEffect):
     @highlight_color.setter
     def highlight_color(self, value):
         self._highlight_color = value
-        self.program['u_highlight_color'] = value
+        self.set_uniform('u_highlight_color', value)
+
+    #Nothing is added to either shadows or highlights
+    def is_noop(self):
+        return tuple(self.shadow_color) == (0.0, 0.0, 0.0) and tuple(self.highlight_color) == (0.0, 0.0, 0.0)
+
+    #Negative colors subtract, which can take HDR values below zero
+    def get_hdr_format(self):
+        if min(self.shadow_color) < 0.0 or min(self.highlight_color) < 0.0:
+            return 'f2'
+        return super().get_hdr_format()
 
     def apply(self, render_target_pair):
         render_target_pair.bind(0)
-        PostEffect.fullscreen_quad.render(self.program)
+        PostEffect.fullscreen_quad.render(self.use_program())
 
     def show_ui(self):
         super().show_ui()
@@ -2,6 +2,7 @@
 import math
 import arcade
 from postprocessing.post_effect import PostEffect
+from postprocessing.pixel_stage import load_pixel_stage_program
 
 try:
     import imgui
@@ -11,18 +12,20 @@ except:
 
 class Tempalte(PostEffect):
 
+    pixel_stage = 'postprocessing/effects/shaders/template.glsl'
+
     def __init__(self, context, window_size):
         super().__init__(context, window_size)
 
-        self.program = context.load_program(
-            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
-            fragment_shader="postprocessing/effects/shaders/template.fs",
-        )
-        self.program['t_source'] = 0
+        self.program = load_pixel_stage_program(context, [self.pixel_stage])
+
+    #The template passes the source through unchanged
+    def is_noop(self):
+        return True
 
     def apply(self, render_target_pair):
         render_target_pair.bind(0)
-        PostEffect.fullscreen_quad.render(self.program)
+        PostEffect.fullscreen_quad.render(self.use_program())
 
     def show_ui(self):
         super().show_ui()
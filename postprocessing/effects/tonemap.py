@@ -1,25 +1,30 @@
 
 import arcade
 from postprocessing.post_effect import PostEffect
-import imgui
+from postprocessing.pixel_stage import load_pixel_stage_program
+
+try:
+    import imgui
+    import imgui.core
+except:
+    pass
 
 #Basic tonemap from HDR -> LDR, currently via the simple Reinhard
 class Tonemap(PostEffect):
 
+    pixel_stage = 'postprocessing/effects/shaders/tonemap.glsl'
+
     def __init__(self, context, window_size):
         super().__init__(context, window_size)
 
-        self.program = context.load_program(
-            vertex_shader='postprocessing/core_shaders/fullscreen_quad.vs',
-            fragment_shader='postprocessing/effects/shaders/tonemap.fs'
-        )
-        self.program['t_source'] = 0
+        self.program = load_pixel_stage_program(context, [self.pixel_stage])
+        self.create_parameter_block()
     
         self.white_point = 2.0
 
     def apply(self, render_target_pair):
         render_target_pair.bind(0)
-        PostEffect.fullscreen_quad.render(self.program)
+        PostEffect.fullscreen_quad.render(self.use_program())
 
     def is_tonemapping_effect(self):
         return True
@@ -31,7 +36,13 @@ class Tonemap(PostEffect):
     @white_point.setter
     def white_point(self, value):
         self._white_point = value
-        self.program['u_whitePoint_2'] = value * value
+        self.set_property_uniforms('white_point', value)
+
+    #The shader takes the squared white point
+    def get_property_uniforms(self, name, value):
+        if name == 'white_point':
+            return {'u_whitePoint_2': value * value}
+        return super().get_property_uniforms(name, value)
 
 
     def show_ui(self):
@@ -0,0 +1,45 @@
+import arcade
+from postprocessing.post_effect import PostEffect
+from postprocessing.pixel_stage import load_pixel_stage_program
+from postprocessing.render_target import widest_hdr_format
+
+#Runs a sequence of pixel-local effects as one full-screen pass.
+#Created by the PostProcessingChain, each member effect keeps ownership of its parameters,
+#and its parameter block is bound to the binding index of its stage in the fused program
+class FusedEffect(PostEffect):
+
+    def __init__(self, context, window_size, effects):
+        super().__init__(context, window_size)
+
+        self.effects = effects
+        self.program = load_pixel_stage_program(context, [effect.pixel_stage for effect in effects])
+        self.program_cache.retain(self.program)
+
+    #Called by the chain when it drops this pass. The program is only released once no other fused pass uses it
+    def release(self):
+        self.release_override_states()
+        self.program_cache.release_program(self.program)
+        self.program = None
+
+    def apply(self, render_target_pair):
+        for index, effect in enumerate(self.effects):
+            if effect.parameters is not None:
+                effect.parameters.bind(index)
+
+        render_target_pair.bind(0)
+        PostEffect.fullscreen_quad.render(self.program)
+
+    #Each stage binds its member's parameters, so viewports override the members
+    def get_overridable_effects(self):
+        return self.effects
+
+    def get_hdr_format(self):
+        return widest_hdr_format([effect.get_hdr_format() for effect in self.effects])
+
+    #The fused pass tonemaps if any of its stages does, stages after the tonemapper run on
+    #the LDR result in registers before it is written out
+    def is_tonemapping_effect(self):
+        for effect in self.effects:
+            if effect.is_tonemapping_effect():
+                return True
+        return False
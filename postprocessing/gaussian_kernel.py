@@ -0,0 +1,55 @@
+import math
+
+#Gaussian kernels for separable blurs.
+#A kernel of a given radius has 2 * radius + 1 taps, but by placing a bilinear fetch between two neighbouring
+#texels at the point where the filter mixes them by their relative weights, one fetch returns the weighted
+#sum of both. This folds each pair of taps on either side of the center into one fetch, roughly halving
+#the texture fetches needed for the same kernel.
+
+def gaussian(distance, stdev):
+    # See this for the math: https://en.wikipedia.org/wiki/Gaussian_blur
+    preamble = 1.0 / math.sqrt(2.0 * math.pi * stdev * stdev)
+    exponent = -((distance * distance) / (2.0 * stdev * stdev))
+
+    return preamble * math.exp(exponent)
+
+#Default standard deviation for a radius, 3 standard deviations fit within the kernel
+def default_sigma(radius):
+    return max(radius / 3.0, 0.0001)
+
+#Normalized weights for texel offsets 0 to radius, the full kernel is symmetric around offset 0
+def gaussian_weights(radius, sigma=None):
+    if sigma is None:
+        sigma = default_sigma(radius)
+
+    weights = [gaussian(x, sigma) for x in range(radius + 1)]
+
+    total = weights[0] + 2.0 * sum(weights[1:])
+    return [weight / total for weight in weights]
+
+#Fold a gaussian kernel into bilinear fetches.
+#Returns (offsets, weights), both with the center tap first. Every other entry is fetched at +offset and -offset.
+def linear_sampled_kernel(radius, sigma=None):
+    discrete = gaussian_weights(radius, sigma)
+
+    offsets = [0.0]
+    weights = [discrete[0]]
+
+    for x in range(1, radius + 1, 2):
+        if x == radius:
+            #Odd tap left over at the edge of the kernel
+            offsets.append(float(x))
+            weights.append(discrete[x])
+            continue
+
+        weight = discrete[x] + discrete[x + 1]
+        if weight == 0.0:
+            #Both taps underflowed in a narrow kernel, the fetch adds nothing wherever it is
+            offsets.append(float(x))
+            weights.append(0.0)
+            continue
+
+        offsets.append((x * discrete[x] + (x + 1) * discrete[x + 1]) / weight)
+        weights.append(weight)
+
+    return (offsets, weights)
@@ -0,0 +1,139 @@
+import ctypes
+
+from pyglet import gl
+
+#Measures GPU time of named sections of a frame with timestamp queries.
+#Queries are kept in a ring of frames and only read back when their slot comes round again, several frames
+#later, by which time the GPU has long finished with them, so timing never stalls the pipeline.
+#Timestamps (rather than GL_TIME_ELAPSED) are used so that sections can be nested, e.g. the levels of a Bloom.
+class GpuTimer:
+
+    #Number of frames in flight before a frame's results are read back
+    frame_latency = 4
+
+    #Weight of the newest frame in the smoothed timings
+    smoothing = 0.1
+
+    def __init__(self, context):
+        self.context = context
+
+        self._frames = [_TimerFrame() for _ in range(GpuTimer.frame_latency)]
+        self._frame_index = 0
+        self._current = None
+        self._stack = []
+
+        #Section name -> milliseconds. Nested sections are named 'Parent/Child'
+        self.last_frame = {}
+        self.timings = {}
+
+    def begin_frame(self):
+        frame = self._frames[self._frame_index % len(self._frames)]
+        self._collect(frame)
+        frame.reset()
+
+        self._current = frame
+        self._stack = []
+
+    def end_frame(self):
+        self._current = None
+        self._frame_index += 1
+
+    #Sections are closed in the reverse order they were opened. A section that is opened
+    #several times within a frame reports the sum of its durations
+    def begin(self, name):
+        if self._current is None:
+            return
+
+        self._stack.append(name)
+        self._current.begin('/'.join(self._stack))
+
+    def end(self):
+        if self._current is None:
+            return
+
+        self._stack.pop()
+        self._current.end()
+
+    def _collect(self, frame):
+        if len(frame.sections) == 0:
+            return
+
+        #Should never happen with enough frames in flight, but rather drop a frame than block on it
+        if not frame.is_available():
+            return
+
+        durations = {}
+        for name, start, end in frame.sections:
+            if end is None:
+                continue
+            milliseconds = (frame.result(end) - frame.result(start)) / 1000000.0
+            durations[name] = durations.get(name, 0.0) + milliseconds
+
+        self.last_frame = durations
+
+        timings = {}
+        for name, milliseconds in durations.items():
+            previous = self.timings.get(name)
+            if previous is not None:
+                milliseconds = previous + (milliseconds - previous) * GpuTimer.smoothing
+            timings[name] = milliseconds
+        self.timings = timings
+
+    def release(self):
+        for frame in self._frames:
+            frame.release()
+        self._frames = []
+
+
+#The queries of one frame of a GpuTimer
+class _TimerFrame:
+
+    def __init__(self):
+        self._queries = []
+        self._used = 0
+        self._open = []
+
+        #(name, start query, end query)
+        self.sections = []
+
+    def reset(self):
+        self._used = 0
+        self._open = []
+        self.sections = []
+
+    def _timestamp(self):
+        if self._used == len(self._queries):
+            query = gl.GLuint()
+            gl.glGenQueries(1, query)
+            self._queries.append(query.value)
+
+        query = self._queries[self._used]
+        self._used += 1
+
+        gl.glQueryCounter(query, gl.GL_TIMESTAMP)
+        return query
+
+    def begin(self, name):
+        self._open.append(len(self.sections))
+        self.sections.append([name, self._timestamp(), None])
+
+    def end(self):
+        section = self.sections[self._open.pop()]
+        section[2] = self._timestamp()
+
+    #Queries complete in order, so the frame is done once its last query is
+    def is_available(self):
+        available = gl.GLint()
+        gl.glGetQueryObjectiv(self._queries[self._used - 1], gl.GL_QUERY_RESULT_AVAILABLE, available)
+        return available.value != 0
+
+    def result(self, query):
+        value = gl.GLuint64()
+        gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT, ctypes.byref(value))
+        return value.value
+
+    def release(self):
+        if len(self._queries) > 0:
+            gl.glDeleteQueries(len(self._queries), (gl.GLuint * len(self._queries))(*self._queries))
+        self._queries = []
+        self.reset()
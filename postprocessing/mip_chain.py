@@ -0,0 +1,180 @@
+import arcade
+from pyglet import gl
+from postprocessing.render_target import create_texture, bytes_per_pixel
+
+#Sizes of the levels of a pyramid starting at size, each level half the one above as in a GL mip chain:
+#no dimension goes below 1, and the chain stops early after a 1x1 level
+def mip_level_sizes(size, levels):
+    size = (max(1, size[0]), max(1, size[1]))
+
+    sizes = []
+    for _ in range(levels):
+        sizes.append(size)
+        if size == (1, 1):
+            break
+        size = (max(1, size[0] // 2), max(1, size[1] // 2))
+    return sizes
+
+#A pyramid of render targets stored as the mip levels of a single texture, with a framebuffer per level.
+#A level can be drawn into while another level of the same texture is sampled: use_level() restricts
+#sampling to a single level through GL_TEXTURE_BASE_LEVEL/MAX_LEVEL, so the two never form a feedback loop
+class MipChain:
+
+    def __init__(self, context, size, levels, texture_format):
+        self.context = context
+        self.sizes = mip_level_sizes(size, levels)
+        self.texture_format = texture_format
+
+        self.texture = create_texture(context, self.sizes[0], texture_format)
+
+        #arcade only allocates level 0
+        self.texture.use(0)
+        for level in range(1, len(self.sizes)):
+            width, height = self.sizes[level]
+            gl.glTexImage2D(gl.GL_TEXTURE_2D, level, self.texture._internal_format, width, height, 0,
+                            self.texture._format, self.texture._type, None)
+
+        self._sampled_level = None
+        self.use_level(0, 0)
+
+        self.framebuffers = [MipFramebuffer(context, self.texture, level, level_size) for level, level_size in enumerate(self.sizes)]
+        self.levels = [MipTexture(self, level) for level in range(len(self.sizes))]
+
+    #Bind the texture with only the given level visible to samplers
+    def use_level(self, level, unit):
+        self.texture.use(unit)
+
+        if level != self._sampled_level:
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, level)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, level)
+            self._sampled_level = level
+
+    #Fill every level below the first from the first with the driver's downsampling
+    def generate_mipmaps(self):
+        self.texture.build_mipmaps(0, len(self.sizes) - 1)
+        self._sampled_level = None
+
+    #GPU memory of every level
+    @property
+    def allocated_bytes(self):
+        return sum(width * height for width, height in self.sizes) * bytes_per_pixel[self.texture_format]
+
+    def release(self):
+        for framebuffer in self.framebuffers:
+            framebuffer.release()
+        self.texture.release()
+
+        self.framebuffers = []
+        self.levels = []
+
+
+#One level of a MipChain, usable wherever a texture is bound for sampling
+class MipTexture:
+
+    def __init__(self, chain, level):
+        self.chain = chain
+        self.level = level
+        self.size = chain.sizes[level]
+        self.width, self.height = self.size
+
+    def use(self, unit=0):
+        self.chain.use_level(self.level, unit)
+
+    @property
+    def glo(self):
+        return self.chain.texture.glo
+
+    @property
+    def internal_format(self):
+        return self.chain.texture._internal_format
+
+
+#A framebuffer drawing into one mip level of a texture
+class MipFramebuffer(arcade.gl.Framebuffer):
+
+    __slots__ = ()
+
+    def __init__(self, context, texture, level, size):
+        super().__init__(context, color_attachments=[texture])
+
+        if level == 0:
+            return
+
+        #arcade attaches level 0, attach the requested level instead
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._glo)
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_TEXTURE_2D, texture.glo, level)
+
+        self._width, self._height = size
+        self._viewport = 0, 0, self._width, self._height
+
+        self.ctx.active_framebuffer.use(force=True)
+
+
+#Two mip chains used as a ping-pong buffer per level.
+#Each entry of levels has the interface of a PingPongBuffer for that level, and flips independently
+class MipPingPongBuffer:
+
+    def __init__(self, context, size, levels, texture_format):
+        self.texture_format = texture_format
+        self._chains = (
+            MipChain(context, size, levels, texture_format),
+            MipChain(context, size, levels, texture_format),
+        )
+
+        self.levels = [MipPingPongLevel(self._chains, level) for level in range(len(self._chains[0].sizes))]
+
+    #Start every level reading from the first chain
+    def reset(self):
+        for level in self.levels:
+            level.ping = 0
+
+    #Build every level below the first from the texture side of the first level, and flip them to read the result
+    def generate_mipmaps(self):
+        top = self.levels[0]
+        self._chains[top.ping].generate_mipmaps()
+
+        for level in self.levels[1:]:
+            if level.ping != top.ping:
+                level.flip_buffers()
+
+    @property
+    def allocated_bytes(self):
+        return sum(chain.allocated_bytes for chain in self._chains)
+
+    def release(self):
+        for chain in self._chains:
+            chain.release()
+        self.levels = []
+
+
+class MipPingPongLevel:
+
+    def __init__(self, chains, level):
+        self._chains = chains
+        self.level = level
+        self.size = chains[0].sizes[level]
+        self.ping = 0
+
+    def flip_buffers(self):
+        self.ping = 1 - self.ping
+
+    #Bind the texture side to a given texture index, and bind the render target side as the current drawing target
+    def bind(self, texture_index):
+        self.texture.use(texture_index)
+        self.framebuffer.use()
+
+    def get_render_target_pair(self):
+        return (self.texture, self.framebuffer)
+
+    @property
+    def texture(self):
+        return self._chains[self.ping].levels[self.level]
+
+    #Texture of the render target side, for passes that write to it as an image rather than through the framebuffer
+    @property
+    def output_texture(self):
+        return self._chains[1 - self.ping].levels[self.level]
+
+    @property
+    def framebuffer(self):
+        return self._chains[1 - self.ping].framebuffers[self.level]
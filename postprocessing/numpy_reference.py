@@ -0,0 +1,254 @@
+import math
+
+import numpy
+
+from postprocessing.gaussian_kernel import linear_sampled_kernel
+
+#NumPy reference implementations of the effects, for checking the shaders without relying on them (see golden_check.py).
+#Each function follows its shader step by step, vectorized over whole frames.
+#Images are float arrays of shape (height, width, 4) in GL order, bottom row first, so rows line up with v.
+#Intermediate targets are stored with store() to round them like the texture formats the effects render to
+
+#GLSL smoothstep
+def smoothstep(edge0, edge1, x):
+    t = numpy.clip((x - edge0) / (edge1 - edge0), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+#GLSL mix, with t broadcast over the color channels
+def mix(x, y, t):
+    return x * (1.0 - t) + y * t
+
+#Round an image as it would be stored in a texture of the given format, see render_target.py
+def store(image, texture_format):
+    if texture_format == 'f1':
+        return numpy.round(numpy.clip(image, 0.0, 1.0) * 255.0) / 255.0
+    if texture_format == 'f2':
+        return image.astype(numpy.float16).astype(numpy.float32)
+    if texture_format == 'r11g11b10f':
+        return store_packed(image)
+    return image.astype(numpy.float32)
+
+#R11F_G11F_B10F: no sign, and 6 mantissa bits for red and green, 5 for blue. Alpha reads back as 1
+def store_packed(image):
+    rgb = numpy.clip(image[..., :3], 0.0, 65024.0)
+    mantissa, exponent = numpy.frexp(rgb)
+
+    #frexp's mantissa has the implicit leading bit as its first fraction bit
+    bits = numpy.array([7, 7, 6], dtype=numpy.float32)
+    rgb = numpy.ldexp(numpy.round(numpy.ldexp(mantissa, bits.astype(numpy.int32))), exponent - bits.astype(numpy.int32))
+    return with_alpha(rgb.astype(numpy.float32), 1.0)
+
+#Texture coordinates at the pixel centers of a full-screen pass into a target of the given size, as (u, v) arrays
+def pixel_uvs(size):
+    width, height = size
+    u = (numpy.arange(width, dtype=numpy.float32) + 0.5) / width
+    v = (numpy.arange(height, dtype=numpy.float32) + 0.5) / height
+    return numpy.meshgrid(u, v)
+
+#Bilinear texture() fetch with CLAMP_TO_EDGE, u and v are arrays of any matching shape
+def sample(texture, u, v):
+    height, width = texture.shape[:2]
+
+    x = u * width - 0.5
+    y = v * height - 0.5
+    x0 = numpy.floor(x)
+    y0 = numpy.floor(y)
+    fx = (x - x0)[..., None]
+    fy = (y - y0)[..., None]
+
+    x0 = x0.astype(numpy.int64)
+    y0 = y0.astype(numpy.int64)
+    x1 = numpy.clip(x0 + 1, 0, width - 1)
+    y1 = numpy.clip(y0 + 1, 0, height - 1)
+    x0 = numpy.clip(x0, 0, width - 1)
+    y0 = numpy.clip(y0, 0, height - 1)
+
+    bottom = mix(texture[y0, x0], texture[y0, x1], fx)
+    top = mix(texture[y1, x0], texture[y1, x1], fx)
+    return mix(bottom, top, fy)
+
+def luminance(rgb):
+    return rgb @ numpy.array([0.2126, 0.7152, 0.0722], dtype=numpy.float32)
+
+def with_alpha(rgb, alpha):
+    if numpy.isscalar(alpha):
+        alpha = numpy.full(rgb.shape[:2] + (1,), alpha, dtype=rgb.dtype)
+    return numpy.concatenate([rgb, alpha], axis=-1)
+
+#blit.fs, the chain's passthrough when no effect is active
+def blit(image):
+    return image.copy()
+
+#tonemap.glsl
+def tonemap(image, white_point):
+    hdr = image[..., :3]
+    ldr = hdr * (1.0 + hdr / (white_point * white_point)) / (1.0 + hdr)
+    return with_alpha(ldr, 0.0)
+
+#greyscale.glsl
+def greyscale(image, strength, shadow_color, highlight_color):
+    rgb = image[..., :3]
+    lum = numpy.clip(luminance(rgb), 0.0, 1.0)[..., None]
+    grey = mix(numpy.asarray(shadow_color, dtype=numpy.float32), numpy.asarray(highlight_color, dtype=numpy.float32), lum)
+    return with_alpha(mix(rgb, grey, strength), image[..., 3:])
+
+#split_tone.glsl
+def split_tone(image, threshold, crossover, shadow_color, highlight_color):
+    rgb = image[..., :3]
+    crossover_half = max(0.0, crossover) * 0.5
+    t = smoothstep(threshold - crossover_half, threshold + crossover_half, luminance(rgb))[..., None]
+    tone = mix(numpy.asarray(shadow_color, dtype=numpy.float32), numpy.asarray(highlight_color, dtype=numpy.float32), t)
+    return with_alpha(rgb + tone, 0.0)
+
+#vignette.glsl
+def vignette(image, inner_distance, outer_distance, color):
+    u, v = pixel_uvs((image.shape[1], image.shape[0]))
+    distance = numpy.hypot((u - 0.5) * 2.0, (v - 0.5) * 2.0)
+    factor = smoothstep(inner_distance, outer_distance, distance)[..., None]
+    return with_alpha(mix(image[..., :3], numpy.asarray(color[:3], dtype=numpy.float32), factor), 1.0)
+
+#The red to green to blue ramp ChromaticAberration spreads over its samples, as (weights, sums)
+def chromatic_aberration_weights(sample_count=15):
+    factor = numpy.arange(sample_count, dtype=numpy.float32) / sample_count * 2.0
+    weights = numpy.stack([
+        numpy.clip(1.0 - factor, 0.0, 1.0),
+        numpy.clip(1.0 - numpy.abs(factor - 1.0), 0.0, 1.0),
+        numpy.clip(factor - 1.0, 0.0, 1.0),
+    ], axis=-1)
+    return weights, weights.sum(axis=0)
+
+#chromatic_abberation.fs. The loop runs over the samples, each one over the whole frame
+def chromatic_aberration(image, axial, distance_scale, sample_count=15):
+    weights, sums = chromatic_aberration_weights(sample_count)
+    u, v = pixel_uvs((image.shape[1], image.shape[0]))
+
+    #direction * dist cancels out to the position remapped to -1..1
+    steps_per_side = sample_count // 2
+    step_u = (u * 2.0 - 1.0) * distance_scale / steps_per_side
+    step_v = (v * 2.0 - 1.0) * distance_scale / steps_per_side
+
+    total = numpy.zeros(image.shape[:2] + (3,), dtype=numpy.float32)
+    for index in range(sample_count):
+        offset = index - steps_per_side
+        total += sample(image, u + step_u * offset, v + step_v * offset)[..., :3] * weights[index]
+
+    return with_alpha(mix(image[..., :3], total / sums, axial), 1.0)
+
+#extract_bright() of the bloom shaders, black pixels have no brightness to keep
+def extract_bright(rgb, threshold):
+    brightness = rgb.max(axis=-1)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        knee = numpy.where(brightness > 0.0, (brightness - threshold) / brightness, 0.0)
+    return rgb * numpy.clip(knee, 0.0, 1.0)[..., None]
+
+#Sizes of the bloom pyramid for a source of the given size, see Bloom.allocate_whole_chain() and mip_level_sizes().
+#The pyramid is sized for render_scale rounded up to a multiple of Bloom.render_scale_step (0.125)
+def bloom_level_sizes(size, levels, render_scale=1.0):
+    render_scale = min(1.0, math.ceil(round(render_scale / 0.125, 6)) * 0.125)
+    width = max(1, max(1, int(size[0] * render_scale)) // 2)
+    height = max(1, max(1, int(size[1] * render_scale)) // 2)
+
+    sizes = []
+    for _ in range(levels):
+        sizes.append((width, height))
+        if (width, height) == (1, 1):
+            break
+        width, height = max(1, width // 2), max(1, height // 2)
+    return sizes
+
+#glGenerateMipmap, as the 2x2 box filter drivers use for even sizes
+def box_downsample(image, size):
+    width, height = size
+
+    #A dimension already down to 1 stays 1, and is averaged with itself
+    if image.shape[0] == 1:
+        image = numpy.repeat(image, 2, axis=0)
+    if image.shape[1] == 1:
+        image = numpy.repeat(image, 2, axis=1)
+
+    image = image[:height * 2, :width * 2]
+    return (image[0::2, 0::2] + image[0::2, 1::2] + image[1::2, 0::2] + image[1::2, 1::2]) * 0.25
+
+#Separable blur along one axis with the linear sampled kernel, applying transform to every fetch
+def _blur(image, size, offsets, weights, horizontal, transform):
+    u, v = pixel_uvs(size)
+    texel = 1.0 / size[0] if horizontal else 1.0 / size[1]
+
+    result = transform(sample(image, u, v)[..., :3]) * weights[0]
+    for offset, weight in zip(offsets[1:], weights[1:]):
+        if horizontal:
+            before, after = sample(image, u - offset * texel, v), sample(image, u + offset * texel, v)
+        else:
+            before, after = sample(image, u, v - offset * texel), sample(image, u, v + offset * texel)
+        result += (transform(before[..., :3]) + transform(after[..., :3])) * weight
+    return result
+
+def _corner_sum(image, u, v, texel_size, transform=None):
+    total = 0.0
+    for x, y in ((-1.0, -1.0), (1.0, -1.0), (-1.0, 1.0), (1.0, 1.0)):
+        rgb = sample(image, u + x * texel_size[0], v + y * texel_size[1])[..., :3]
+        total = total + (transform(rgb) if transform is not None else rgb)
+    return total
+
+#The gaussian pyramid of Bloom.apply_gaussian(), returns the top level with every level below added in
+def _bloom_gaussian(image, sizes, threshold, power, offsets, weights, hardware_downsample, texture_format):
+    extract = lambda rgb: extract_bright(rgb, threshold)
+    keep = lambda rgb: rgb
+
+    levels = []
+    source = image
+    for index, size in enumerate(sizes):
+        if hardware_downsample and index > 0:
+            level = box_downsample(levels[-1], size)
+        else:
+            level = sample(source, *pixel_uvs(size))
+        levels.append(store(level, texture_format))
+        source = levels[-1]
+
+    blurred = [store(_blur(level, size, offsets, weights, True, extract), texture_format) for level, size in zip(levels, sizes)]
+
+    last = None
+    for level, size in reversed(list(zip(blurred, sizes))):
+        result = _blur(level, size, offsets, weights, False, keep) * (power * 0.5)
+        if last is not None:
+            result += sample(last, *pixel_uvs(size))[..., :3]
+        last = store(result, texture_format)
+
+    return last
+
+#The dual filter pyramid of Bloom.apply_dual_filter(), returns the top level with every level below added in
+def _bloom_dual_filter(image, sizes, threshold, power, texture_format):
+    source_texel = (1.0 / image.shape[1], 1.0 / image.shape[0])
+    u, v = pixel_uvs(sizes[0])
+    levels = [store(_corner_sum(image, u, v, source_texel, lambda rgb: extract_bright(rgb, threshold)) * 0.25, texture_format)]
+
+    for size in sizes[1:]:
+        last = levels[-1]
+        last_texel = (1.0 / last.shape[1], 1.0 / last.shape[0])
+        u, v = pixel_uvs(size)
+        level = (sample(last, u, v)[..., :3] * 4.0 + _corner_sum(last, u, v, last_texel)) * 0.125
+        levels.append(store(level, texture_format))
+
+    last = None
+    for level, size in reversed(list(zip(levels, sizes))):
+        u, v = pixel_uvs(size)
+        result = sample(level, u, v)[..., :3] * (power * 0.5)
+        if last is not None:
+            result += _corner_sum(last, u, v, (1.0 / last.shape[1], 1.0 / last.shape[0])) * 0.25
+        last = store(result, texture_format)
+
+    return last
+
+#Bloom with either algorithm, composited onto the image as apply_bloom.fs does
+def bloom(image, threshold=1.0, power=1.0, levels=5, blur_radius=5, blur_sigma=None, algorithm='gaussian',
+          hardware_downsample=True, render_scale=1.0, texture_format='r11g11b10f'):
+    sizes = bloom_level_sizes((image.shape[1], image.shape[0]), levels, render_scale)
+
+    if algorithm == 'dual_filter':
+        top = _bloom_dual_filter(image, sizes, threshold, power, texture_format)
+    else:
+        offsets, weights = linear_sampled_kernel(blur_radius, blur_sigma)
+        top = _bloom_gaussian(image, sizes, threshold, power, offsets, weights, hardware_downsample, texture_format)
+
+    light = sample(top, *pixel_uvs((image.shape[1], image.shape[0])))[..., :3]
+    return with_alpha(image[..., :3] + light, image[..., 3:])
@@ -1,53 +1,107 @@
 import arcade
 from postprocessing.render_target import RenderTarget
 from postprocessing.render_target_pair import RenderTargetPair
+from postprocessing.chrome_trace import ChromeTrace
 
 class PingPongBuffer(RenderTargetPair):
 
-    def __init__(self, context, size, texture_format):
+    #If a RenderTargetPool is given, the buffer only holds its render targets between acquire() and release(),
+    #otherwise it allocates its own targets up front and keeps them until release()
+    def __init__(self, context, size, texture_format, pool=None):
 
         self.context = context
         self._texture_format = texture_format
         self.size = size
+        self.pool = pool
 
         self._ping_buffer = None
         self._pong_buffer = None
 
-        self._allocate_buffers(size, texture_format)
+        if pool is None:
+            self._allocate_buffers(size, texture_format)
 
     def resize(self, size):
+        was_allocated = self._ping_buffer is not None
+
         self.release()
         self.size = size
-        self._allocate_buffers(size, self.texture_format)
+
+        if was_allocated:
+            self._allocate_buffers(size, self.texture_format)
+
+    def acquire(self):
+        if self._ping_buffer is None:
+            self._allocate_buffers(self.size, self.texture_format)
 
     def _allocate_buffers(self, size, texture_format):
-        self._ping_buffer = RenderTarget(self.context, size, texture_format)
-        self._pong_buffer = RenderTarget(self.context, size, texture_format)
-        
+        if self.pool is not None:
+            self._ping_buffer = self.pool.acquire(size, texture_format)
+            self._pong_buffer = self.pool.acquire(size, texture_format)
+        else:
+            self._ping_buffer = RenderTarget(self.context, size, texture_format)
+            self._pong_buffer = RenderTarget(self.context, size, texture_format)
+
     def release(self):
-        if self._pong_buffer is not None:
-            self._pong_buffer.release()
+        for buffer in (self._ping_buffer, self._pong_buffer):
+            if buffer is None:
+                continue
+
+            if self.pool is not None:
+                self.pool.release(buffer)
+            else:
+                buffer.release()
+
+        self._ping_buffer = None
+        self._pong_buffer = None
 
     def flip_buffers(self):
         temp = self._ping_buffer
         self._ping_buffer = self._pong_buffer
-        self._pong_buffer = temp      
+        self._pong_buffer = temp
 
     #Implementation for RenderTargetPair
     #Bind the texture side to a given texture index, and bind the render target side as the current drawing target
     def bind(self, texture_index):
+        trace = ChromeTrace.active
+        if trace is not None:
+            start = trace.timestamp()
+
         self._ping_buffer.bind_as_texture(texture_index)
         self._pong_buffer.bind_as_framebuffer()
 
+        if trace is not None:
+            trace.complete("bind", start, "bind")
+
     #Get the (texture,framebuffer) as a tuple pair for more advanced use cases
     def get_render_target_pair(self):
          return (self._ping_buffer.texture, self._pong_buffer.framebuffer_object)
 
+    @property
+    def texture_format(self):
+        return self._texture_format
+
+    @texture_format.setter
+    def texture_format(self, value):
+        if value == self._texture_format:
+            return
+
+        was_allocated = self._ping_buffer is not None
+
+        self.release()
+        self._texture_format = value
+
+        if was_allocated:
+            self._allocate_buffers(self.size, value)
 
     @property
     def texture(self):
         return self._ping_buffer.texture
 
+    #Texture of the render target side, for passes that write to it as an image rather than through the framebuffer
+    @property
+    def output_texture(self):
+        return self._pong_buffer.texture
+
     @property
     def framebuffer(self):
         return self._pong_buffer.framebuffer_object
\ No newline at end of file
@@ -0,0 +1,105 @@
+import re
+from postprocessing.program_cache import ProgramCache
+from postprocessing.uniform_block import PARAMETER_BLOCK, bind_uniform_block
+
+#A pixel stage is a snippet of GLSL for an effect that only reads the pixel it is writing.
+#It declares its own uniforms and helpers, plus an entry point:
+#   vec4 apply_stage(vec4 color, vec2 uv)
+#where uv is the position inside the viewport being drawn (see viewports.py), the whole target outside of split-screen
+#Stages can be compiled on their own, or several can be fused into one fragment program
+#so that a run of per-pixel effects costs a single full-screen pass.
+#A stage's parameters go in a std140 EffectParameters block, which is bound to the stage's index in the program
+
+STAGE_ENTRY_POINT = "apply_stage"
+VERTEX_SHADER = "postprocessing/core_shaders/fullscreen_quad.vs"
+
+_define_pattern = re.compile(r'^\s*#define\s+(\w+)')
+_declaration_pattern = re.compile(r'^\s*(?:(?:uniform|const)\s+)*\w+\s+(\w+)\s*(?:\[|=|;|\()')
+_block_pattern = re.compile(r'^\s*(?:layout\s*\([^)]*\)\s*)?uniform\s+(\w+)\s*\{?\s*$')
+_member_pattern = re.compile(r'^\s*\w+\s+(\w+)\s*(?:\[|;)')
+
+#Prefix used for every top-level name of the stage at the given position in a fused program
+def stage_prefix(index):
+    return f's{index}_'
+
+#Find the names of all macros, uniforms, constants and functions declared at the top level of a stage,
+#including the uniform block and its members, which also live in the global scope
+def get_stage_declarations(source):
+    names = []
+    depth = 0
+    in_block = False
+    for line in source.splitlines():
+        if depth == 0 and line.strip() != '{':
+            match = _block_pattern.match(line)
+            in_block = match is not None
+            if match is None:
+                match = _define_pattern.match(line) or _declaration_pattern.match(line)
+            if match is not None:
+                names.append(match.group(1))
+        elif depth == 1 and in_block:
+            match = _member_pattern.match(line)
+            if match is not None:
+                names.append(match.group(1))
+
+        depth += line.count('{') - line.count('}')
+    return names
+
+#Rename every top-level declaration of a stage so it can live next to other stages in one program
+def namespace_stage(source, prefix):
+    if prefix == "":
+        return source
+
+    names = get_stage_declarations(source)
+    if len(names) == 0:
+        return source
+
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(name) for name in names) + r')\b')
+    return pattern.sub(lambda match: prefix + match.group(1), source)
+
+#Build a full fragment shader that runs each stage in order on the sampled source pixel
+def build_fragment_source(stage_sources):
+    fused = len(stage_sources) > 1
+
+    lines = [
+        "#version 330",
+        "",
+        "uniform sampler2D t_source;",
+        "",
+        "in vec2 v_uv;",
+        "in vec2 v_local_uv;",
+        "out vec4 out_color;",
+        "",
+    ]
+
+    calls = []
+    for index, source in enumerate(stage_sources):
+        prefix = stage_prefix(index) if fused else ""
+        lines.append(namespace_stage(source, prefix))
+        lines.append("")
+        calls.append(f"    color = {prefix}{STAGE_ENTRY_POINT}(color, v_local_uv);")
+
+    lines.append("void main()")
+    lines.append("{")
+    lines.append("    vec4 color = texture(t_source, v_uv);")
+    lines.extend(calls)
+    lines.append("    out_color = color;")
+    lines.append("}")
+
+    return "\n".join(lines)
+
+def load_pixel_stage_program(context, stage_paths):
+    cache = ProgramCache.get(context)
+
+    vertex_source = cache.load_source(VERTEX_SHADER)
+    fragment_source = build_fragment_source([cache.load_source(path) for path in stage_paths])
+
+    program = cache.program(vertex_source, fragment_source)
+
+    program['t_source'] = 0
+
+    fused = len(stage_paths) > 1
+    for index in range(len(stage_paths)):
+        prefix = stage_prefix(index) if fused else ""
+        bind_uniform_block(program, prefix + PARAMETER_BLOCK, index)
+
+    return program
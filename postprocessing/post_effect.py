@@ -1,4 +1,11 @@
 import arcade
+from postprocessing.program_cache import ProgramCache
+from postprocessing.render_target_pool import RenderTargetPool
+from postprocessing.render_target import PACKED_HDR
+from postprocessing.render_graph import ResourcePair
+from postprocessing.chrome_trace import ChromeTrace
+from postprocessing.uniform_block import UniformBlock, PARAMETER_BLOCK, bind_uniform_block
+from postprocessing.viewports import ViewportQuad, MAX_VIEWPORTS, freeze_overrides
 try:
     import imgui
 except:
@@ -8,31 +15,304 @@ class PostEffect:
     next_ui_index = 0
     fullscreen_quad = None
 
+    #Path to a pixel stage (see pixel_stage.py) for effects that only read the pixel they write.
+    #Effects that set this can be fused with neighbouring pixel-local effects into a single pass
+    pixel_stage = None
+
+    #Effects a DynamicResolutionController scales by default. Only effects that apply render_scale to their own
+    #intermediate targets (like Bloom) should opt in: a scaled pass between other passes downsamples and then upsamples
+    #the whole frame, which blurs it, and a scaled pixel-local effect can no longer be fused with its neighbours
+    dynamic_resolution = False
+
+    #Smallest render_scale an effect can be set to
+    min_render_scale = 0.25
+
+    #Quality tiers, see PostProcessingChain.quality
+    LOW = 'low'
+    MEDIUM = 'medium'
+    HIGH = 'high'
+    ULTRA = 'ultra'
+    quality_tiers = [LOW, MEDIUM, HIGH, ULTRA]
+
+    #Values of this effect's properties for each quality tier, as {tier: {property: value}}.
+    #HIGH should match the defaults. None for effects whose cost does not depend on quality
+    quality_settings = None
+
+    #Parameter block members properties write their value to unchanged, as {property: uniform}.
+    #Only properties listed here or handled by get_property_uniforms() can be overridden per viewport, see get_override_state()
+    property_uniforms = {}
+
+    #Attributes holding programs that properties switch between shader variants, e.g. Bloom's threshold.
+    #Viewports overriding such a property draw with the programs of their value, see load_variant_programs()
+    variant_attributes = ()
+
+    #Bumped whenever any effect is enabled or disabled, rescaled, or has a parameter changed, which are the only ways the
+    #passes a chain runs can change from the effect side. Chains only re-plan their passes after it moved
+    state_serial = 0
+
     def __init__(self,context, window_size):
-        self.enabled = True
+        self._enabled = True
         self.context = context
         self.window_size = window_size
 
+        #Programs come from a context-wide cache and are shared with other effects
+        self.program_cache = ProgramCache.get(context)
+
+        #Intermediate targets should be borrowed from the pool in apply() and returned before it finishes
+        self.render_target_pool = RenderTargetPool.get(context)
+
+        #Effect parameters, see create_parameter_block(). None for effects without parameters
+        self.parameters = None
+
+        #Parameters and programs of viewports that override some properties, see get_override_state()
+        self._override_states = {}
+
+        #Set by the chain while GPU timing is enabled, see gpu_timer.py
+        self.gpu_timer = None
+
+        self._render_scale = 1.0
+
         self.ui_index = PostEffect.next_ui_index
         PostEffect.next_ui_index += 1
 
-        PostEffect._init_quad()
+        PostEffect._init_quad(context)
 
-    def _init_quad():
+    #Drawn once per viewport of the frame, see viewports.py
+    def _init_quad(context):
         if PostEffect.fullscreen_quad is None:
-            PostEffect.fullscreen_quad = arcade.gl.geometry.quad_2d_fs()
+            PostEffect.fullscreen_quad = ViewportQuad.get(context)
 
     def resize(self, newSize):
         self.window_size = newSize
 
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        if value != self._enabled:
+            self._enabled = value
+            PostEffect.state_serial += 1
+
+    #Fraction of the chain's resolution this effect renders at. The pass after it samples its output in
+    #normalized UVs, so the result is upsampled by bilinear filtering, trading sharpness for fill-rate
+    @property
+    def render_scale(self):
+        return self._render_scale
+
+    @render_scale.setter
+    def render_scale(self, value):
+        value = min(max(value, PostEffect.min_render_scale), 1.0)
+        if value != self._render_scale:
+            self._render_scale = value
+            PostEffect.state_serial += 1
+
+    #Scale of the target the chain gives this effect to render into.
+    #Effects that apply render_scale to their own intermediate targets instead (like Bloom) return 1.0
+    def get_output_scale(self):
+        return self._render_scale
+
+    #Switch to the settings of a quality tier, see quality_settings
+    def set_quality(self, tier):
+        if self.quality_settings is None:
+            return
+
+        for name, value in self.quality_settings[tier].items():
+            setattr(self, name, value)
+
+    #Compile the shader variants a quality tier uses without switching to it, so switching later does not stall on compiles.
+    #Effects whose quality settings load programs should override this
+    def preload_quality(self, tier):
+        pass
+
+    def get_scaled_size(self, size):
+        return (max(1, int(size[0] * self._render_scale)), max(1, int(size[1] * self._render_scale)))
+
+    #Declare this effect's passes in the chain's render graph (see render_graph.py), reading source and writing target.
+    #The default is a single pass running apply(). Effects that read more than one earlier output can look them up with
+    #graph.find() (the chain's input is 'source'), and side outputs can be created with graph.create_texture() and graph.publish()
+    #The pair is created once here and resolves the resources' current targets each time the pass runs
+    def add_passes(self, graph, name, source, target):
+        render_target_pair = ResourcePair(source, target)
+        graph.add_pass(name, lambda: self.apply_viewports(render_target_pair), inputs=[source], outputs=[target])
 
     def apply(self, render_target_pair):
          raise NotImplementedError("This method must be implemented by a derrived class")
 
+    #Run apply() on the viewports the frame is split into (see viewports.py). All viewports are drawn by the same passes,
+    #unless some of them override parameters of this effect, then apply() runs once per distinct set of overrides
+    #with its draws restricted to the viewports that share it, and with the parameters and shader variants of those overrides
+    def apply_viewports(self, render_target_pair):
+        quad = PostEffect.fullscreen_quad
+        groups = quad.group_by_overrides(self.get_overridable_effects())
+        if groups is None:
+            self.apply(render_target_pair)
+            return
+
+        for overrides, viewports in groups:
+            own_states = []
+            for effect, values in overrides.items():
+                state = effect.get_override_state(values)
+                own_states.append((effect, {name: getattr(effect, name) for name in state}))
+                for name, value in state.items():
+                    setattr(effect, name, value)
+
+            quad.draw_viewports(viewports)
+            self.apply(render_target_pair)
+
+            for effect, state in own_states:
+                for name, value in state.items():
+                    setattr(effect, name, value)
+
+        quad.draw_viewports(quad.viewports)
+
+    #Effects whose parameters viewports can override in this effect's passes
+    def get_overridable_effects(self):
+        return [self]
+
+    #What apply() reads that the given property overrides change, as {attribute: value}: a copy of the parameter block with
+    #the overridden values written to it, and the programs of the shader variant they need (see load_variant_programs()).
+    #It is worked out from get_property_uniforms() and get_property_defines() without changing the effect itself.
+    #States are kept until the effect's own parameters or programs change
+    def get_override_state(self, overrides):
+        key = freeze_overrides(overrides)
+        own_key = (self.parameters.version, self.get_variants())
+
+        cached = self._override_states.get(key)
+        if cached is not None and cached[0] == own_key:
+            return cached[1]
+
+        uniforms = {}
+        defines = {}
+        for name, value in overrides.items():
+            uniforms.update(self.get_property_uniforms(name, value))
+            defines.update(self.get_property_defines(name, value))
+
+        state = self.load_variant_programs(defines) if len(defines) > 0 else {}
+
+        if cached is not None:
+            cached[1]['parameters'].release()
+        elif len(self._override_states) >= MAX_VIEWPORTS:
+            #Overrides that keep changing would otherwise leave a copy behind for every value
+            self.release_override_states()
+
+        block = self.parameters.copy()
+        for name, value in uniforms.items():
+            block[name] = value
+        state['parameters'] = block
+
+        self._override_states[key] = (own_key, state)
+        return state
+
+    #The parameter block writes a property value stands for, as {uniform: value}.
+    #Effects whose setters transform or clamp a value before writing it override this and write through set_property_uniforms()
+    def get_property_uniforms(self, name, value):
+        uniform = self.property_uniforms.get(name)
+        if uniform is None:
+            raise ValueError(f"{type(self).__name__}.{name} does not set shader parameters, it cannot be overridden per viewport")
+        return {uniform: value}
+
+    #Defines of the shader variant a property value needs, empty for properties that do not pick a variant
+    def get_property_defines(self, name, value):
+        return {}
+
+    #Programs of the shader variant the given defines select, as {attribute: program} for the attributes in variant_attributes
+    def load_variant_programs(self, defines):
+        return {}
+
+    def set_property_uniforms(self, name, value):
+        for uniform, uniform_value in self.get_property_uniforms(name, value).items():
+            self.set_uniform(uniform, uniform_value)
+
+    def get_variants(self):
+        return tuple(getattr(self, name) for name in self.variant_attributes)
+
+    def release_override_states(self):
+        for own_key, state in self._override_states.values():
+            state['parameters'].release()
+        self._override_states = {}
+
     #An effect that tonemaps HDR to LDR and marks the end of the HDR side of the post-processing
     #pipeline should override this and return true
     def is_tonemapping_effect(self):
         return False
+
+    #An effect whose current parameters leave the image unchanged should override this and return true,
+    #the chain then skips its pass entirely. Alpha is not considered, the chain's output alpha is not meaningful
+    def is_noop(self):
+        return False
+
+    #GPU memory this effect keeps across frames, on top of what it borrows from the RenderTargetPool
+    def get_allocated_bytes(self):
+        return 0
+
+    #Everything the output of this effect depends on, used by the chain's output cache.
+    #Effects with settings that live outside their parameter block should extend this
+    def get_cache_key(self):
+        version = self.parameters.version if self.parameters is not None else None
+        return (self.enabled, version, self._render_scale)
+
+    #Cheapest HDR format (see render_target.py) that can hold what this effect reads and writes on the HDR side of a chain.
+    #The chain renders its HDR targets in the most precise format any active effect asks for.
+    #PACKED_HDR suits effects that only carry positive color, effects that need alpha or negative values should return 'f2'
+    def get_hdr_format(self):
+        return PACKED_HDR
+
+    def is_pixel_local(self):
+        return self.pixel_stage is not None
+
+    #Load a fragment shader paired with the standard full-screen quad vertex shader
+    def load_program(self, fragment_shader, defines=None):
+        program = self.program_cache.load_program(
+            vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
+            fragment_shader=fragment_shader,
+            defines=defines,
+        )
+
+        bind_uniform_block(program, PARAMETER_BLOCK, 0)
+        return program
+
+    #Effects declare their parameters in a std140 uniform block named EffectParameters.
+    #The block layout is read from the given program, all programs of an effect must declare it identically
+    def create_parameter_block(self, program=None):
+        if program is None:
+            program = self.program
+
+        self.parameters = UniformBlock(self.context, program)
+
+    #Parameters are only written to the CPU-side block here, see use_program()
+    def set_uniform(self, name, value):
+        version = self.parameters.version
+        self.parameters[name] = value
+
+        if self.parameters.version != version:
+            PostEffect.state_serial += 1
+
+    #Must be called before rendering with one of this effect's programs.
+    #Uploads the parameter block if it changed since the last frame, and binds it
+    def use_program(self, program=None):
+        if program is None:
+            program = self.program
+
+        if self.parameters is not None:
+            self.parameters.bind(0)
+
+        return program
+
+    #Time a part of apply() on the GPU and in the CPU trace, it is reported nested under this effect's own timing
+    def begin_timing(self, name):
+        if self.gpu_timer is not None:
+            self.gpu_timer.begin(name)
+        if ChromeTrace.active is not None:
+            ChromeTrace.active.begin(name, "pass")
+
+    def end_timing(self):
+        if self.gpu_timer is not None:
+            self.gpu_timer.end()
+        if ChromeTrace.active is not None:
+            ChromeTrace.active.end()
        
     def show_ui(self):
         _, self.enabled = imgui.checkbox(f'Enable##{self.ui_index}'.format(self.ui_index), self.enabled)
+        self.render_scale = imgui.slider_float(f'Render Scale##{self.ui_index}', self.render_scale, PostEffect.min_render_scale, 1.0)[1]
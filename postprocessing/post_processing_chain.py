@@ -1,107 +1,511 @@
 import arcade
-from postprocessing.render_target import RenderTarget
-from postprocessing.ping_pong_buffer import PingPongBuffer
+from postprocessing.render_target import RenderTarget, widest_hdr_format
+from postprocessing.render_target_pool import RenderTargetPool
 from postprocessing.post_effect import PostEffect
-from postprocessing.static_render_target_pair import StaticRenderTargetPair
+from postprocessing.render_graph import RenderGraph
+from postprocessing.fused_effect import FusedEffect
+from postprocessing.gpu_timer import GpuTimer
+from postprocessing.chrome_trace import ChromeTrace
+from postprocessing.dynamic_resolution import DynamicResolutionController
+from postprocessing.async_readback import AsyncReadback
+from postprocessing.viewports import Viewport, ViewportQuad
 
 class PostProcessingChain:
 
     has_imgui = True
 
+    #Free pooled render targets that went unused for this many frames
+    pool_trim_interval = 120
+
+    #While the source size keeps changing (e.g. a window being dragged) the chain keeps rendering at its
+    #current internal size, all passes sample in normalized UVs so the result is just resampled.
+    #It only resizes once the new size has been stable for this many frames...
+    resize_settle_frames = 10
+    #...or straight away if either dimension changed by more than this fraction
+    resize_threshold = 0.25
+
+    #Each stage of a fused pass binds its own parameter block, this stays well under GL_MAX_FRAGMENT_UNIFORM_BLOCKS
+    max_fused_stages = 8
+
+    #Fused passes kept after the plan stops using them, so toggling an effect does not rebuild its run's pass every time
+    max_cached_fused_effects = 8
+
     def __init__(self, context: arcade.gl.context.Context, initial_size, enable_hdr):
         self.context = context
-        self._current_size = initial_size
+        self._current_size = tuple(initial_size)
+        self._pending_size = None
+        self._pending_frames = 0
 
         self._effects = []
 
-        self._ldr_ping_pong_buffer = PingPongBuffer(context, initial_size, 'f1')
-        self._hdr_ping_pong_buffer = None
+        #Runs of consecutive pixel-local effects are compiled into a single pass, see fuse_pixel_effects
+        self._fuse_pixel_effects = True
+        self._fused_effects = {}
+
+        #Ping-pong buffers borrow their targets from the pool only while the chain is being applied
+        self._render_target_pool = RenderTargetPool.get(context)
+        self._frame_index = 0
+
+        #Per-effect GPU timing, see gpu_timing
+        self._gpu_timer = None
+
+        #Adjusts effect render scales to a GPU time budget, see enable_dynamic_resolution()
+        self.dynamic_resolution = None
+        self._timing_before_dynamic_resolution = False
+
+        #Opt-in: re-present the last output with a single blit while the source and every effect are unchanged.
+        #The chain cannot see into the source texture, so callers bump source_version (see mark_source_changed())
+        #or pass their own version to apply_effects() whenever they render new content into it
+        self.cache_output = False
+        self.source_version = 0
+        self.cached_frames = 0
+        self._output_target = None
+        self._output_key = None
+
+        #Readbacks of the chain's output, see read_output_async() and read_next_output_async().
+        #While retain_output is set the chain renders into its own target and then presents it, as it does while caching,
+        #so the output can still be read after the destination was drawn over or swapped
+        self.retain_output = False
+        self._readback = None
+        self._output_retained = False
+        self._next_output_readbacks = []
+
+        #Frames left to record before the trace started by start_trace() stops, None records until stop_trace()
+        self._trace_frames_left = None
+
+        #Quality tier every effect is set to, see quality
+        self._quality = PostEffect.HIGH
+
+        #Forced format of the HDR targets, see hdr_format
+        self._hdr_format = None
+        self._hdr_texture_format = 'f2'
+
+        #The execution plan: the render graph of the active passes (see render_graph.py), compiled once and executed every frame.
+        #It is only rebuilt after the chain changes, or after an effect changed (see PostEffect.state_serial) in a way
+        #that changes the passes, their formats or their scales
+        self.render_graph = None
+        self._plan_passes = []
+        self._plan_key = None
+        self._plan_serial = -1
+        self._plan_source = None
+        self._plan_destination = None
+
+        #Passthroughs and upsamples blit, even when no target was created yet
+        RenderTarget._init_blit_shaders(context)
 
         self.hdr = enable_hdr
         
-    def apply_effects(self, source_texture , destination_framebuffer = None):
+    #viewports splits the frame into rectangles that are processed separately, e.g. for split-screen.
+    #They are given as Viewport objects, which can override effect parameters per viewport, or (x, y, width, height) tuples
+    #in pixels of the source. Every pass draws all viewports at once, into intermediate targets shared by all of them,
+    #and filters never sample across viewport borders. Only the viewports are written to the destination
+    def apply_effects(self, source_texture , destination_framebuffer = None, source_version = None, viewports = None):
+        trace = ChromeTrace.active
+        if trace is not None:
+            trace.begin(f'Frame {self._frame_index}', "frame")
+
+        if viewports is not None:
+            viewports = [Viewport.from_rect(viewport) for viewport in viewports]
+
+        quad = ViewportQuad.get(self.context)
+        quad.set_viewports(viewports, tuple(source_texture.size))
+
+        self._apply_effects(source_texture, destination_framebuffer, source_version, viewports)
+
+        quad.set_viewports(None, None)
+
+        #The destination was just written and nothing else has drawn into it yet
+        for request in self._next_output_readbacks:
+            self._readback.read(request, destination_framebuffer)
+        self._next_output_readbacks = []
+
+        if self._readback is not None:
+            self._readback.poll()
+
+        if trace is not None:
+            trace.end()
+            self._count_trace_frame()
+
+    def _apply_effects(self, source_texture, destination_framebuffer, source_version, viewports):
 
         #Ensure no blend mode is enabled
         self.context.enable_only()
 
         self._resize_if_needed(source_texture)
 
-        if self.are_any_effects_active():
-            self._apply_effect_chain(source_texture, destination_framebuffer)       
-        else:
-            self._passthrough(source_texture, destination_framebuffer)         
+        output_key = None
+        if self.cache_output:
+            output_key = self._get_output_key(source_texture, source_version, viewports)
+            if output_key == self._output_key:
+                self._passthrough(self._output_target.texture, destination_framebuffer)
+                self.cached_frames += 1
+                self._output_retained = True
+                self._end_frame()
+                return
+
+        graph = self._get_plan()
+
+        #When caching or retaining the output, the chain renders into its own target which is then presented
+        retain = output_key is not None or self.retain_output
+        self._output_retained = retain
+
+        if graph is not None:
+            if self._gpu_timer is not None:
+                self._gpu_timer.begin_frame()
+
+            output_framebuffer = destination_framebuffer
+            if retain:
+                output_framebuffer = self._get_output_target().framebuffer_object
+
+            for effect in self._plan_passes:
+                effect.gpu_timer = self._gpu_timer
 
-    def _apply_effect_chain(self, source_texture, destination_framebuffer):
+            self._plan_source.external_texture = source_texture
+            self._plan_destination.external_framebuffer = output_framebuffer
+            graph.execute(self._gpu_timer)
 
-        first_effect = self.get_first_active_effect()
-        last_effect = self.get_last_active_effect()
+            if retain:
+                self._passthrough(self._output_target.texture, destination_framebuffer)
+            if output_key is not None:
+                self._output_key = output_key
+
+            if self._gpu_timer is not None:
+                self._gpu_timer.end_frame()
+
+            if self.dynamic_resolution is not None:
+                self.dynamic_resolution.update(self.get_gpu_frame_time(smoothed=False))
+        else:
+            if retain:
+                self._passthrough(source_texture, self._get_output_target().framebuffer_object)
+            self._passthrough(source_texture, destination_framebuffer)
+            self._output_key = None
+
+        self._end_frame()
+
+    def _end_frame(self):
+        self._frame_index += 1
+        if self._frame_index % PostProcessingChain.pool_trim_interval == 0:
+            self._render_target_pool.trim()
+
+    #The HDR side of the chain runs up to and including the first tonemapping pass
+    def _get_hdr_format(self, passes):
+        if self.hdr_format is not None:
+            return self.hdr_format
+
+        texture_formats = []
+        for effect in passes:
+            texture_formats.append(effect.get_hdr_format())
+            if effect.is_tonemapping_effect():
+                break
+
+        return widest_hdr_format(texture_formats)
+
+    #Everything the chain's output depends on, other than the contents of the source
+    def _get_output_key(self, source_texture, source_version, viewports):
+        if source_version is None:
+            source_version = self.source_version
+
+        #Keyed by the effects themselves too, so swapping an effect for one in the same state is still a change
+        effect_keys = tuple((effect, effect.get_cache_key()) for effect in self._effects)
+        viewport_keys = tuple(viewport.get_cache_key() for viewport in viewports) if viewports is not None else None
+        return (source_version, source_texture, self._current_size, self.hdr, self.hdr_format, self.fuse_pixel_effects, effect_keys, viewport_keys)
+
+    #Kept across frames, so it is not borrowed from the pool
+    def _get_output_target(self):
+        texture_format = self._hdr_texture_format if self.hdr else 'f1'
+
+        target = self._output_target
+        if target is None or tuple(target.size) != self._current_size or target.texture_format != texture_format:
+            if target is not None:
+                target.release()
+            self._output_target = RenderTarget(self.context, self._current_size, texture_format)
+
+        return self._output_target
+
+    #Start copying the output of the last apply_effects() back to the CPU without stalling, at the chain's size.
+    #The output is read from the chain's own target rather than the destination, which may have been drawn over since,
+    #so retain_output (or cache_output) has to be set before the frame is rendered. Retaining costs a copy of every
+    #frame, callers that know in advance which frames they want should use read_next_output_async() instead.
+    #Returns a ReadbackRequest whose result (a NumPy array, top row first) is filled in by a later apply_effects(),
+    #usually a frame or two later, and passed to callback if one is given.
+    #Returns None if the readbacks in flight have not finished yet, see AsyncReadback
+    def read_output_async(self, callback=None, texture_format='f1'):
+        if not self._output_retained:
+            raise ValueError("The output of the last frame was not retained, set retain_output before rendering it")
+
+        return self._get_readback().request(self._output_target.framebuffer_object, texture_format=texture_format, callback=callback)
+
+    #Like read_output_async(), but reads the output of the next apply_effects() at the destination's viewport.
+    #The copy starts as soon as the frame has been rendered, straight from the destination, so nothing has to be retained
+    def read_next_output_async(self, callback=None, texture_format='f1'):
+        request = self._get_readback().reserve(texture_format, callback)
+        if request is not None:
+            self._next_output_readbacks.append(request)
+        return request
+
+    def _get_readback(self):
+        if self._readback is None:
+            self._readback = AsyncReadback(self.context)
+        return self._readback
+
+    #Complete finished readbacks outside of apply_effects(), e.g. on frames the chain is not applied.
+    #With wait, blocks until at least one has completed if any are in flight, see AsyncReadback.poll()
+    def poll_readbacks(self, wait=False):
+        if self._readback is not None:
+            self._readback.poll(wait)
+
+    #Block until every readback in flight has completed
+    def finish_readbacks(self):
+        if self._readback is not None:
+            self._readback.finish()
+
+    #Call after rendering new content into the source texture when cache_output is enabled
+    def mark_source_changed(self):
+        self.source_version += 1
+
+    #Force the next frame to run the chain, e.g. after changing state the cache key does not cover
+    def invalidate_output(self):
+        self._output_key = None
+
+    #The compiled render graph of the current passes, None if no effect is active.
+    #While no effect and nothing about the chain changed this is a single comparison
+    def _get_plan(self):
+        if self._plan_serial == PostEffect.state_serial:
+            return self.render_graph
+        self._plan_serial = PostEffect.state_serial
+
+        passes = self._get_passes()
+        self._trim_fused_effects(passes)
+        hdr_format = self._get_hdr_format(passes) if self.hdr else None
+
+        #Effects changed, but maybe not in a way that changes the plan
+        key = (tuple(passes), hdr_format, tuple(effect.get_output_scale() for effect in passes))
+        if key == self._plan_key:
+            return self.render_graph
+        self._plan_key = key
+
+        self._plan_passes = passes
+        if hdr_format is not None:
+            self._hdr_texture_format = hdr_format
+
+        self.render_graph = None
+        if len(passes) > 0:
+            self.render_graph = self._build_graph(passes, self._hdr_texture_format)
+            self.render_graph.compile()
+
+        return self.render_graph
+
+    #Effects the current plan runs, with the members of fused passes listed on their own
+    def get_planned_effects(self):
+        self._get_plan()
+
+        effects = []
+        for effect in self._plan_passes:
+            if isinstance(effect, FusedEffect):
+                effects.extend(effect.effects)
+            else:
+                effects.append(effect)
+        return effects
+
+    #Rebuild the plan before the next frame
+    def _invalidate_plan(self):
+        self._plan_serial = -1
+        self._plan_key = None
+
+    #Build the render graph of a list of passes: each pass reads the output of the one before it, the first reads the source,
+    #and the last writes the destination. Intermediates are transient graph resources in the HDR format up to the tonemapper,
+    #and 8 bit after it, at the size each effect renders at.
+    #The source and destination are imported resources, pointed at the frame's source and destination before each execution
+    def _build_graph(self, passes, hdr_format):
+        graph = RenderGraph(self.context, self._render_target_pool)
+
+        current = self._plan_source = graph.import_texture('source')
+        destination = self._plan_destination = graph.import_framebuffer('destination')
 
         is_hdr = self.hdr
+        last_effect = passes[-1]
 
-        for effect in self._effects:
-            if not effect.enabled:
-                continue
+        for index, effect in enumerate(passes):
+            name = self._get_pass_name(effect)
+
+            output_is_hdr = is_hdr and not effect.is_tonemapping_effect()
+            scaled = effect.get_output_scale() != 1.0
 
-            render_target_pair = self._get_render_target_pair_for_effect(effect, first_effect, last_effect, source_texture, destination_framebuffer, is_hdr)
+            if effect is last_effect and not scaled:
+                target = destination
+            else:
+                size = effect.get_scaled_size(self._current_size) if scaled else self._current_size
+                target = graph.create_texture(f'{name} {index}', size, hdr_format if output_is_hdr else 'f1')
 
-            effect.apply(render_target_pair)
+            effect.add_passes(graph, name, current, target)
+            current = target
 
-            #TODO: how to re-factor this into or out of the method above ?
             if effect.is_tonemapping_effect():
                 is_hdr = False
 
-    def _get_render_target_pair_for_effect(self, effect, first_effect, last_effect, source_texture, destination_framebuffer, is_hdr):
-        
-        target_ping_pong = self._hdr_ping_pong_buffer if is_hdr else self._ldr_ping_pong_buffer
-        target_ping_pong.flip_buffers()
+        #Nothing comes after a scaled last pass to sample its output, upsample it into the destination
+        if current is not destination:
+            graph.add_pass('Upsample', lambda: self._upsample(current.texture, destination.framebuffer), inputs=[current], outputs=[destination])
 
-        target_pair = target_ping_pong
+        return graph
 
-        if effect.is_tonemapping_effect():
-            target_pair = StaticRenderTargetPair(target_pair.texture, self._ldr_ping_pong_buffer.framebuffer)
+    #Get the list of effects to run this frame, without effects that would leave the image unchanged,
+    #and with runs of pixel-local effects replaced by a fused effect
+    def _get_passes(self):
+        passes = []
+        pixel_run = []
 
-        if effect is first_effect:
-            target_pair = StaticRenderTargetPair(source_texture, target_pair.framebuffer)
+        for effect in self._effects:
+            if not self._is_active(effect):
+                continue
+
+            #Scaled effects render to their own target, so they are not fused with their neighbours
+            if self.fuse_pixel_effects and effect.is_pixel_local() and effect.get_output_scale() == 1.0:
+                pixel_run.append(effect)
+                if len(pixel_run) == PostProcessingChain.max_fused_stages:
+                    self._add_pixel_run(passes, pixel_run)
+                    pixel_run = []
+                continue
 
-        if effect is last_effect:
-            target_pair = StaticRenderTargetPair(target_pair.texture, destination_framebuffer)   
+            self._add_pixel_run(passes, pixel_run)
+            pixel_run = []
+            passes.append(effect)
+
+        self._add_pixel_run(passes, pixel_run)
+        return passes
+
+    def _add_pixel_run(self, passes, pixel_run):
+        if len(pixel_run) == 0:
+            return
+
+        if len(pixel_run) == 1:
+            passes.append(pixel_run[0])
+            return
+
+        #Most recently used runs are kept last, see _trim_fused_effects()
+        key = tuple(pixel_run)
+        fused_effect = self._fused_effects.pop(key, None)
+        if fused_effect is None:
+            fused_effect = FusedEffect(self.context, self._current_size, pixel_run)
+        self._fused_effects[key] = fused_effect
+
+        passes.append(fused_effect)
+
+    #Release the least recently used fused passes the plan no longer runs, past max_cached_fused_effects
+    def _trim_fused_effects(self, passes):
+        excess = len(self._fused_effects) - PostProcessingChain.max_cached_fused_effects
+        for key, fused_effect in list(self._fused_effects.items()):
+            if excess <= 0:
+                break
+            if fused_effect in passes:
+                continue
+            del self._fused_effects[key]
+            fused_effect.release()
+            excess -= 1
+
+    #Release the fused passes that run any of the given effects, all of them if effects is None
+    def _release_fused_effects(self, effects=None):
+        for key, fused_effect in list(self._fused_effects.items()):
+            if effects is None or any(effect in key for effect in effects):
+                del self._fused_effects[key]
+                fused_effect.release()
+
+    def _upsample(self, source_texture, destination_framebuffer):
+        source_texture.use(0)
+        destination_framebuffer.use()
+        RenderTarget.fullscreen_quad.render(RenderTarget.blit_program)
 
-        return target_pair     
+    def _get_pass_name(self, effect):
+        if isinstance(effect, FusedEffect):
+            return ' + '.join(type(member).__name__ for member in effect.effects)
+        return type(effect).__name__
 
     def _resize_if_needed(self, source_texture):
-        pass
+        size = tuple(source_texture.size)
+
+        if size == self._current_size:
+            self._pending_size = None
+            return
+
+        if size != self._pending_size:
+            self._pending_size = size
+            self._pending_frames = 0
+
+        self._pending_frames += 1
+
+        if self._pending_frames >= PostProcessingChain.resize_settle_frames or self._exceeds_resize_threshold(size):
+            self.resize(size)
+
+    def _exceeds_resize_threshold(self, size):
+        for new, current in zip(size, self._current_size):
+            if abs(new - current) > current * PostProcessingChain.resize_threshold:
+                return True
+        return False
+
+    #Size the chain currently renders at
+    @property
+    def size(self):
+        return self._current_size
+
+    def resize(self, size):
+        size = tuple(size)
+
+        self._current_size = size
+        self._pending_size = None
+
+        for effect in self._effects:
+            effect.resize(size)
+
+        for fused_effect in self._fused_effects.values():
+            fused_effect.resize(size)
+
+        self._invalidate_plan()
 
     def _passthrough(self, source_texture, destination_framebuffer):
         source_texture.use(0)
         destination_framebuffer.use()
         RenderTarget.fullscreen_quad.render(RenderTarget.blit_program)
 
+    #Enabled effects that currently change the image
+    def _is_active(self, effect):
+        return effect.enabled and not effect.is_noop()
+
     def are_any_effects_active(self):
         for effect in self._effects:
-            if effect.enabled:
+            if self._is_active(effect):
                 return True
         return False
 
     def get_first_active_effect(self):
         for effect in self._effects:
-            if effect.enabled:
+            if self._is_active(effect):
                 return effect
         return None
     
     def get_last_active_effect(self):
         for effect in reversed(self._effects):
-            if effect.enabled:
+            if self._is_active(effect):
                 return effect
         return None
         
 
     def add_effect(self, effect):
         new_effect = effect(self.context, self._current_size)
+        new_effect.set_quality(self._quality)
         self._effects.append(new_effect)
+        self._invalidate_plan()
+        self.invalidate_output()
         return new_effect
 
     def remove_effect(self, effect):
         self._effects.remove(effect)
+        self._release_fused_effects([effect])
+        self._invalidate_plan()
+        self.invalidate_output()
+
+    #GPU memory the effects keep across frames, which the RenderTargetPool does not count, see PostEffect.get_allocated_bytes()
+    def get_effect_allocated_bytes(self):
+        return sum(effect.get_allocated_bytes() for effect in self._effects)
 
     def get_effect(self, effect_type):
         for effect in self._effects:
@@ -114,6 +518,24 @@ class PostProcessingChain:
             raise TypeError("IMGUI cannot be found")
 
         imgui.begin("Post-Processing window", False)
+        #Pooled targets are shared with every other chain on the context, effect memory is this chain's own
+        imgui.text(f'Pooled render target memory: {self._render_target_pool.allocated_bytes / (1024 * 1024):.1f} MB')
+        imgui.text(f'Effect memory: {self.get_effect_allocated_bytes() / (1024 * 1024):.1f} MB')
+
+        quality_index = PostEffect.quality_tiers.index(self.quality)
+        quality_index = imgui.combo("Quality", quality_index, PostEffect.quality_tiers)[1]
+        self.quality = PostEffect.quality_tiers[quality_index]
+
+        self.gpu_timing = imgui.checkbox("GPU timing", self.gpu_timing)[1]
+        if self.gpu_timing:
+            for name, milliseconds in self.get_gpu_timings().items():
+                #Nested sections are indented under their parent
+                depth = name.count('/')
+                imgui.text(f'{"  " * depth}{name.split("/")[-1]}: {milliseconds:.3f} ms')
+
+        if self.cache_output:
+            imgui.text(f'Cached frames: {self.cached_frames}')
+
         imgui.text("Post-Processing Stages:")
         imgui.separator()
 
@@ -125,7 +547,110 @@ class PostProcessingChain:
 
     def reset_effects(self):
         self._effects = []
+        self._release_fused_effects()
+        self._invalidate_plan()
+        self.invalidate_output()
 
+    #Time each pass of the chain on the GPU. Results arrive a few frames late, see GpuTimer
+    @property
+    def gpu_timing(self):
+        return self._gpu_timer is not None
+
+    @gpu_timing.setter
+    def gpu_timing(self, value):
+        if value and self._gpu_timer is None:
+            self._gpu_timer = GpuTimer(self.context)
+        elif not value and self._gpu_timer is not None:
+            self._gpu_timer.release()
+            self._gpu_timer = None
+
+    #Stream CPU timings of the next frame_count frames (or all frames until stop_trace()) to a Chrome trace file
+    def start_trace(self, path, frame_count=None):
+        ChromeTrace.start(path)
+        self._trace_frames_left = frame_count
+
+    def stop_trace(self):
+        ChromeTrace.stop()
+        self._trace_frames_left = None
+
+    def _count_trace_frame(self):
+        if self._trace_frames_left is None:
+            return
+
+        self._trace_frames_left -= 1
+        if self._trace_frames_left <= 0:
+            self.stop_trace()
+
+    #Scale effects' render_scale between min_scale and max_scale to keep the chain's GPU time under budget_ms.
+    #Applies to the given effects, or to the chain's effects that opt in (see PostEffect.dynamic_resolution).
+    #Turns on GPU timing to measure the chain
+    def enable_dynamic_resolution(self, budget_ms, effects=None, min_scale=0.5, max_scale=1.0):
+        if effects is None:
+            effects = [effect for effect in self._effects if effect.dynamic_resolution]
+
+        #GPU timing is restored to what it was by disable_dynamic_resolution()
+        if self.dynamic_resolution is None:
+            self._timing_before_dynamic_resolution = self.gpu_timing
+
+        self.gpu_timing = True
+        self.dynamic_resolution = DynamicResolutionController(effects, budget_ms, min_scale, max_scale)
+        return self.dynamic_resolution
+
+    def disable_dynamic_resolution(self):
+        if self.dynamic_resolution is None:
+            return
+
+        for effect in self.dynamic_resolution.effects:
+            effect.render_scale = 1.0
+        self.dynamic_resolution = None
+
+        self.gpu_timing = self._timing_before_dynamic_resolution
+
+    #GPU milliseconds of the whole chain, the sum of its top-level passes
+    def get_gpu_frame_time(self, smoothed=True):
+        if self._gpu_timer is None:
+            return 0.0
+
+        timings = self._gpu_timer.timings if smoothed else self._gpu_timer.last_frame
+        return sum(milliseconds for name, milliseconds in timings.items() if '/' not in name)
+
+    #Smoothed GPU milliseconds per pass, in the order they ran. Passes that time parts of their work
+    #report them as 'Pass/Part', e.g. 'Bloom/Level 0'. Empty while GPU timing is disabled
+    def get_gpu_timings(self):
+        if self._gpu_timer is None:
+            return {}
+        return dict(self._gpu_timer.timings)
+
+    #Quality tier of the chain's effects, one of PostEffect.quality_tiers. Each effect maps it to its own sample counts,
+    #levels and the like (see PostEffect.quality_settings) and compiles the matching shader variants.
+    #Effects added later start at the chain's tier, and settings changed on an effect afterwards are kept until the tier changes.
+    #Tiers switch without recompiling once preload_quality_tiers() has compiled their variants
+    @property
+    def quality(self):
+        return self._quality
+
+    @quality.setter
+    def quality(self, value):
+        if value not in PostEffect.quality_tiers:
+            raise ValueError(f"Unknown quality tier '{value}', expected one of {PostEffect.quality_tiers}")
+
+        if value == self._quality:
+            return
+
+        self._quality = value
+        for effect in self._effects:
+            effect.set_quality(value)
+
+    #Compile the shader variants of the given tiers (all of them by default) for the current effects, e.g. during loading
+    def preload_quality_tiers(self, tiers=None):
+        if tiers is None:
+            tiers = PostEffect.quality_tiers
+
+        for effect in self._effects:
+            for tier in tiers:
+                effect.preload_quality(tier)
+
+    #Intermediates between effects before the tonemapper are HDR, see hdr_format
     @property
     def hdr(self):
         return self._hdr_enabled
@@ -133,19 +658,27 @@ class PostProcessingChain:
     @hdr.setter
     def hdr(self, value):
         self._hdr_enabled = value
-        if value:
-            self._enable_hdr()
-        else:
-            self._disable_hdr()
+        self._invalidate_plan()
 
-    def _enable_hdr(self):
-        if self._hdr_ping_pong_buffer is None:
-            self._hdr_ping_pong_buffer = PingPongBuffer(self.context, self._current_size, 'f2')
+    #Format of the HDR targets. None picks the cheapest format every active HDR effect can work with
+    #(see PostEffect.get_hdr_format()), set a format to force it
+    @property
+    def hdr_format(self):
+        return self._hdr_format
+
+    @hdr_format.setter
+    def hdr_format(self, value):
+        self._hdr_format = value
+        self._invalidate_plan()
+
+    @property
+    def fuse_pixel_effects(self):
+        return self._fuse_pixel_effects
 
-    def _disable_hdr(self):
-        if self._hdr_ping_pong_buffer is not None:
-            self._hdr_ping_pong_buffer.release()
-            self._hdr_ping_pong_buffer = None
+    @fuse_pixel_effects.setter
+    def fuse_pixel_effects(self, value):
+        self._fuse_pixel_effects = value
+        self._invalidate_plan()
 
 
 try:
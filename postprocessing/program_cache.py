@@ -0,0 +1,312 @@
+import ctypes
+import hashlib
+import os
+import re
+import weakref
+
+import arcade
+from pyglet import gl
+from postprocessing.uniform_block import bind_uniform_block
+from postprocessing.viewports import VIEWPORT_BLOCK, VIEWPORT_BINDING
+
+#Context-wide cache of linked shader programs, keyed by shader source and defines.
+#Every effect, render target and chain on a context shares the same compiled programs,
+#so creating a second Bloom or a second chain does not pay compile and link cost again.
+#Because programs are shared, effects keep their parameters in their own uniform buffer (see uniform_block.py).
+#Shader files are preprocessed as they are loaded: #include lines pull in shared snippets (see expand_includes()),
+#and defines passed from Python set or add #define values (see apply_defines()). Every combination of sources and
+#defines is a permutation that is compiled once, so variants of a shader are built by passing defines rather than
+#copying the file or branching at runtime
+class ProgramCache:
+
+    #Set to a directory to keep linked program binaries between runs, None disables the on-disk cache
+    binary_cache_directory = None
+
+    _caches = {}
+
+    def get(context):
+        cache = ProgramCache._caches.get(context)
+        if cache is None:
+            cache = ProgramCache(context)
+            ProgramCache._caches[context] = cache
+        return cache
+
+    def __init__(self, context):
+        self.context = context
+        self._sources = {}
+        self._programs = {}
+        self._driver_key = None
+
+        #Owners that asked to be able to release a program, see retain()
+        self._retains = {}
+
+    def load_program(self, vertex_shader, fragment_shader, defines=None):
+        return self.program(self.load_source(vertex_shader), self.load_source(fragment_shader), defines)
+
+    #Source of a shader file with its includes expanded
+    def load_source(self, path):
+        source = self._sources.get(path)
+        if source is None:
+            source = expand_includes(read_source(path), path)
+            self._sources[path] = source
+        return source
+
+    def program(self, vertex_shader, fragment_shader, defines=None):
+        key = ProgramCache.make_key(vertex_shader, fragment_shader, defines)
+
+        program = self._programs.get(key)
+        if program is None:
+            vertex_shader = apply_defines(vertex_shader, defines)
+            fragment_shader = apply_defines(fragment_shader, defines)
+
+            if ProgramCache.binary_cache_directory is not None:
+                program = self._load_binary(key)
+                if program is None:
+                    program = self._link_retrievable(key, vertex_shader, fragment_shader)
+
+            #Anything going wrong with binaries falls back to arcade building the program from source
+            if program is None:
+                program = self.context.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+
+            #Every program drawn with the full-screen quad reads the viewports from the same binding, see viewports.py
+            bind_uniform_block(program, VIEWPORT_BLOCK, VIEWPORT_BINDING)
+            self._programs[key] = program
+
+        return program
+
+    def load_compute_shader(self, path, defines=None):
+        return self.compute_shader(self.load_source(path), defines)
+
+    #Compute shaders need GL 4.3 and an arcade version that provides Context.compute_shader
+    def compute_shader(self, source, defines=None):
+        key = 'compute_' + ProgramCache.make_key("", source, defines)
+
+        program = self._programs.get(key)
+        if program is None:
+            program = self.context.compute_shader(source=apply_defines(source, defines))
+            self._programs[key] = program
+
+        return program
+
+    def make_key(vertex_shader, fragment_shader, defines=None):
+        key = hashlib.sha1()
+        key.update(vertex_shader.encode())
+        key.update(b'\0')
+        key.update(fragment_shader.encode())
+
+        if defines:
+            for name, value in sorted(defines.items()):
+                key.update(f'\0{name}={value}'.encode())
+
+        return key.hexdigest()
+
+    #Programs are kept for the lifetime of the cache unless they are retained. Programs only a transient owner uses,
+    #like the program of a fused pass (see FusedEffect), are retained by each owner and released with the last one
+    def retain(self, program):
+        self._retains[program] = self._retains.get(program, 0) + 1
+
+    def release_program(self, program):
+        count = self._retains.get(program, 0) - 1
+        if count > 0:
+            self._retains[program] = count
+            return
+
+        self._retains.pop(program, None)
+        for key, cached in list(self._programs.items()):
+            if cached is program:
+                del self._programs[key]
+        program.release()
+
+    def release(self):
+        for program in self._programs.values():
+            program.release()
+
+        self._programs = {}
+        self._retains = {}
+        ProgramCache._caches.pop(self.context, None)
+
+    #On-disk program binary cache
+
+    def _binary_path(self, key):
+        if self._driver_key is None:
+            #Binaries are only valid for the driver that produced them
+            driver = hashlib.sha1()
+            for name in (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION):
+                driver.update(ctypes.cast(gl.glGetString(name), ctypes.c_char_p).value)
+            self._driver_key = driver.hexdigest()[:16]
+
+        return os.path.join(ProgramCache.binary_cache_directory, f'{self._driver_key}_{key}.bin')
+
+    def _load_binary(self, key):
+        path = self._binary_path(key)
+        if not os.path.exists(path):
+            return None
+
+        #A binary can be rejected by the driver at any time, or be cut short by another process writing it,
+        #in which case the program is compiled from source and the binary replaced
+        try:
+            with open(path, 'rb') as binary_file:
+                data = binary_file.read()
+
+            binary_format = int.from_bytes(data[0:4], 'little')
+            glo = load_program_binary(binary_format, data[4:])
+        except Exception:
+            return None
+
+        return self._wrap(glo)
+
+    #Compile and link from source with GL_PROGRAM_BINARY_RETRIEVABLE_HINT set, without it some drivers return no binary.
+    #The hint has to be set before linking, which arcade does in the program's constructor, so the program is linked here.
+    #Shader errors raise as they would from arcade
+    def _link_retrievable(self, key, vertex_shader, fragment_shader):
+        glo = gl.glCreateProgram()
+        shaders = []
+        linked = False
+        try:
+            for source, shader_type in ((vertex_shader, gl.GL_VERTEX_SHADER), (fragment_shader, gl.GL_FRAGMENT_SHADER)):
+                shader = arcade.gl.Program.compile_shader(source, shader_type)
+                gl.glAttachShader(glo, shader)
+                shaders.append(shader)
+
+            gl.glProgramParameteri(glo, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE)
+            arcade.gl.Program.link(glo)
+            linked = True
+        finally:
+            for shader in shaders:
+                gl.glDetachShader(glo, shader)
+                gl.glDeleteShader(shader)
+            if not linked:
+                gl.glDeleteProgram(glo)
+
+        #The disk cache is only an optimization, a binary that cannot be fetched or written is not an error
+        try:
+            self._save_binary(key, glo)
+        except Exception:
+            pass
+
+        return self._wrap(glo)
+
+    #None if arcade's program internals no longer match LinkedProgram
+    def _wrap(self, glo):
+        try:
+            return LinkedProgram(self.context, glo)
+        except Exception:
+            gl.glDeleteProgram(glo)
+            return None
+
+    def _save_binary(self, key, glo):
+        length = gl.GLint()
+        gl.glGetProgramiv(glo, gl.GL_PROGRAM_BINARY_LENGTH, length)
+        if length.value == 0:
+            return
+
+        binary = (ctypes.c_ubyte * length.value)()
+        binary_format = gl.GLenum()
+        gl.glGetProgramBinary(glo, length.value, None, binary_format, binary)
+
+        #Written under a temporary name and moved into place, so other processes never read a partial binary
+        os.makedirs(ProgramCache.binary_cache_directory, exist_ok=True)
+        path = self._binary_path(key)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as binary_file:
+            binary_file.write(binary_format.value.to_bytes(4, 'little'))
+            binary_file.write(bytes(binary))
+        os.replace(temporary_path, path)
+
+
+_include_pattern = re.compile(r'^\s*#include\s+"([^"]+)"')
+
+def read_source(path):
+    with open(path) as source_file:
+        return source_file.read()
+
+#Path of an included file: relative to the including file, or else to the working directory like all other shader paths
+def resolve_include(name, including_path):
+    path = os.path.normpath(os.path.join(os.path.dirname(including_path), name))
+    if os.path.exists(path):
+        return path
+    return os.path.normpath(name)
+
+#Replace each '#include "path"' line with the contents of that file, whose own includes are expanded in turn.
+#Each file is only pulled into a shader once, so snippets can include what they depend on without guards
+def expand_includes(source, path, included=None):
+    if included is None:
+        included = set()
+
+    lines = []
+    for line in source.splitlines():
+        match = _include_pattern.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+
+        include_path = resolve_include(match.group(1), path)
+        if include_path in included:
+            continue
+        included.add(include_path)
+
+        lines.append(expand_includes(read_source(include_path), include_path, included))
+
+    return '\n'.join(lines)
+
+#Set the value of each define. Existing '#define NAME value' lines are replaced, the same way arcade does for programs,
+#and defines the source does not have are added after the #version line
+def apply_defines(source, defines):
+    if not defines:
+        return source
+
+    lines = source.splitlines()
+    missing = dict(defines)
+    for index, line in enumerate(lines):
+        parts = line.split()
+        if len(parts) >= 2 and parts[0] == '#define' and parts[1] in defines:
+            lines[index] = f'#define {parts[1]} {defines[parts[1]]}'
+            missing.pop(parts[1], None)
+
+    if len(missing) > 0:
+        version = next((index for index, line in enumerate(lines) if line.strip().startswith('#version')), -1)
+        lines[version + 1:version + 1] = [f'#define {name} {value}' for name, value in missing.items()]
+
+    return '\n'.join(lines)
+
+
+#Create a program object from a driver program binary, raises ValueError if the driver rejects it
+def load_program_binary(binary_format, binary):
+    glo = gl.glCreateProgram()
+    gl.glProgramBinary(glo, binary_format, binary, len(binary))
+
+    status = gl.GLint()
+    gl.glGetProgramiv(glo, gl.GL_LINK_STATUS, status)
+    if not status.value:
+        gl.glDeleteProgram(glo)
+        raise ValueError("Program binary was rejected by the driver")
+
+    return glo
+
+
+#An arcade program around a program object linked outside of arcade, from a binary or with the retrievable hint.
+#arcade has no constructor for an already linked program, so this sets up the same fields as arcade.gl.Program.__init__
+#(arcade 2.5) and runs its introspection. Any mismatch with the installed arcade raises, and ProgramCache falls back to
+#building the program through arcade from source
+class LinkedProgram(arcade.gl.Program):
+
+    __slots__ = ()
+
+    def __init__(self, context, glo):
+        self._ctx = context
+        self._glo = glo
+        self._out_attributes = []
+        self._geometry_info = (0, 0, 0)
+        self._attributes = []
+        self.attribute_key = "INVALID"
+        self._uniforms = {}
+
+        self._introspect_attributes()
+        self._introspect_uniforms()
+        self._introspect_uniform_blocks()
+
+        #Balances the decrement in arcade.gl.Program.delete_glo
+        context.stats.incr("program")
+
+        if context.gc_mode == "auto":
+            weakref.finalize(self, arcade.gl.Program.delete_glo, context, glo)
@@ -0,0 +1,253 @@
+from postprocessing.chrome_trace import ChromeTrace
+from postprocessing.render_target_pair import RenderTargetPair
+from postprocessing.render_target_pool import RenderTargetPool
+
+#A frame graph of render passes.
+#Passes declare the resources they read and write instead of binding targets themselves, and compile() works out the rest:
+#   - passes whose outputs nothing reads are culled, unless they write an imported resource or are marked as side effects
+#   - the execution order, each pass after the passes writing its inputs, otherwise in the order they were added
+#   - the lifetime of every transient resource, from the first pass using it to the last
+#execute() borrows each transient target from the RenderTargetPool only for its lifetime, so resources whose lifetimes
+#do not overlap and that share a size and format alias the same GPU memory.
+#Each resource is written by a single pass, which keeps the dependencies of a pass explicit.
+#A compiled graph can be executed again every frame, with imported resources pointed at new objects in between
+class RenderGraph:
+
+    def __init__(self, context, pool):
+        self.context = context
+        self.pool = pool
+
+        self.resources = []
+        self.passes = []
+        self._named = {}
+
+        #Set by compile()
+        self.order = None
+        self.culled_passes = []
+
+    #A render target that only lives for this frame, see execute()
+    def create_texture(self, name, size, texture_format):
+        return self._add_resource(GraphResource(name, tuple(size), texture_format))
+
+    #A texture from outside the graph that passes can read, such as the chain's source.
+    #It can be set or replaced through external_texture until the graph executes
+    def import_texture(self, name, texture=None):
+        resource = self._add_resource(GraphResource(name, None, None))
+        resource.imported = True
+        resource.readable = True
+        resource.external_texture = texture
+        return resource
+
+    #A framebuffer from outside the graph that a pass can write, such as the chain's destination.
+    #Passes that write an imported resource are never culled. It can be set or replaced through external_framebuffer
+    def import_framebuffer(self, name, framebuffer=None):
+        resource = self._add_resource(GraphResource(name, None, None))
+        resource.imported = True
+        resource.external_framebuffer = framebuffer
+        return resource
+
+    def _add_resource(self, resource):
+        self.resources.append(resource)
+        self.publish(resource.name, resource)
+        return resource
+
+    #Make a resource findable by name, so later passes can read outputs other than the one they are handed
+    def publish(self, name, resource):
+        self._named[name] = resource
+
+    def find(self, name):
+        return self._named.get(name)
+
+    #Add a pass that calls execute() with no arguments, reading the textures of inputs and drawing into the framebuffers of outputs
+    def add_pass(self, name, execute, inputs=(), outputs=(), side_effect=False):
+        graph_pass = GraphPass(name, execute, list(inputs), list(outputs), side_effect)
+
+        for resource in graph_pass.outputs:
+            if resource.writer is not None:
+                raise ValueError(f"'{resource.name}' is already written by '{resource.writer.name}'")
+            if resource.imported and resource.readable:
+                raise ValueError(f"Imported texture '{resource.name}' cannot be written")
+            resource.writer = graph_pass
+
+        self.passes.append(graph_pass)
+        self.order = None
+        return graph_pass
+
+    def compile(self):
+        for graph_pass in self.passes:
+            for resource in graph_pass.inputs:
+                if resource.imported and not resource.readable:
+                    raise ValueError(f"'{graph_pass.name}' reads '{resource.name}', which can only be written")
+                if not resource.imported and resource.writer is None:
+                    raise ValueError(f"'{graph_pass.name}' reads '{resource.name}', which no pass writes")
+
+        live = self._find_live_passes()
+        self.culled_passes = [graph_pass for graph_pass in self.passes if graph_pass not in live]
+
+        self.order = []
+        placed = set()
+        visiting = set()
+        for graph_pass in self.passes:
+            if graph_pass in live:
+                self._place(graph_pass, placed, visiting)
+
+        self._compute_lifetimes()
+        return self.order
+
+    #Walk back from the passes whose results leave the graph
+    def _find_live_passes(self):
+        live = set()
+        pending = [graph_pass for graph_pass in self.passes if graph_pass.side_effect or any(resource.imported for resource in graph_pass.outputs)]
+
+        while len(pending) > 0:
+            graph_pass = pending.pop()
+            if graph_pass in live:
+                continue
+
+            live.add(graph_pass)
+            pending.extend(resource.writer for resource in graph_pass.inputs if resource.writer is not None)
+
+        return live
+
+    def _place(self, graph_pass, placed, visiting):
+        if graph_pass in placed:
+            return
+        if graph_pass in visiting:
+            raise ValueError(f"'{graph_pass.name}' depends on its own output")
+
+        visiting.add(graph_pass)
+        for resource in graph_pass.inputs:
+            if resource.writer is not None:
+                self._place(resource.writer, placed, visiting)
+        visiting.remove(graph_pass)
+
+        placed.add(graph_pass)
+        self.order.append(graph_pass)
+
+    #Each pass acquires the transient resources it is the first to use, and releases those it is the last to use
+    def _compute_lifetimes(self):
+        first_use = {}
+        last_use = {}
+        for index, graph_pass in enumerate(self.order):
+            for resource in graph_pass.inputs + graph_pass.outputs:
+                if resource.imported:
+                    continue
+                first_use.setdefault(resource, index)
+                last_use[resource] = index
+
+        for graph_pass in self.order:
+            graph_pass.acquires = []
+            graph_pass.releases = []
+
+        for resource, index in first_use.items():
+            self.order[index].acquires.append(resource)
+        for resource, index in last_use.items():
+            self.order[index].releases.append(resource)
+
+    #Run the compiled passes, timing each one with the given GpuTimer and the active ChromeTrace
+    def execute(self, gpu_timer=None):
+        if self.order is None:
+            self.compile()
+
+        trace = ChromeTrace.active
+
+        for graph_pass in self.order:
+            for resource in graph_pass.acquires:
+                resource.target = self.pool.acquire_key(resource.pool_key)
+
+            if gpu_timer is not None:
+                gpu_timer.begin(graph_pass.name)
+            if trace is not None:
+                trace.begin(graph_pass.name)
+
+            graph_pass.execute()
+
+            if gpu_timer is not None:
+                gpu_timer.end()
+            if trace is not None:
+                trace.end()
+
+            for resource in graph_pass.releases:
+                self.pool.release(resource.target)
+                resource.target = None
+
+
+class GraphResource:
+
+    __slots__ = ('name', 'size', 'texture_format', 'pool_key', 'imported', 'readable', 'writer', 'target', 'external_texture', 'external_framebuffer')
+
+    def __init__(self, name, size, texture_format):
+        self.name = name
+        self.size = size
+        self.texture_format = texture_format
+        self.pool_key = RenderTargetPool.make_key(size, texture_format) if size is not None else None
+
+        self.imported = False
+        self.readable = False
+        self.writer = None
+
+        #Pooled render target of a transient resource, only set while it is alive during execute()
+        self.target = None
+
+        self.external_texture = None
+        self.external_framebuffer = None
+
+    @property
+    def texture(self):
+        if self.imported:
+            return self.external_texture
+        return self.target.texture
+
+    @property
+    def framebuffer(self):
+        if self.imported:
+            return self.external_framebuffer
+        return self.target.framebuffer_object
+
+
+#Texture and framebuffer of two graph resources, created once when a pass is declared and resolved each time it runs
+class ResourcePair(RenderTargetPair):
+
+    __slots__ = ('source', 'target')
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+
+    def bind(self, texture_index):
+        trace = ChromeTrace.active
+        if trace is not None:
+            start = trace.timestamp()
+
+        self.source.texture.use(texture_index)
+        self.target.framebuffer.use()
+
+        if trace is not None:
+            trace.complete("bind", start, "bind")
+
+    def get_render_target_pair(self):
+        return (self.source.texture, self.target.framebuffer)
+
+    @property
+    def texture(self):
+        return self.source.texture
+
+    @property
+    def framebuffer(self):
+        return self.target.framebuffer
+
+
+class GraphPass:
+
+    __slots__ = ('name', 'execute', 'inputs', 'outputs', 'side_effect', 'acquires', 'releases')
+
+    def __init__(self, name, execute, inputs, outputs, side_effect):
+        self.name = name
+        self.execute = execute
+        self.inputs = inputs
+        self.outputs = outputs
+        self.side_effect = side_effect
+
+        #Transient resources this pass allocates before it runs and frees after, set by RenderGraph.compile()
+        self.acquires = []
+        self.releases = []
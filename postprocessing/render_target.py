@@ -1,4 +1,51 @@
 import arcade
+from pyglet import gl
+from postprocessing.program_cache import ProgramCache
+from postprocessing.viewports import ViewportQuad
+
+#Texture formats of render targets.
+#'f1', 'f2' and 'f4' are RGBA with 8 bit, 16 bit float and 32 bit float channels, as arcade's dtypes.
+#PACKED_HDR is GL_R11F_G11F_B10F: unsigned floats with 11 bits for red and green and 10 for blue, and no alpha.
+#It holds HDR color for the bandwidth of an 8 bit target, as long as the contents are never negative and alpha is not needed
+PACKED_HDR = 'r11g11b10f'
+
+bytes_per_pixel = {'f1': 4, 'f2': 8, 'f4': 16, PACKED_HDR: 4}
+
+#HDR formats from the cheapest to the most precise, see PostEffect.get_hdr_format()
+hdr_formats = [PACKED_HDR, 'f2', 'f4']
+
+#The most precise of the given HDR formats
+def widest_hdr_format(texture_formats):
+    return max(texture_formats, key=hdr_formats.index, default=hdr_formats[0])
+
+#Create a clamped texture in one of the formats above
+def create_texture(context, size, texture_format):
+    if texture_format != PACKED_HDR:
+        return arcade.gl.Texture(
+            context,
+            size,
+            components=4,
+            dtype=texture_format,
+            wrap_x=arcade.gl.CLAMP_TO_EDGE,
+            wrap_y=arcade.gl.CLAMP_TO_EDGE,
+        )
+
+    texture = arcade.gl.Texture(
+        context,
+        size,
+        components=3,
+        dtype='f2',
+        wrap_x=arcade.gl.CLAMP_TO_EDGE,
+        wrap_y=arcade.gl.CLAMP_TO_EDGE,
+    )
+
+    #arcade has no packed formats, replace the RGB16F storage it allocated.
+    #Reads and writes through arcade still use RGB half floats, which GL converts
+    texture.use(0)
+    gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_R11F_G11F_B10F, size[0], size[1], 0, gl.GL_RGB, gl.GL_HALF_FLOAT, None)
+    texture._internal_format = gl.GL_R11F_G11F_B10F
+
+    return texture
 
 class RenderTarget:
 
@@ -16,13 +63,17 @@ class RenderTarget:
         RenderTarget._init_blit_shaders(context)
 
     def _init_blit_shaders(context):
-        RenderTarget.blit_program = context.load_program(
+        blit_program = ProgramCache.get(context).load_program(
             vertex_shader="postprocessing/core_shaders/fullscreen_quad.vs",
             fragment_shader="postprocessing/core_shaders/blit.fs",
         )
 
-        RenderTarget.blit_program['t_source'] = 0
-        RenderTarget.fullscreen_quad = arcade.gl.geometry.quad_2d_fs()
+        if blit_program is not RenderTarget.blit_program:
+            RenderTarget.blit_program = blit_program
+            RenderTarget.blit_program['t_source'] = 0
+
+        if RenderTarget.fullscreen_quad is None:
+            RenderTarget.fullscreen_quad = ViewportQuad.get(context)
 
     def resize(self, newSize):
         self.release()
@@ -30,14 +81,7 @@ class RenderTarget:
         self._allocate_target(newSize)
 
     def _allocate_target(self, size):
-        self.texture = arcade.gl.Texture(
-            self.context,
-            size,
-            components=4,
-            dtype=self.texture_format,
-            wrap_x=arcade.gl.CLAMP_TO_EDGE,
-            wrap_y=arcade.gl.CLAMP_TO_EDGE,
-        )
+        self.texture = create_texture(self.context, size, self.texture_format)
 
         self.framebuffer_object = arcade.gl.Framebuffer(
             self.context, color_attachments=[self.texture]
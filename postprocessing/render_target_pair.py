@@ -3,6 +3,9 @@
 #Represents a pair of render targets used in a blit, a source as a texture and a desteniation as a framebuffer object
 class RenderTargetPair:
 
+    #Lets subclasses that are created ahead of time use __slots__, see render_graph.ResourcePair
+    __slots__ = ()
+
     #Bind the texture side to a given texture index, and bind the render target side as the current drawing target
     def bind(self, texture_index):
         raise NotImplementedError("This needs to be implemented in a derrived class")
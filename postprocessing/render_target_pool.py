@@ -0,0 +1,78 @@
+import arcade
+from postprocessing.render_target import RenderTarget, bytes_per_pixel
+
+#Context-wide pool of transient render targets, keyed by (size, format).
+#Chains and effects acquire the targets they need while they render and release them afterwards,
+#so any two users whose targets are not alive at the same time end up sharing the same GPU memory.
+#Targets that are not acquired between two calls to trim() are freed.
+class RenderTargetPool:
+
+    _pools = {}
+
+    def get(context):
+        pool = RenderTargetPool._pools.get(context)
+        if pool is None:
+            pool = RenderTargetPool(context)
+            RenderTargetPool._pools[context] = pool
+        return pool
+
+    def __init__(self, context):
+        self.context = context
+        self._free = {}
+        self._all = []
+        self._used_since_trim = set()
+
+    def make_key(size, texture_format):
+        return (tuple(size), texture_format)
+
+    def acquire(self, size, texture_format):
+        return self.acquire_key(RenderTargetPool.make_key(size, texture_format))
+
+    #acquire() with a key made by make_key() ahead of time, for callers that acquire the same targets every frame
+    def acquire_key(self, key):
+        free = self._free.get(key)
+        if free:
+            target = free.pop()
+        else:
+            target = RenderTarget(self.context, key[0], key[1])
+            target.pool_key = key
+            self._all.append(target)
+
+        self._used_since_trim.add(target)
+        return target
+
+    def release(self, target):
+        free = self._free.get(target.pool_key)
+        if free is None:
+            free = self._free[target.pool_key] = []
+        free.append(target)
+
+    #Free every target that has not been acquired since the last trim
+    def trim(self):
+        for key, free in self._free.items():
+            keep = []
+            for target in free:
+                if target in self._used_since_trim:
+                    keep.append(target)
+                else:
+                    target.release()
+                    self._all.remove(target)
+            self._free[key] = keep
+
+        self._used_since_trim = set()
+
+    def release_all(self):
+        for target in self._all:
+            target.release()
+
+        self._free = {}
+        self._all = []
+        self._used_since_trim = set()
+
+    #Total GPU memory held by the pool, both in use and free
+    @property
+    def allocated_bytes(self):
+        total = 0
+        for target in self._all:
+            total += target.size[0] * target.size[1] * bytes_per_pixel[target.texture_format]
+        return total
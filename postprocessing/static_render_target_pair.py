@@ -1,5 +1,6 @@
 import arcade
 from postprocessing.render_target_pair import RenderTargetPair
+from postprocessing.chrome_trace import ChromeTrace
 
 class StaticRenderTargetPair(RenderTargetPair):
 
@@ -9,9 +10,16 @@ class StaticRenderTargetPair(RenderTargetPair):
 
     #Bind the texture side to a given texture index, and bind the render target side as the current drawing target
     def bind(self, texture_index):
+        trace = ChromeTrace.active
+        if trace is not None:
+            start = trace.timestamp()
+
         self.texture.use(texture_index)
         self.framebuffer.use()
 
+        if trace is not None:
+            trace.complete("bind", start, "bind")
+
     #Get the (texture,framebuffer) as a tuple pair for more advanced use cases
     def get_render_target_pair(self):
          return (self.texture, self.framebuffer)
@@ -0,0 +1,144 @@
+import ctypes
+import struct
+
+import arcade
+from pyglet import gl
+
+#Name of the std140 uniform block each effect declares its parameters in
+PARAMETER_BLOCK = "EffectParameters"
+
+_INVALID_INDEX = 0xFFFFFFFF
+
+#(struct format, components) for each uniform type that can appear in a parameter block
+_member_formats = {
+    gl.GL_FLOAT: ('f', 1),
+    gl.GL_FLOAT_VEC2: ('2f', 2),
+    gl.GL_FLOAT_VEC3: ('3f', 3),
+    gl.GL_FLOAT_VEC4: ('4f', 4),
+    gl.GL_INT: ('i', 1),
+    gl.GL_BOOL: ('i', 1),
+}
+
+#Point the named uniform block of a program at a binding index, returns False if the program has no such block
+def bind_uniform_block(program, block_name, binding):
+    index = gl.glGetUniformBlockIndex(program.glo, block_name.encode())
+    if index == _INVALID_INDEX:
+        return False
+
+    gl.glUniformBlockBinding(program.glo, index, binding)
+    return True
+
+def _flatten(value):
+    if isinstance(value, (int, float)):
+        return [value]
+
+    flat = []
+    for item in value:
+        flat.extend(_flatten(item))
+    return flat
+
+#CPU-side copy of an effect's parameter block with dirty tracking.
+#Setting a value only packs it into the CPU copy, the uniform buffer is written at most once per frame
+#when the block is bound, and not at all if nothing changed. As each effect owns its buffer, effects that
+#share a program (see ProgramCache) only need to bind their own buffer rather than re-upload uniforms.
+class UniformBlock:
+
+    def __init__(self, context, program, block_name=PARAMETER_BLOCK):
+        self.context = context
+        self.block_name = block_name
+
+        self._members = {}
+        size = self._introspect(program, block_name)
+
+        self.data = bytearray(size)
+        self.buffer = context.buffer(reserve=size, usage='dynamic')
+
+        self.dirty = True
+
+        #Incremented whenever a value actually changes
+        self.version = 0
+
+    def _introspect(self, program, block_name):
+        glo = program.glo
+
+        index = gl.glGetUniformBlockIndex(glo, block_name.encode())
+        if index == _INVALID_INDEX:
+            raise KeyError(f"Uniform block `{block_name}` was not found.")
+
+        size = gl.GLint()
+        gl.glGetActiveUniformBlockiv(glo, index, gl.GL_UNIFORM_BLOCK_DATA_SIZE, size)
+
+        count = gl.GLint()
+        gl.glGetActiveUniformBlockiv(glo, index, gl.GL_UNIFORM_BLOCK_ACTIVE_UNIFORMS, count)
+        count = count.value
+
+        indices = (gl.GLint * count)()
+        gl.glGetActiveUniformBlockiv(glo, index, gl.GL_UNIFORM_BLOCK_ACTIVE_UNIFORM_INDICES, indices)
+        indices = (gl.GLuint * count)(*indices)
+
+        def query(pname):
+            values = (gl.GLint * count)()
+            gl.glGetActiveUniformsiv(glo, count, indices, pname, values)
+            return values
+
+        offsets = query(gl.GL_UNIFORM_OFFSET)
+        strides = query(gl.GL_UNIFORM_ARRAY_STRIDE)
+        types = query(gl.GL_UNIFORM_TYPE)
+        sizes = query(gl.GL_UNIFORM_SIZE)
+
+        name_buffer = ctypes.create_string_buffer(256)
+        for i in range(count):
+            gl.glGetActiveUniformName(glo, indices[i], 256, None, name_buffer)
+            name = name_buffer.value.decode().replace("[0]", "")
+
+            member_format, components = _member_formats[types[i]]
+            self._members[name] = (offsets[i], strides[i], '<' + member_format, components, sizes[i])
+
+        return size.value
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __setitem__(self, name, value):
+        offset, stride, member_format, components, array_size = self._members[name]
+
+        values = _flatten(value)
+        if len(values) % components != 0 or len(values) > components * array_size:
+            raise ValueError(f"`{name}` takes {components} value(s) per element and at most {array_size} element(s), got {len(values)} value(s)")
+        elements = len(values) // components
+        end = offset + max(elements - 1, 0) * stride + struct.calcsize(member_format)
+
+        previous = bytes(self.data[offset:end])
+
+        for element in range(elements):
+            start = element * components
+            struct.pack_into(member_format, self.data, offset + element * stride, *values[start:start + components])
+
+        if self.data[offset:end] != previous:
+            self.dirty = True
+            self.version += 1
+
+    #A block with the same layout and values and a buffer of its own
+    def copy(self):
+        block = UniformBlock.__new__(UniformBlock)
+        block.context = self.context
+        block.block_name = self.block_name
+        block._members = self._members
+        block.data = bytearray(self.data)
+        block.buffer = self.context.buffer(reserve=len(self.data), usage='dynamic')
+        block.dirty = True
+        block.version = self.version
+        return block
+
+    #Upload the CPU copy if anything changed since the last upload
+    def flush(self):
+        if self.dirty:
+            self.buffer.write(bytes(self.data))
+            self.dirty = False
+
+    def bind(self, binding):
+        self.flush()
+        self.buffer.bind_to_uniform_block(binding)
+
+    def release(self):
+        self.buffer.release()
@@ -0,0 +1,143 @@
+import struct
+
+import arcade
+
+#Most viewports a frame can be split into, must match MAX_VIEWPORTS in fullscreen_quad.vs
+MAX_VIEWPORTS = 4
+
+#Uniform block fullscreen_quad.vs reads the viewports from.
+#Parameter blocks take the bindings from 0 up to PostProcessingChain.max_fused_stages, this stays clear of them
+VIEWPORT_BLOCK = "Viewports"
+VIEWPORT_BINDING = 15
+
+#Hashable copy of a dict of parameter overrides, colors and other sequences become tuples
+def freeze_overrides(overrides):
+    def freeze(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(item) for item in value)
+        return value
+
+    return tuple(sorted((name, freeze(value)) for name, value in overrides.items()))
+
+#A rectangle of the frame that is post-processed on its own, e.g. one player's view in split-screen.
+#x, y, width and height are in pixels of the chain's source, from the bottom left corner as in GL.
+#overrides maps effects to the values of their properties to use in this viewport instead, e.g. {bloom: {'power': 2.0}}.
+#Only properties that set shader parameters, or pick between shader variants like Bloom's threshold, can be overridden
+#(see PostEffect.get_property_uniforms()), not ones that change passes or targets (enabled, render_scale, Bloom's levels and so on)
+class Viewport:
+
+    def __init__(self, x, y, width, height, overrides=None):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.overrides = overrides if overrides is not None else {}
+
+    #Viewports can also be given as (x, y, width, height) tuples
+    def from_rect(rect):
+        if isinstance(rect, Viewport):
+            return rect
+        return Viewport(*rect)
+
+    def get_overrides(self, effect):
+        return self.overrides.get(effect)
+
+    #The rectangle as (x, y, width, height) in UVs of a frame of the given size
+    def get_uv_rect(self, size):
+        return (self.x / size[0], self.y / size[1], self.width / size[0], self.height / size[1])
+
+    #Everything the output of this viewport depends on, for the chain's output cache
+    def get_cache_key(self):
+        overrides = tuple((id(effect), freeze_overrides(values)) for effect, values in self.overrides.items())
+        return (self.x, self.y, self.width, self.height, overrides)
+
+
+#The full-screen quad all passes draw with, drawn as one instance per viewport.
+#fullscreen_quad.vs places each instance on its viewport, so a pass covers every viewport of the frame in a single draw,
+#and passes each fragment its viewport's UV rectangle, which filtering shaders clamp their fetches to so nothing bleeds
+#across viewport borders. As every target is drawn per viewport rather than per frame, all viewports share the same
+#intermediate targets. Outside of split-screen processing it draws a single instance covering the whole target
+class ViewportQuad:
+
+    _quads = {}
+
+    def get(context):
+        quad = ViewportQuad._quads.get(context)
+        if quad is None:
+            quad = ViewportQuad(context)
+            ViewportQuad._quads[context] = quad
+        return quad
+
+    def __init__(self, context):
+        self.context = context
+        self.geometry = arcade.gl.geometry.quad_2d_fs()
+        self.buffer = context.buffer(reserve=MAX_VIEWPORTS * 16, usage='dynamic')
+
+        #Viewports of the frame being processed, None for the whole target
+        self.viewports = None
+        self.size = None
+
+        #Instances drawn by render(), a subset of the viewports while some have their own parameters
+        self.instance_count = 0
+        self._rects = None
+
+        self.draw_viewports(None)
+
+    #Split the following passes into the given viewports of a frame of the given size, None to go back to the whole target
+    def set_viewports(self, viewports, size):
+        if viewports is not None and len(viewports) > MAX_VIEWPORTS:
+            raise ValueError(f"At most {MAX_VIEWPORTS} viewports are supported, got {len(viewports)}")
+
+        self.viewports = viewports
+        self.size = size
+        self.draw_viewports(viewports)
+
+    @property
+    def is_split(self):
+        return self.viewports is not None
+
+    #Restrict render() to some of the frame's viewports, None draws the whole target
+    def draw_viewports(self, viewports):
+        if viewports is None:
+            rects = ((0.0, 0.0, 1.0, 1.0),)
+        else:
+            rects = tuple(viewport.get_uv_rect(self.size) for viewport in viewports)
+
+        if rects != self._rects:
+            self.buffer.write(b''.join(struct.pack('<4f', *rect) for rect in rects))
+            self._rects = rects
+
+        self.instance_count = len(rects)
+
+    #The frame's viewports grouped by the overrides they have for the given effects, as a list of
+    #({effect: overrides}, viewports) in the order the viewports were given. None if no viewport overrides any of them
+    def group_by_overrides(self, effects):
+        if self.viewports is None:
+            return None
+
+        groups = {}
+        overridden = False
+        for viewport in self.viewports:
+            overrides = {}
+            for effect in effects:
+                values = viewport.get_overrides(effect)
+                if values:
+                    overrides[effect] = values
+
+            overridden = overridden or len(overrides) > 0
+
+            key = tuple((id(effect), freeze_overrides(values)) for effect, values in overrides.items())
+            group = groups.setdefault(key, (overrides, []))
+            group[1].append(viewport)
+
+        if not overridden:
+            return None
+        return list(groups.values())
+
+    def render(self, program):
+        self.buffer.bind_to_uniform_block(VIEWPORT_BINDING)
+        self.geometry.render(program, instances=self.instance_count)
+
+    def release(self):
+        self.buffer.release()
+        ViewportQuad._quads.pop(self.context, None)